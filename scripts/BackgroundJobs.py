@@ -0,0 +1,214 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+    Background jobs of the Terrain Generator.
+    The computation of a job runs on a worker thread while Maya keeps responding, everything that touches the
+    scene runs on the main thread through a dispatch function, maya.utils.executeDeferred inside Maya.
+    A job reports its progress from the worker thread and checks if it was cancelled every time it does it.
+    by Daniel Orozco
+"""
+
+# Same logger used by the UI
+logger = logging.getLogger("TerrainGenerator")
+
+# States of a job that ended
+JOB_STATES = ["Done", "Cancelled", "Failed"]
+
+
+class JobCancelled(Exception):
+    """
+    This exception stops the computation of a job that was cancelled.
+    """
+    pass
+
+
+class BackgroundJob:
+    """
+    This is a class for a computation that runs on a worker thread and is applied to the scene on the main thread.
+        Attributes:
+            name (str): Name shown while the job runs.
+            compute (function): Receives the job and returns the result, runs on the worker thread.
+            apply (function): Receives the result and edits the scene, runs on the main thread.
+            cleanup (function): Undoes what was prepared for the job if it doesn't finish, runs on the main thread.
+            notify (function): Receives the job and the fraction done whenever the progress changes.
+            cancelEvent (threading.Event): Set when the job is cancelled.
+            fraction (float): Fraction of the computation done, from 0 to 1.
+    """
+
+    def __init__(self, name, compute, apply, cleanup=None, notify=None):
+        """
+        The constructor of BackgroundJob class
+            Parameters:
+                name (str): Name shown while the job runs.
+                compute (function): Receives the job and returns the result, runs on the worker thread.
+                apply (function): Receives the result and edits the scene, runs on the main thread.
+                cleanup (function): Runs on the main thread if the job doesn't finish. Default does nothing
+                notify (function): Receives the job and the fraction done. Default doesn't report the progress
+        """
+        self.name = name
+        self.compute = compute
+        self.apply = apply
+        self.cleanup = cleanup
+        self.notify = notify
+        self.cancelEvent = threading.Event()
+        self.fraction = 0.0
+
+    @property
+    def cancelled(self):
+        return self.cancelEvent.is_set()
+
+    def cancel(self):
+        """
+        This function asks the job to stop, the computation stops the next time it reports its progress.
+        """
+        self.cancelEvent.set()
+
+    def check(self):
+        """
+        This function stops the computation if the job was cancelled.
+        """
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def report(self, done, total=1.0):
+        """
+        This function saves the progress of the computation, it is called from the worker thread.
+        Only changes of at least a percent are notified, so the main thread isn't flooded.
+            Parameters:
+                done (float): Amount of work done.
+                total (float): Amount of work of the whole computation. Default to 1
+        """
+        self.check()
+
+        fraction = min(max(float(done) / total, 0.0), 1.0) if total else 1.0
+        if self.notify is not None and (fraction - self.fraction >= 0.01 or fraction == 1.0):
+            self.notify(self, fraction)
+        self.fraction = fraction
+
+    def stage(self, first, last):
+        """
+        This function returns a progress function for a part of the computation.
+            Parameters:
+                first (float): Fraction of the whole computation done when the part starts.
+                last (float): Fraction of the whole computation done when the part ends.
+            Returns:
+                progress (function): Receives the work done and the total of the part.
+        """
+        def progress(done, total=1.0):
+            self.report(first + (last - first) * (float(done) / total if total else 1.0))
+
+        return progress
+
+
+class JobRunner:
+    """
+    This is a class for running one background job at a time, a new job cancels the one that is running.
+        Attributes:
+            dispatch (function): Runs a function without parameters on the main thread.
+            onProgress (function): Receives the name of the job and the fraction done, on the main thread.
+            onFinish (function): Receives the name of the job and one of JOB_STATES, on the main thread.
+            executor (ThreadPoolExecutor): The worker thread.
+            job (BackgroundJob): The job that is running. None if there is no job
+    """
+
+    def __init__(self, dispatch, on_progress=None, on_finish=None):
+        """
+        The constructor of JobRunner class
+            Parameters:
+                dispatch (function): Runs a function without parameters on the main thread.
+                on_progress (function): Receives the name of the job and the fraction done. Default ignores it
+                on_finish (function): Receives the name of the job and its final state. Default ignores it
+        """
+        self.dispatch = dispatch
+        self.onProgress = on_progress
+        self.onFinish = on_finish
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.job = None
+
+    @property
+    def busy(self):
+        return self.job is not None
+
+    def submit(self, name, compute, apply, cleanup=None):
+        """
+        This function starts a job, the job that was running is cancelled.
+            Parameters:
+                name (str): Name shown while the job runs.
+                compute (function): Receives the job and returns the result, runs on the worker thread.
+                apply (function): Receives the result and edits the scene, runs on the main thread.
+                cleanup (function): Runs on the main thread if the job doesn't finish. Default does nothing
+            Returns:
+                job (BackgroundJob): The job started.
+        """
+        self.cancel()
+
+        job = BackgroundJob(name, compute, apply, cleanup, self.notify)
+        self.job = job
+        logger.debug("Starting {} in the background".format(name))
+        self.executor.submit(self.run, job)
+
+        return job
+
+    def cancel(self):
+        """
+        This function cancels the job that is running, its cleanup runs when the worker thread stops.
+        """
+        if self.job is not None:
+            logger.info("Cancelling {}".format(self.job.name))
+            self.job.cancel()
+
+    def notify(self, job, fraction):
+        """
+        This function sends the progress of a job to the main thread, it is called from the worker thread.
+            Parameters:
+                job (BackgroundJob): The job that made progress.
+                fraction (float): Fraction of the computation done.
+        """
+        if self.onProgress is not None:
+            self.dispatch(lambda: self.onProgress(job.name, fraction))
+
+    def run(self, job):
+        """
+        This function computes a job on the worker thread and sends its result to the main thread.
+            Parameters:
+                job (BackgroundJob): The job to compute.
+        """
+        try:
+            result = job.compute(job)
+        except JobCancelled:
+            self.dispatch(lambda: self.finish(job, "Cancelled"))
+        except Exception:
+            logger.exception("{} failed".format(job.name))
+            self.dispatch(lambda: self.finish(job, "Failed"))
+        else:
+            self.dispatch(lambda: self.finish(job, "Done", result))
+
+    def finish(self, job, state, result=None):
+        """
+        This function applies the result of a job or cleans up after it, on the main thread.
+            Parameters:
+                job (BackgroundJob): The job that ended.
+                state (str): One of JOB_STATES.
+                result (object): What the computation returned. Default to None
+        """
+        # It could be cancelled after the computation ended
+        if state == "Done" and job.cancelled:
+            state = "Cancelled"
+
+        try:
+            if state == "Done":
+                job.apply(result)
+            elif job.cleanup is not None:
+                job.cleanup()
+        except Exception:
+            logger.exception("{} failed".format(job.name))
+            state = "Failed"
+
+        if self.job is job:
+            self.job = None
+
+        logger.debug("{} ended: {}".format(job.name, state))
+        if self.onFinish is not None:
+            self.onFinish(job.name, state)
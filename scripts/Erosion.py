@@ -0,0 +1,288 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+"""
+    Erosion of the heightfields of the Terrain Generator.
+    Thermal erosion moves material down the slopes that are steeper than the talus angle, hydraulic erosion
+    rains on the terrain, lets the water dissolve material and carry it downhill before depositing it.
+    Every iteration updates the whole heightfield with array operations over its 4 neighbours.
+    A vertex only depends on the vertices up to two cells away on each iteration, so big heightfields can be
+    eroded by tiles with a halo on several threads, numpy releases the GIL while it runs.
+    by Daniel Orozco
+"""
+
+# Erosion modes, "Both" runs a hydraulic and a thermal step on every iteration
+EROSION_MODES = ["None", "Thermal", "Hydraulic", "Both"]
+
+# Settings of erode_heightfield
+DEFAULT_EROSION = {"mode": "None", "iterations": 50, "talus": 0.8, "thermalRate": 0.5, "rain": 0.01,
+                   "solubility": 0.01, "evaporation": 0.5, "capacity": 0.01}
+
+# Divisor used instead of zero, only where the dividend is zero too
+TINY = 1e-12
+
+# Iterations computed by the tiles between two exchanges of their borders
+ROUND_ITERATIONS = 8
+
+
+def scratch(buffers, name, shape):
+    """
+    This function returns an array that is reused by every iteration instead of allocating a new one.
+        Parameters:
+            buffers (dict of {str:numpy.ndarray}): Arrays kept between iterations, a missing one is created.
+            name (str): Name of the array.
+            shape (tuple of int): Shape of the array.
+        Returns:
+            array (numpy.ndarray): The array with any value in it.
+    """
+    array = buffers.get(name)
+    if array is None or array.shape != shape:
+        array = buffers[name] = np.empty(shape, dtype=np.float32)
+
+    return array
+
+
+def edge_excesses(values, threshold, buffers):
+    """
+    This function compares every vertex with its neighbour below and its neighbour to the right.
+    Differences are kept by edge instead of by vertex, so each one is computed once for both vertices.
+        Parameters:
+            values (numpy.ndarray): Value of every vertex.
+            threshold (float): Difference that is not counted.
+            buffers (dict of {str:numpy.ndarray}): Arrays reused by every iteration.
+        Returns:
+            up (numpy.ndarray): Excess of every vertex over the one above it, rows from 1.
+            down (numpy.ndarray): Excess of every vertex over the one below it, rows until the last one.
+            left (numpy.ndarray): Excess of every vertex over the one to its left, columns from 1.
+            right (numpy.ndarray): Excess of every vertex over the one to its right, columns until the last one.
+    """
+    rows, columns = values.shape
+    excesses = []
+    for name, before, after, shape in (("vertical", values[:-1], values[1:], (rows - 1, columns)),
+                                       ("horizontal", values[:, :-1], values[:, 1:], (rows, columns - 1))):
+        difference = np.subtract(after, before, out=scratch(buffers, name, shape))
+
+        rising = np.subtract(difference, threshold, out=scratch(buffers, name + "Rising", shape))
+        np.maximum(rising, 0.0, out=rising)
+
+        falling = np.negative(difference, out=scratch(buffers, name + "Falling", shape))
+        falling -= threshold
+        np.maximum(falling, 0.0, out=falling)
+
+        excesses.extend((rising, falling))
+
+    return tuple(excesses)
+
+
+def vertex_sum(up, down, left, right, out, combine=np.add):
+    """
+    This function combines the edge values that every vertex sends to its 4 neighbours.
+        Parameters:
+            up, down, left, right (numpy.ndarray): Edge values returned by edge_excesses.
+            out (numpy.ndarray): Array that receives the combined value of every vertex.
+            combine (numpy.ufunc): Function that combines the values. Default adds them
+        Returns:
+            values (numpy.ndarray): Combined value of every vertex, the same array as out.
+    """
+    out.fill(0.0)
+    combine(out[1:], up, out=out[1:])
+    combine(out[:-1], down, out=out[:-1])
+    combine(out[:, 1:], left, out=out[:, 1:])
+    combine(out[:, :-1], right, out=out[:, :-1])
+
+    return out
+
+
+def move(values, up, down, left, right, share, buffers):
+    """
+    This function moves a share of the edge values of every vertex to its neighbours.
+    Nothing leaves through the border of the heightfield, so the sum of the values doesn't change.
+        Parameters:
+            values (numpy.ndarray): Value of every vertex, it is modified in place.
+            up, down, left, right (numpy.ndarray): Edge values returned by edge_excesses.
+            share (numpy.ndarray): Fraction of its edge values that every vertex sends.
+            buffers (dict of {str:numpy.ndarray}): Arrays reused by every iteration.
+    """
+    # Net amount that goes from each row to the row above, and from each column to the column on its left
+    vertical = np.multiply(up, share[1:], out=scratch(buffers, "verticalMoved", up.shape))
+    vertical -= np.multiply(down, share[:-1], out=scratch(buffers, "verticalBack", up.shape))
+    values[:-1] += vertical
+    values[1:] -= vertical
+
+    horizontal = np.multiply(left, share[:, 1:], out=scratch(buffers, "horizontalMoved", left.shape))
+    horizontal -= np.multiply(right, share[:, :-1], out=scratch(buffers, "horizontalBack", left.shape))
+    values[:, :-1] += horizontal
+    values[:, 1:] -= horizontal
+
+
+def thermal_step(state, settings, buffers):
+    """
+    This function runs an iteration of thermal erosion, material over the talus slope slides to the lower neighbours.
+        Parameters:
+            state (dict of {str:numpy.ndarray}): The heights, they are modified in place.
+            settings (dict): Talus slope, rate and size of a cell.
+            buffers (dict of {str:numpy.ndarray}): Arrays reused by every iteration.
+    """
+    heights = state["heights"]
+    excesses = edge_excesses(heights, settings["talus"] * settings["cellSize"], buffers)
+    total = vertex_sum(*excesses, out=scratch(buffers, "total", heights.shape))
+    steepest = vertex_sum(*excesses, out=scratch(buffers, "share", heights.shape), combine=np.maximum)
+
+    # Move half of the steepest excess so the vertex doesn't end below its neighbours
+    share = np.multiply(steepest, 0.5 * settings["thermalRate"], out=steepest)
+    share /= np.maximum(total, TINY, out=total)
+
+    move(heights, *excesses, share=share, buffers=buffers)
+
+
+def hydraulic_step(state, settings, buffers):
+    """
+    This function runs an iteration of hydraulic erosion.
+    Rain dissolves material, water flows to the neighbours with a lower surface carrying the dissolved sediment,
+    and the sediment that the water can't carry after evaporating is deposited.
+        Parameters:
+            state (dict of {str:numpy.ndarray}): The heights, water and sediment, they are modified in place.
+            settings (dict): Rain, solubility, evaporation and capacity of the water.
+            buffers (dict of {str:numpy.ndarray}): Arrays reused by every iteration.
+    """
+    heights, water, sediment = state["heights"], state["water"], state["sediment"]
+
+    # Rain and dissolve material
+    water += settings["rain"]
+    dissolved = np.multiply(water, settings["solubility"], out=scratch(buffers, "exchanged", heights.shape))
+    heights -= dissolved
+    sediment += dissolved
+
+    # Water flows to the lower neighbours, proportionally to the difference of the water surface
+    surface = np.add(heights, water, out=scratch(buffers, "surface", heights.shape))
+    differences = edge_excesses(surface, 0.0, buffers)
+    total = vertex_sum(*differences, out=scratch(buffers, "total", heights.shape))
+
+    # Half of the difference levels both surfaces, the water that leaves can't be more than the water there
+    water_share = np.multiply(total, 0.5, out=scratch(buffers, "share", heights.shape))
+    np.minimum(water, water_share, out=water_share)
+    water_share /= np.maximum(total, TINY, out=total)
+    sediment_share = np.maximum(water, TINY, out=surface)
+    np.divide(sediment, sediment_share, out=sediment_share)
+    sediment_share *= water_share
+
+    move(water, *differences, share=water_share, buffers=buffers)
+    move(sediment, *differences, share=sediment_share, buffers=buffers)
+
+    # Evaporate and deposit the sediment over the capacity of the water left
+    water *= 1.0 - settings["evaporation"]
+    deposited = np.multiply(water, settings["capacity"], out=dissolved)
+    np.subtract(sediment, deposited, out=deposited)
+    np.maximum(deposited, 0.0, out=deposited)
+    sediment -= deposited
+    heights += deposited
+
+
+def erosion_steps(mode):
+    """
+    This function returns the steps run on every iteration of an erosion mode.
+        Parameters:
+            mode (str): One of EROSION_MODES.
+        Returns:
+            steps (list of function): The steps in the order they run.
+    """
+    if mode not in EROSION_MODES:
+        raise ValueError("Unknown erosion mode '{}', use one of {}".format(mode, EROSION_MODES))
+
+    return {"None": [], "Thermal": [thermal_step], "Hydraulic": [hydraulic_step],
+            "Both": [hydraulic_step, thermal_step]}[mode]
+
+
+def erode_heightfield(heightfield, cell_size=1.0, erosion=None, workers=1, tile_size=256, progress=None):
+    """
+    This function erodes a heightfield.
+    With several workers the heightfield is split in tiles that are eroded by threads, ROUND_ITERATIONS at a time.
+    Each tile is computed with a halo wide enough to get the same result as eroding the whole heightfield.
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex, it is not modified.
+            cell_size (float): Distance between two neighbour vertices. Default to 1
+            erosion (dict): Mode, iterations, talus, thermalRate, rain, solubility, evaporation and capacity.
+                            Rain is relative to the height range of the heightfield. Default uses DEFAULT_EROSION
+            workers (int): Amount of threads used to erode the tiles. Default erodes the whole heightfield at once
+            tile_size (int): Amount of rows and columns of each tile. Default to 256
+            progress (function): Receives the iterations done and the total after each iteration or round of tiles,
+                                 an exception raised by it stops the erosion. Default doesn't report it
+        Returns:
+            heightfield (numpy.ndarray): The eroded heightfield.
+    """
+    settings = dict(DEFAULT_EROSION, **(erosion or {}))
+    steps = erosion_steps(settings["mode"])
+    iterations = int(settings["iterations"]) if steps else 0
+
+    # Rain is relative to the height range, so the same settings erode low and high terrains alike
+    heights = np.array(heightfield, dtype=np.float32)
+    settings["cellSize"] = cell_size
+    settings["rain"] = settings["rain"] * max(float(heights.max() - heights.min()), 1e-9) if heights.size else 0.0
+
+    state = {"heights": heights, "water": np.zeros_like(heights), "sediment": np.zeros_like(heights)}
+    buffers = {}
+
+    if workers > 1 and max(heights.shape) > tile_size:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            done = 0
+            while done < iterations:
+                round_iterations = min(ROUND_ITERATIONS, iterations - done)
+                state = erode_tiles(state, steps, settings, round_iterations, tile_size, executor)
+                done += round_iterations
+                if progress is not None:
+                    progress(done, iterations)
+    else:
+        for iteration in range(iterations):
+            for step in steps:
+                step(state, settings, buffers)
+            if progress is not None:
+                progress(iteration + 1, iterations)
+
+    # The sediment still carried by the water stays where it is
+    return (state["heights"] + state["sediment"]).astype(np.float64)
+
+
+def erode_tiles(state, steps, settings, iterations, tile_size, executor):
+    """
+    This function runs some iterations of erosion on every tile of a heightfield.
+    Every step reads the neighbours of the neighbours of a vertex, so the tiles read a halo of two vertices
+    per step and iteration. The halo is discarded, only the inside of each tile is kept.
+        Parameters:
+            state (dict of {str:numpy.ndarray}): The heights, water and sediment of the whole heightfield.
+            steps (list of function): Steps of each iteration.
+            settings (dict): Settings used by the steps.
+            iterations (int): Amount of iterations.
+            tile_size (int): Amount of rows and columns of each tile.
+            executor (concurrent.futures.Executor): Executor that erodes the tiles.
+        Returns:
+            state (dict of {str:numpy.ndarray}): The new heights, water and sediment.
+    """
+    rows, columns = state["heights"].shape
+    halo = 2 * len(steps) * iterations
+    new_state = dict((name, np.empty_like(values)) for name, values in state.items())
+
+    def erode_tile(first_row, first_column):
+        # Copy the tile with its halo, the halo is clipped on the borders of the heightfield
+        top, left = max(first_row - halo, 0), max(first_column - halo, 0)
+        bottom, right = min(first_row + tile_size + halo, rows), min(first_column + tile_size + halo, columns)
+        tile_state = dict((name, values[top:bottom, left:right].copy()) for name, values in state.items())
+        buffers = {}
+
+        for _ in range(iterations):
+            for step in steps:
+                step(tile_state, settings, buffers)
+
+        # Keep only the inside of the tile
+        last_row, last_column = min(first_row + tile_size, rows), min(first_column + tile_size, columns)
+        for name, values in tile_state.items():
+            new_state[name][first_row:last_row, first_column:last_column] = \
+                values[first_row - top:last_row - top, first_column - left:last_column - left]
+
+    futures = [executor.submit(erode_tile, first_row, first_column)
+               for first_row in range(0, rows, tile_size) for first_column in range(0, columns, tile_size)]
+
+    # Raise errors from the threads
+    for future in futures:
+        future.result()
+
+    return new_state
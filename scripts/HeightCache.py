@@ -0,0 +1,238 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+"""
+    Cache of computed heightfields for the Terrain Generator.
+    Heightfields are addressed by a hash of every parameter used to compute them. The most recent ones are kept
+    in memory, the ones evicted from memory are saved as .npy files and read back through a memory map.
+    Both tiers have a byte budget, the least recently used heightfields are evicted first.
+    A lock keeps the cache consistent when a background job and the main thread use it at the same time.
+    by Daniel Orozco
+"""
+
+# Version of the algorithms that compute the heightfields, part of every key.
+# Increase it when a noise, falloff or heightmap change gives different heights for the same parameters,
+# so the heightfields saved on disk by older versions are never returned.
+CACHE_VERSION = 2
+
+
+class HeightfieldCache:
+    """
+    This is a class for caching heightfields with a bounded memory tier and a disk tier.
+        Attributes:
+            maxBytes (int): Max amount of bytes kept in memory before moving heightfields to disk.
+            maxDiskBytes (int): Max amount of bytes kept on disk before deleting the oldest heightfields.
+            cacheDirectory (str): Folder where the evicted heightfields are saved. None to discard them
+            memoryEntries (OrderedDict of {str:numpy.ndarray}): Heightfields in memory, least recently used first.
+            memoryBytes (int): Amount of bytes used by the heightfields in memory.
+            hits (int): Amount of heightfields found in the cache.
+            misses (int): Amount of heightfields that had to be computed.
+            lock (threading.RLock): Held while the tiers are read or modified.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, cache_directory="", max_disk_bytes=1024 * 1024 * 1024):
+        """
+        The constructor of HeightfieldCache class
+            Parameters:
+                max_bytes (int): Max amount of bytes kept in memory. Default to 256 MB
+                cache_directory (str): Folder for the disk tier. Default uses a folder in the temp directory,
+                                       None disables the disk tier
+                max_disk_bytes (int): Max amount of bytes kept on disk, shared by every session that uses the
+                                      folder. Default to 1 GB
+        """
+        self.maxBytes = max_bytes
+        self.maxDiskBytes = max_disk_bytes
+        self.cacheDirectory = cache_directory
+        if cache_directory == "":
+            self.cacheDirectory = os.path.join(tempfile.gettempdir(), "TerrainGeneratorCache")
+
+        self.memoryEntries = OrderedDict()
+        self.memoryBytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        # Heightfields are computed without holding it, so a slow one doesn't block the other threads
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def make_key(parameters):
+        """
+        This function creates the key of a heightfield from the parameters used to compute it and CACHE_VERSION.
+            Parameters:
+                parameters (dict): Every value that changes the heightfield, they have to be JSON serializable.
+            Returns:
+                key (str): Hash of the parameters.
+        """
+        # Sorted keys so the same parameters always create the same key
+        description = json.dumps({"version": CACHE_VERSION, "parameters": parameters}, sort_keys=True,
+                                 separators=(",", ":"))
+
+        return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+    def disk_path(self, key):
+        """
+        This function returns the file used to save a heightfield on disk.
+            Parameters:
+                key (str): The key of the heightfield.
+            Returns:
+                path (str): Path of the .npy file. None if the disk tier is disabled
+        """
+        if self.cacheDirectory is None:
+            return None
+
+        return os.path.join(self.cacheDirectory, key + ".npy")
+
+    def get(self, key):
+        """
+        This function looks for a heightfield in memory and then on disk.
+            Parameters:
+                key (str): The key of the heightfield.
+            Returns:
+                heightfield (numpy.ndarray): Read only heightfield, memory mapped if it was on disk.
+                                             None if it is not in the cache
+        """
+        with self.lock:
+            if key in self.memoryEntries:
+                # Mark as the most recently used
+                self.memoryEntries.move_to_end(key)
+                self.hits += 1
+                return self.memoryEntries[key]
+
+            path = self.disk_path(key)
+            if path and os.path.exists(path):
+                try:
+                    # The modification time marks the most recently used files on disk
+                    os.utime(path)
+                    heightfield = np.load(path, mmap_mode="r")
+                except (OSError, ValueError):
+                    # Deleted by another session or partially removed
+                    heightfield = None
+
+                if heightfield is not None:
+                    self.hits += 1
+                    return heightfield
+
+            self.misses += 1
+            return None
+
+    def put(self, key, heightfield):
+        """
+        This function saves a heightfield in memory, moving the least recently used ones to disk if needed.
+            Parameters:
+                key (str): The key of the heightfield.
+                heightfield (numpy.ndarray): The heightfield to save.
+            Returns:
+                heightfield (numpy.ndarray): Read only version of the saved heightfield.
+        """
+        with self.lock:
+            if key in self.memoryEntries:
+                self.memoryBytes -= self.memoryEntries.pop(key).nbytes
+
+            # Keep a read only array so the cached values can't be modified by accident
+            heightfield = np.array(heightfield, dtype=np.float64)
+            heightfield.setflags(write=False)
+
+            self.memoryEntries[key] = heightfield
+            self.memoryBytes += heightfield.nbytes
+
+            # Evict least recently used entries, the newest one is kept even if it is bigger than the limit
+            while self.memoryBytes > self.maxBytes and len(self.memoryEntries) > 1:
+                evicted_key, evicted = self.memoryEntries.popitem(last=False)
+                self.memoryBytes -= evicted.nbytes
+                self.spill(evicted_key, evicted)
+
+            return heightfield
+
+    def spill(self, key, heightfield):
+        """
+        This function saves a heightfield on disk.
+            Parameters:
+                key (str): The key of the heightfield.
+                heightfield (numpy.ndarray): The heightfield to save.
+        """
+        path = self.disk_path(key)
+        if not path or os.path.exists(path):
+            return
+
+        if not os.path.isdir(self.cacheDirectory):
+            os.makedirs(self.cacheDirectory)
+
+        # Write in a temporary file first so other sessions never read a partial file
+        temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary_path, "wb") as temporary_file:
+            np.save(temporary_file, heightfield)
+        os.replace(temporary_path, path)
+
+        self.trim_disk()
+
+    def trim_disk(self):
+        """
+        This function deletes the least recently used heightfields on disk until they fit in maxDiskBytes.
+        """
+        files = []
+        for file_name in os.listdir(self.cacheDirectory):
+            if not file_name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cacheDirectory, file_name)
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            files.append((status.st_mtime, status.st_size, path))
+
+        disk_bytes = sum(size for _, size, _ in files)
+
+        # Oldest first, files that are in use by another session can't be deleted everywhere so they are skipped
+        for _, size, path in sorted(files):
+            if disk_bytes <= self.maxDiskBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            disk_bytes -= size
+
+    def get_or_compute(self, parameters, compute, store=True):
+        """
+        This function returns a cached heightfield or computes and caches it.
+            Parameters:
+                parameters (dict): Every value that changes the heightfield.
+                compute (function): Function without arguments that computes the heightfield.
+                store (bool): False for heightfields that will never be asked again, like the ones of random
+                              seeds. They are computed without using the cache. Default to True
+            Returns:
+                heightfield (numpy.ndarray): Read only heightfield.
+        """
+        if not store:
+            heightfield = np.array(compute(), dtype=np.float64)
+            heightfield.setflags(write=False)
+            return heightfield
+
+        key = self.make_key(parameters)
+
+        heightfield = self.get(key)
+        if heightfield is None:
+            heightfield = self.put(key, compute())
+
+        return heightfield
+
+    def clear(self, disk=False):
+        """
+        This function empties the cache.
+            Parameters:
+                disk (bool): True to also delete the heightfields saved on disk.
+        """
+        with self.lock:
+            self.memoryEntries.clear()
+            self.memoryBytes = 0
+
+            if disk and self.cacheDirectory and os.path.isdir(self.cacheDirectory):
+                for file_name in os.listdir(self.cacheDirectory):
+                    if file_name.endswith(".npy"):
+                        os.remove(os.path.join(self.cacheDirectory, file_name))
@@ -0,0 +1,265 @@
+import numpy as np
+
+"""
+    Array operations over the heightfields used by the Terrain Generator.
+    A heightfield is an array of shape (subdivisions+1, subdivisions+1) where index [x, y] is the
+    vertex x * (subdivisions + 1) + y of the grid.
+    by Daniel Orozco
+"""
+
+
+def parse_falloff_curve(curve):
+    """
+    This function reads a soft selection falloff curve in the format used by Maya's softSelect command.
+        Parameters:
+            curve (str): Groups of value, position and interpolation separated by commas, like "1,0,2,0,1,2"
+        Returns:
+            positions (numpy.ndarray): Position of each key sorted from 0 to 1
+            values (numpy.ndarray): Value of each key
+            interpolations (numpy.ndarray): Interpolation used from each key to the next one.
+                                            0 is none, 1 is linear, 2 is smooth and 3 is spline
+    """
+    keys = np.array([float(value) for value in curve.split(",")]).reshape(-1, 3)
+
+    # Keys can be given in any order
+    keys = keys[np.argsort(keys[:, 1], kind="stable")]
+
+    return keys[:, 1], keys[:, 0], keys[:, 2].astype(int)
+
+
+def evaluate_falloff_curve(curve, distances):
+    """
+    This function evaluates a falloff curve for normalized distances.
+        Parameters:
+            curve (str): Falloff curve in the format used by Maya's softSelect command.
+            distances (numpy.ndarray): Distances divided by the falloff radius.
+        Returns:
+            weights (numpy.ndarray): Weight of each distance, zero for distances greater than 1
+    """
+    positions, values, interpolations = parse_falloff_curve(curve)
+    distances = np.asarray(distances, dtype=np.float64)
+
+    # Find the key where each distance starts and how far it is from the next key
+    key = np.clip(np.searchsorted(positions, distances, side="right") - 1, 0, len(positions) - 1)
+    next_key = np.minimum(key + 1, len(positions) - 1)
+    span = positions[next_key] - positions[key]
+    alpha = np.clip((distances - positions[key]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+
+    # Ease the local position depending on the interpolation of the key
+    interpolation = interpolations[key]
+    alpha = np.where(interpolation == 0, 0.0, alpha)
+    alpha = np.where(interpolation == 2, alpha**2 * (3 - 2 * alpha), alpha)
+
+    weights = values[key] * (1 - alpha) + values[next_key] * alpha
+
+    # Spline keys use a Catmull-Rom curve through the neighbouring keys
+    spline = interpolation == 3
+    if spline.any():
+        previous_value = values[np.maximum(key - 1, 0)]
+        following_value = values[np.minimum(key + 2, len(positions) - 1)]
+        spline_weights = 0.5 * (2 * values[key] +
+                                (values[next_key] - previous_value) * alpha +
+                                (2 * previous_value - 5 * values[key] + 4 * values[next_key] - following_value)
+                                * alpha**2 +
+                                (3 * values[key] - previous_value - 3 * values[next_key] + following_value)
+                                * alpha**3)
+        weights = np.where(spline, spline_weights, weights)
+
+    # Before the first key and after the last one the curve keeps their value
+    weights = np.where(distances <= positions[0], values[0], weights)
+    weights = np.where(distances >= positions[-1], values[-1], weights)
+
+    # Nothing outside the radius is affected
+    return np.where(distances > 1.0, 0.0, weights)
+
+
+def soft_selection_field(subdivisions, dimensions, bumps, row_offset=0, column_offset=0):
+    """
+    This function adds the displacement of several soft selection moves on a grid analytically.
+    Each move only evaluates the vertices inside its radius.
+    The offsets allow evaluating a tile of a bigger grid, moves close to a border also affect the next tile.
+        Parameters:
+            subdivisions (int): Amount of subdivisions of the grid.
+            dimensions (float): Width and height of the grid.
+            bumps (list of (int, int, float, float, str)): Row, column, height, falloff radius and falloff curve
+                                                          of every move.
+            row_offset (int): Global index of the first row of the grid. Default to 0
+            column_offset (int): Global index of the first column of the grid. Default to 0
+        Returns:
+            heightfield (numpy.ndarray): Displacement of every vertex in Y.
+    """
+    heightfield = np.zeros((subdivisions + 1, subdivisions + 1))
+
+    # Distance between two neighbour vertices
+    spacing = dimensions * 1.0 / subdivisions
+
+    for row, column, height, radius, curve in bumps:
+        # Position of the moved vertex inside this grid
+        row -= row_offset
+        column -= column_offset
+
+        # Window of vertices that can be reached by the radius
+        reach = int(abs(radius) / spacing) + 1
+        first_row, last_row = max(row - reach, 0), min(row + reach, subdivisions) + 1
+        first_column, last_column = max(column - reach, 0), min(column + reach, subdivisions) + 1
+
+        # The move doesn't reach this grid
+        if first_row >= last_row or first_column >= last_column:
+            continue
+
+        # Distance from every vertex in the window to the moved vertex
+        rows = (np.arange(first_row, last_row) - row) * spacing
+        columns = (np.arange(first_column, last_column) - column) * spacing
+        distances = np.hypot(rows[:, np.newaxis], columns[np.newaxis, :]) / max(abs(radius), 1e-9)
+
+        heightfield[first_row:last_row, first_column:last_column] += height * evaluate_falloff_curve(curve,
+                                                                                                     distances)
+
+    return heightfield
+
+
+def sample_heightfield(heightfield, width, depth, positions_x, positions_z):
+    """
+    This function reads the height of a terrain at several positions with bilinear interpolation.
+    The terrain is centered in the origin, row 0 is the border in positive Z and column 0 the border in negative X.
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex of the terrain.
+            width (float): Size of the terrain in X.
+            depth (float): Size of the terrain in Z.
+            positions_x (numpy.ndarray): Position of each sample in X.
+            positions_z (numpy.ndarray): Position of each sample in Z.
+        Returns:
+            heights (numpy.ndarray): Height of the terrain at each position, positions outside use the border.
+    """
+    rows, columns = heightfield.shape
+
+    # Position of each sample in vertices
+    column = np.clip((np.asarray(positions_x, dtype=np.float64) / width + 0.5) * (columns - 1), 0, columns - 1)
+    row = np.clip((0.5 - np.asarray(positions_z, dtype=np.float64) / depth) * (rows - 1), 0, rows - 1)
+
+    left = np.minimum(np.floor(column).astype(np.intp), max(columns - 2, 0))
+    top = np.minimum(np.floor(row).astype(np.intp), max(rows - 2, 0))
+    right = np.minimum(left + 1, columns - 1)
+    bottom = np.minimum(top + 1, rows - 1)
+    alpha_x = column - left
+    alpha_z = row - top
+
+    upper = heightfield[top, left] * (1 - alpha_x) + heightfield[top, right] * alpha_x
+    lower = heightfield[bottom, left] * (1 - alpha_x) + heightfield[bottom, right] * alpha_x
+
+    return upper * (1 - alpha_z) + lower * alpha_z
+
+
+def sample_normals(heightfield, width, depth, positions_x, positions_z):
+    """
+    This function computes the normal of a terrain at several positions with central differences.
+        Parameters:
+            Same as sample_heightfield.
+        Returns:
+            normals (numpy.ndarray): Array of shape (samples, 3) with the unit normal at each position.
+    """
+    rows, columns = heightfield.shape
+    positions_x = np.asarray(positions_x, dtype=np.float64)
+    positions_z = np.asarray(positions_z, dtype=np.float64)
+
+    # Differences are taken one vertex away on each side
+    step_x = width / max(columns - 1, 1)
+    step_z = depth / max(rows - 1, 1)
+
+    slope_x = (sample_heightfield(heightfield, width, depth, positions_x + step_x, positions_z) -
+               sample_heightfield(heightfield, width, depth, positions_x - step_x, positions_z)) / (2 * step_x)
+    slope_z = (sample_heightfield(heightfield, width, depth, positions_x, positions_z + step_z) -
+               sample_heightfield(heightfield, width, depth, positions_x, positions_z - step_z)) / (2 * step_z)
+
+    normals = np.stack([-slope_x, np.ones_like(slope_x), -slope_z], axis=-1)
+
+    return normals / np.linalg.norm(normals, axis=-1, keepdims=True)
+
+
+def normal_rotations(normals):
+    """
+    This function computes the rotation that aims the Y axis of an object along each normal.
+    The X axis is kept as close as possible to the world up, like Maya's normalConstraint with
+    aimVector (0, 1, 0), upVector (1, 0, 0) and worldUpType scene.
+        Parameters:
+            normals (numpy.ndarray): Array of shape (samples, 3) with unit normals.
+        Returns:
+            rotations (numpy.ndarray): Array of shape (samples, 3) with Euler angles in degrees, XYZ rotate order.
+    """
+    axis_y = np.asarray(normals, dtype=np.float64)
+
+    # World up without its component along the normal, any perpendicular axis if they are parallel
+    axis_x = np.array([0.0, 1.0, 0.0]) - axis_y[:, 1:2] * axis_y
+    length = np.linalg.norm(axis_x, axis=-1, keepdims=True)
+    fallback = np.array([1.0, 0.0, 0.0]) - axis_y[:, 0:1] * axis_y
+    axis_x = np.where(length > 1e-6, axis_x, fallback)
+    axis_x /= np.linalg.norm(axis_x, axis=-1, keepdims=True)
+    axis_z = np.cross(axis_x, axis_y)
+
+    # Rows of the rotation matrix are the axes, decompose it for the XYZ rotate order
+    rotate_y = np.arcsin(np.clip(-axis_x[:, 2], -1.0, 1.0))
+    rotate_z = np.arctan2(axis_x[:, 1], axis_x[:, 0])
+    rotate_x = np.arctan2(axis_y[:, 2], axis_z[:, 2])
+
+    return np.degrees(np.stack([rotate_x, rotate_y, rotate_z], axis=-1))
+
+
+def resample_axis(heightfield, vertices, axis):
+    """
+    This function resamples a heightfield along one axis with linear interpolation, the borders are kept.
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex.
+            vertices (int): Amount of vertices along the axis after resampling.
+            axis (int): 0 for the rows, 1 for the columns.
+        Returns:
+            heightfield (numpy.ndarray): The resampled heightfield.
+    """
+    source_vertices = heightfield.shape[axis]
+    positions = np.linspace(0, source_vertices - 1, vertices)
+
+    first = np.minimum(np.floor(positions).astype(np.intp), max(source_vertices - 2, 0))
+    second = np.minimum(first + 1, source_vertices - 1)
+    alpha = positions - first
+    if axis == 0:
+        alpha = alpha[:, np.newaxis]
+
+    return np.take(heightfield, first, axis=axis) * (1 - alpha) + np.take(heightfield, second, axis=axis) * alpha
+
+
+def downsample_heightfield(heightfield, subdivisions):
+    """
+    This function reduces a square heightfield to fewer subdivisions.
+    Heights are smoothed with a [1, 2, 1] filter before resampling, so details smaller than the new cells don't
+    alias. Border rows and columns are only smoothed along themselves, so tiles that share a border still match.
+    Halving the subdivisions keeps every other vertex of the smoothed heightfield.
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex.
+            subdivisions (int): Amount of subdivisions of the reduced heightfield.
+        Returns:
+            heightfield (numpy.ndarray): Array of shape (subdivisions+1, subdivisions+1).
+    """
+    smoothed = np.array(heightfield, dtype=np.float64)
+
+    if smoothed.shape[0] > 2:
+        smoothed[1:-1] = (smoothed[:-2] + 2 * smoothed[1:-1] + smoothed[2:]) / 4.0
+    if smoothed.shape[1] > 2:
+        smoothed[:, 1:-1] = (smoothed[:, :-2] + 2 * smoothed[:, 1:-1] + smoothed[:, 2:]) / 4.0
+
+    return resample_axis(resample_axis(smoothed, subdivisions + 1, 0), subdivisions + 1, 1)
+
+
+def heightfield_pyramid(heightfield, subdivisions):
+    """
+    This function computes the levels of detail of a heightfield, each level is reduced from the previous one.
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex at full resolution.
+            subdivisions (list of int): Subdivisions of each level after the full resolution, from high to low.
+        Returns:
+            levels (list of numpy.ndarray): Heightfield of each level, without the full resolution.
+    """
+    levels = []
+    for level_subdivisions in subdivisions:
+        heightfield = downsample_heightfield(heightfield, level_subdivisions)
+        levels.append(heightfield)
+
+    return levels
@@ -0,0 +1,432 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+"""
+    Heightmap files for the Terrain Generator.
+    Heightmaps are written by blocks of rows, so big or tiled terrains never have to be kept in a single buffer,
+    and they are read only by the rows needed to resample them, so big scans are never loaded completely.
+    Supported formats are 16-bit RAW (.r16 or .raw, little endian), 8 or 16-bit grayscale PNG and NumPy (.npy).
+    Row 0 of the heightfield is the top row of the image.
+    PNG is meant for small heightmaps. Rows saved with the None, Sub or Up filters are undone with arrays, but
+    Average and Paeth depend on the byte just unfiltered, so they are undone one byte at a time and are only
+    accepted up to MAX_PNG_LOOP_PIXELS. Big heightmaps should be RAW or NumPy files, which are memory mapped.
+    by Daniel Orozco
+"""
+
+# Formats recognized by their extension
+HEIGHTMAP_FORMATS = {".r16": "r16", ".raw": "r16", ".png": "png", ".npy": "npy"}
+
+# Largest PNG, in pixels, that can use the Average and Paeth filters. A 2049x2049 heightmap takes a few seconds
+MAX_PNG_LOOP_PIXELS = 2049 * 2049
+
+
+def heightmap_format(path):
+    """
+    This function gets the format of a heightmap file from its extension.
+        Parameters:
+            path (str): Path of the heightmap.
+        Returns:
+            file_format (str): One of "r16", "png" or "npy".
+        Raises:
+            ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension not in HEIGHTMAP_FORMATS:
+        raise ValueError("Unsupported heightmap format: {}. Use one of {}".format(
+            extension, ", ".join(sorted(HEIGHTMAP_FORMATS))))
+
+    return HEIGHTMAP_FORMATS[extension]
+
+
+def to_uint16(block, height_range):
+    """
+    This function normalizes heights to the 16-bit range.
+        Parameters:
+            block (numpy.ndarray): Heights to convert.
+            height_range (tuple of float): Height that becomes 0 and height that becomes 65535.
+        Returns:
+            block (numpy.ndarray): Heights as unsigned 16-bit integers.
+    """
+    low, high = height_range
+    scale = 65535.0 / (high - low) if high > low else 0.0
+
+    return np.clip(np.rint((np.asarray(block, dtype=np.float64) - low) * scale), 0, 65535).astype(np.uint16)
+
+
+def export_heightmap(path, blocks, shape, height_range=(0.0, 1.0)):
+    """
+    This function writes a heightmap block by block.
+        Parameters:
+            path (str): Path of the heightmap, the extension selects the format.
+            blocks (iterable of numpy.ndarray): Consecutive blocks of rows, all of them with the same width.
+            shape (tuple of int): Rows and columns of the whole heightmap.
+            height_range (tuple of float): Heights mapped to 0 and 65535 in 16-bit formats. NumPy files keep
+                                           the heights as 32-bit floats.
+    """
+    file_format = heightmap_format(path)
+
+    if file_format == "r16":
+        write_r16(path, blocks, shape, height_range)
+    elif file_format == "png":
+        write_png16(path, blocks, shape, height_range)
+    else:
+        write_npy(path, blocks, shape)
+
+
+def write_r16(path, blocks, shape, height_range):
+    """
+    This function writes a 16-bit little endian RAW heightmap without header.
+        Parameters:
+            Same as export_heightmap.
+    """
+    rows_written = 0
+
+    with open(path, "wb") as heightmap_file:
+        for block in blocks:
+            to_uint16(block, height_range).astype("<u2").tofile(heightmap_file)
+            rows_written += len(block)
+
+    check_rows(rows_written, shape)
+
+
+def write_png16(path, blocks, shape, height_range):
+    """
+    This function writes a 16-bit grayscale PNG, every block is compressed into its own IDAT chunk.
+        Parameters:
+            Same as export_heightmap.
+    """
+    rows_written = 0
+    compressor = zlib.compressobj(6)
+
+    with open(path, "wb") as heightmap_file:
+        heightmap_file.write(b"\x89PNG\r\n\x1a\n")
+
+        # Width, height, 16 bits, grayscale, default compression, filter and no interlace
+        write_png_chunk(heightmap_file, b"IHDR", struct.pack(">IIBBBBB", shape[1], shape[0], 16, 0, 0, 0, 0))
+
+        for block in blocks:
+            # PNG keeps big endian values, each row starts with filter type 0
+            rows = to_uint16(block, height_range).astype(">u2").view(np.uint8).reshape(len(block), -1)
+            rows = np.hstack([np.zeros((len(block), 1), dtype=np.uint8), rows])
+
+            data = compressor.compress(rows.tobytes())
+            if data:
+                write_png_chunk(heightmap_file, b"IDAT", data)
+            rows_written += len(block)
+
+        write_png_chunk(heightmap_file, b"IDAT", compressor.flush())
+        write_png_chunk(heightmap_file, b"IEND", b"")
+
+    check_rows(rows_written, shape)
+
+
+def write_png_chunk(png_file, chunk_type, data):
+    """
+    This function writes a PNG chunk with its length and checksum.
+        Parameters:
+            png_file (file): File open for binary writing.
+            chunk_type (bytes): Four letter type of the chunk.
+            data (bytes): Content of the chunk.
+    """
+    png_file.write(struct.pack(">I", len(data)))
+    png_file.write(chunk_type)
+    png_file.write(data)
+    png_file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def write_npy(path, blocks, shape):
+    """
+    This function writes a NumPy file of 32-bit floats through a memory map.
+        Parameters:
+            Same as export_heightmap.
+    """
+    heightmap = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=tuple(shape))
+    rows_written = 0
+
+    try:
+        for block in blocks:
+            heightmap[rows_written:rows_written + len(block)] = block
+            rows_written += len(block)
+        heightmap.flush()
+    finally:
+        del heightmap
+
+    check_rows(rows_written, shape)
+
+
+def check_rows(rows_written, shape):
+    # Blocks that don't fill the heightmap leave a broken file
+    if rows_written != shape[0]:
+        raise ValueError("Heightmap expected {} rows but {} were written".format(shape[0], rows_written))
+
+
+def heightmap_shape(path, raw_shape=None):
+    """
+    This function gets the amount of rows and columns of a heightmap without reading its heights.
+        Parameters:
+            path (str): Path of the heightmap.
+            raw_shape (tuple of int): Rows and columns of a RAW file. Default assumes a square heightmap
+        Returns:
+            shape (tuple of int): Amount of rows and columns.
+    """
+    file_format = heightmap_format(path)
+
+    if file_format == "npy":
+        return np.load(path, mmap_mode="r").shape[:2]
+
+    if file_format == "png":
+        return read_png_header(path)[:2]
+
+    if raw_shape is not None:
+        return tuple(raw_shape)
+
+    # RAW files have no header, they are expected to be square
+    side = int(round((os.path.getsize(path) // 2) ** 0.5))
+    if side * side * 2 != os.path.getsize(path):
+        raise ValueError("RAW heightmap {} is not square, its rows and columns have to be given".format(path))
+
+    return side, side
+
+
+def guess_raw_shape(path, rows, columns):
+    """
+    This function checks if a heightmap could be a RAW file with the same vertices as a grid.
+    It allows reading back the non square RAW files exported from tiled terrains.
+        Parameters:
+            path (str): Path of the heightmap.
+            rows (int): Amount of rows of the grid.
+            columns (int): Amount of columns of the grid.
+        Returns:
+            raw_shape (tuple of int): Rows and columns of the grid if the RAW file has that size, None otherwise.
+    """
+    if heightmap_format(path) == "r16" and os.path.getsize(path) == rows * columns * 2:
+        return rows, columns
+
+    return None
+
+
+def iter_heightmap_rows(path, row_indexes, raw_shape=None, rows_per_read=64):
+    """
+    This function reads some rows of a heightmap, the file is never loaded completely.
+    RAW and NumPy files are read through a memory map, PNG files are decompressed row by row.
+        Parameters:
+            path (str): Path of the heightmap.
+            row_indexes (numpy.ndarray): Sorted indexes of the rows to read, without repetitions.
+            raw_shape (tuple of int): Rows and columns of a RAW file. Default assumes a square heightmap
+            rows_per_read (int): Amount of rows read together from a memory map.
+        Yields:
+            row (tuple of (int, numpy.ndarray)): Index and heights of each row. 16-bit heights go from 0 to 1,
+                                                 NumPy heights keep their values.
+    """
+    file_format = heightmap_format(path)
+
+    if file_format == "png":
+        for row_index, row in iter_png_rows(path, row_indexes):
+            yield row_index, row
+        return
+
+    if file_format == "npy":
+        heightmap = np.load(path, mmap_mode="r")
+        scale = 1.0
+    else:
+        heightmap = np.memmap(path, dtype="<u2", mode="r", shape=heightmap_shape(path, raw_shape))
+        scale = 1.0 / 65535.0
+
+    # Read the rows in groups so the memory map is accessed with a few large reads
+    for first in range(0, len(row_indexes), rows_per_read):
+        indexes = row_indexes[first:first + rows_per_read]
+        rows = np.asarray(heightmap[indexes], dtype=np.float64) * scale
+
+        for row_index, row in zip(indexes, rows):
+            yield row_index, row
+
+
+def read_png_header(path):
+    """
+    This function reads the size and format of a PNG file.
+        Parameters:
+            path (str): Path of the PNG file.
+        Returns:
+            header (tuple of int): Rows, columns and bit depth.
+        Raises:
+            ValueError: If the PNG is not a non interlaced 8 or 16-bit grayscale image.
+    """
+    with open(path, "rb") as png_file:
+        if png_file.read(8) != b"\x89PNG\r\n\x1a\n":
+            raise ValueError("{} is not a PNG file".format(path))
+
+        length, chunk_type = struct.unpack(">I4s", png_file.read(8))
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", png_file.read(length))
+
+    if chunk_type != b"IHDR" or color_type != 0 or bit_depth not in (8, 16) or interlace != 0:
+        raise ValueError("Only non interlaced 8 or 16-bit grayscale PNG heightmaps are supported: {}".format(path))
+
+    return height, width, bit_depth
+
+
+def iter_png_rows(path, row_indexes):
+    """
+    This function decompresses a grayscale PNG row by row and keeps only the requested rows.
+        Parameters:
+            path (str): Path of the PNG file.
+            row_indexes (numpy.ndarray): Sorted indexes of the rows to read, without repetitions.
+        Yields:
+            row (tuple of (int, numpy.ndarray)): Index and heights from 0 to 1 of each row.
+    """
+    height, width, bit_depth = read_png_header(path)
+    pixel_bytes = bit_depth // 8
+    row_bytes = width * pixel_bytes
+    wanted = set(int(index) for index in row_indexes)
+
+    decompressor = zlib.decompressobj()
+    pending = b""
+    previous_row = np.zeros(row_bytes, dtype=np.uint8)
+    row_index = 0
+
+    with open(path, "rb") as png_file:
+        png_file.seek(8)
+
+        while row_index < height:
+            length, chunk_type = struct.unpack(">I4s", png_file.read(8))
+            data = png_file.read(length)
+            png_file.read(4)  # Skip the checksum
+
+            if chunk_type == b"IEND":
+                break
+            if chunk_type != b"IDAT":
+                continue
+
+            pending += decompressor.decompress(data)
+            offset = 0
+
+            # Undo the filter of every complete row, each one depends on the previous one
+            while len(pending) - offset >= row_bytes + 1 and row_index < height:
+                filter_type = pending[offset]
+                if filter_type in (3, 4) and width * height > MAX_PNG_LOOP_PIXELS:
+                    raise ValueError("{} is a {}x{} PNG saved with Average or Paeth filters, they are undone one "
+                                     "byte at a time and only PNG heightmaps up to {} pixels can use them. "
+                                     "Save big heightmaps as .r16 or .npy".format(path, width, height,
+                                                                                  MAX_PNG_LOOP_PIXELS))
+
+                row = unfilter_png_row(filter_type,
+                                       np.frombuffer(pending, dtype=np.uint8, count=row_bytes, offset=offset + 1),
+                                       previous_row, pixel_bytes)
+                offset += row_bytes + 1
+
+                if row_index in wanted:
+                    values = row.view(">u2") if pixel_bytes == 2 else row
+                    yield row_index, values.astype(np.float64) / (2 ** bit_depth - 1)
+
+                previous_row = row
+                row_index += 1
+
+            # Keep the incomplete row for the next chunk
+            pending = pending[offset:]
+
+
+def unfilter_png_row(filter_type, row, previous_row, pixel_bytes):
+    """
+    This function undoes the filter of a PNG row.
+    None, Sub and Up filters are undone with arrays. Average and Paeth use the byte that was just unfiltered,
+    so they need a loop over the bytes of the row, it runs on Python integers because indexing arrays is slower.
+        Parameters:
+            filter_type (int): The filter of the row, from 0 to 4.
+            row (numpy.ndarray): Filtered bytes of the row.
+            previous_row (numpy.ndarray): Unfiltered bytes of the previous row, zeros for the first row.
+            pixel_bytes (int): Amount of bytes of each pixel.
+        Returns:
+            row (numpy.ndarray): Unfiltered bytes of the row.
+    """
+    if filter_type == 0:
+        return row.copy()
+
+    if filter_type == 1:
+        # Each byte adds the byte of the previous pixel, a cumulative sum for each byte of the pixel
+        # that wraps around like the bytes do
+        return np.cumsum(row.reshape(-1, pixel_bytes), axis=0, dtype=np.uint8).ravel()
+
+    if filter_type == 2:
+        return row + previous_row
+
+    result = bytearray(len(row))
+    filtered = row.tobytes()
+    above = previous_row.tobytes()
+
+    # The first pixel has no left or upper left neighbours, both are zero
+    for index in range(min(pixel_bytes, len(row))):
+        predictor = above[index] >> 1 if filter_type == 3 else above[index]
+        result[index] = (filtered[index] + predictor) & 255
+
+    if filter_type == 3:
+        for index in range(pixel_bytes, len(row)):
+            result[index] = (filtered[index] + ((result[index - pixel_bytes] + above[index]) >> 1)) & 255
+    else:
+        for index in range(pixel_bytes, len(row)):
+            left, up, upper_left = result[index - pixel_bytes], above[index], above[index - pixel_bytes]
+
+            # Distances from left + up - upper_left to each neighbour
+            distance_left, distance_above = abs(up - upper_left), abs(left - upper_left)
+            distance_upper_left = abs(up + left - 2 * upper_left)
+            if distance_left <= distance_above and distance_left <= distance_upper_left:
+                predictor = left
+            elif distance_above <= distance_upper_left:
+                predictor = up
+            else:
+                predictor = upper_left
+
+            result[index] = (filtered[index] + predictor) & 255
+
+    return np.frombuffer(bytes(result), dtype=np.uint8)
+
+
+def import_heightmap(path, rows, columns, row_offset=0, column_offset=0, total_rows=None, total_columns=None,
+                     raw_shape=None):
+    """
+    This function resamples a heightmap to a grid with bilinear interpolation.
+    Only the two source rows around each grid row are read, and they are reduced to the needed columns right away,
+    so memory depends on the grid and not on the heightmap.
+    The offsets allow sampling a tile of a bigger grid that covers the whole heightmap.
+        Parameters:
+            path (str): Path of the heightmap.
+            rows (int): Amount of rows of the grid.
+            columns (int): Amount of columns of the grid.
+            row_offset (int): Global index of the first row of the grid. Default to 0
+            column_offset (int): Global index of the first column of the grid. Default to 0
+            total_rows (int): Rows of the whole grid that covers the heightmap. Default to rows
+            total_columns (int): Columns of the whole grid that covers the heightmap. Default to columns
+            raw_shape (tuple of int): Rows and columns of a RAW file. Default assumes a square heightmap
+        Returns:
+            heightfield (numpy.ndarray): Array of shape (rows, columns). 16-bit heights go from 0 to 1
+    """
+    total_rows = rows if total_rows is None else total_rows
+    total_columns = columns if total_columns is None else total_columns
+    source_rows, source_columns = heightmap_shape(path, raw_shape)
+
+    # Position of each grid row and column in the heightmap
+    source_y = np.arange(row_offset, row_offset + rows) * (source_rows - 1.0) / max(total_rows - 1, 1)
+    source_x = np.arange(column_offset, column_offset + columns) * (source_columns - 1.0) / max(total_columns - 1, 1)
+
+    top_rows = np.minimum(np.floor(source_y).astype(np.intp), source_rows - 1)
+    bottom_rows = np.minimum(top_rows + 1, source_rows - 1)
+    left_columns = np.minimum(np.floor(source_x).astype(np.intp), source_columns - 1)
+    right_columns = np.minimum(left_columns + 1, source_columns - 1)
+    alpha_y = (source_y - top_rows)[:, np.newaxis]
+    alpha_x = (source_x - left_columns)[np.newaxis, :]
+
+    # Read each needed row once and keep only the needed columns
+    needed_rows = np.unique(np.concatenate([top_rows, bottom_rows]))
+    left_values = np.zeros((len(needed_rows), columns))
+    right_values = np.zeros((len(needed_rows), columns))
+    for position, (row_index, row) in enumerate(iter_heightmap_rows(path, needed_rows, raw_shape)):
+        left_values[position] = row[left_columns]
+        right_values[position] = row[right_columns]
+
+    # Interpolate along the rows and then between the top and bottom rows
+    horizontal = left_values * (1 - alpha_x) + right_values * alpha_x
+    top = horizontal[np.searchsorted(needed_rows, top_rows)]
+    bottom = horizontal[np.searchsorted(needed_rows, bottom_rows)]
+
+    return top * (1 - alpha_y) + bottom * alpha_y
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+"""
+    Instrumentation of the Terrain Generator.
+    Every stage of a generation is measured as a span, spans opened inside another one are its children.
+    Each span keeps its duration, the scene commands issued while it was open and the biggest array it used,
+    so a slow generation can be broken down without a profiler. Spans are exported as JSON or in the
+    Chrome trace format, which is opened by chrome://tracing or Perfetto.
+    by Daniel Orozco
+"""
+
+# Same logger used by the UI
+logger = logging.getLogger("TerrainGenerator")
+
+# Backend functions that are not scene commands
+UNCOUNTED_FUNCTIONS = ("batch", "begin_batch", "end_batch", "defer", "flush", "is_deferred", "command_count")
+
+
+class Profiler:
+    """
+    This is a class for measuring nested stages and the scene commands they issue.
+        Attributes:
+            enabled (bool): False to skip every measurement.
+            maxSpans (int): Max amount of spans kept for the trace, the totals keep counting after it.
+            origin (float): Time when the profiler started or was cleared, spans start relative to it.
+            spans (list of dict): Finished spans in the order they ended.
+            stack (list of dict): Spans that are open, the innermost one is the last.
+            totals (OrderedDict of {tuple:dict}): Calls, seconds, commands and peak array size by span path.
+            commands (dict of {str:int}): Every scene command issued, inside a span or not.
+            peakArrays (dict of {str:int}): Biggest size in bytes of each tracked array.
+            droppedSpans (int): Amount of spans that were not kept because of maxSpans.
+    """
+
+    def __init__(self, enabled=True, max_spans=100000):
+        """
+        The constructor of Profiler class
+            Parameters:
+                enabled (bool): False to skip every measurement. Default to True
+                max_spans (int): Max amount of spans kept for the trace. Default to 100000
+        """
+        self.enabled = enabled
+        self.maxSpans = max_spans
+        self.stack = []
+        self.clear()
+
+    def clear(self):
+        """
+        This function forgets every measurement, spans that are open keep running.
+        """
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.totals = OrderedDict()
+        self.commands = {}
+        self.peakArrays = {}
+        self.droppedSpans = 0
+
+    @contextmanager
+    def span(self, name):
+        """
+        This function measures the code inside a with block as a span.
+            Parameters:
+                name (str): Name of the stage.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        span = {"name": name, "path": (self.stack[-1]["path"] if self.stack else ()) + (name,),
+                "depth": len(self.stack), "start": time.perf_counter(), "commands": {}, "peakArrayBytes": 0}
+        self.stack.append(span)
+
+        try:
+            yield
+        finally:
+            span["duration"] = time.perf_counter() - span["start"]
+            span["start"] -= self.origin
+            self.stack.remove(span)
+            self.finish_span(span)
+
+    def finish_span(self, span):
+        """
+        This function adds a span that ended to the trace and to the totals of its path.
+            Parameters:
+                span (dict): The span that ended.
+        """
+        total = self.totals.setdefault(span["path"], {"calls": 0, "seconds": 0.0, "commands": 0,
+                                                      "peakArrayBytes": 0})
+        total["calls"] += 1
+        total["seconds"] += span["duration"]
+        total["commands"] += sum(span["commands"].values())
+        total["peakArrayBytes"] = max(total["peakArrayBytes"], span["peakArrayBytes"])
+
+        if len(self.spans) < self.maxSpans:
+            self.spans.append(span)
+        else:
+            self.droppedSpans += 1
+
+        # Same message that was logged before by each stage
+        if span["depth"] == 0:
+            logger.debug("--- {} took: {} ---".format(span["name"], span["duration"]))
+
+    def count(self, command, amount=1):
+        """
+        This function counts a scene command in every open span.
+            Parameters:
+                command (str): Name of the command.
+                amount (int): Amount of commands. Default to 1
+        """
+        if not self.enabled:
+            return
+
+        self.commands[command] = self.commands.get(command, 0) + amount
+        for span in self.stack:
+            span["commands"][command] = span["commands"].get(command, 0) + amount
+
+    def track_array(self, name, array):
+        """
+        This function keeps the size of an array if it is the biggest one so far.
+            Parameters:
+                name (str): What the array contains.
+                array (numpy.ndarray): The array.
+        """
+        if not self.enabled or array is None:
+            return
+
+        self.peakArrays[name] = max(self.peakArrays.get(name, 0), array.nbytes)
+        for span in self.stack:
+            span["peakArrayBytes"] = max(span["peakArrayBytes"], array.nbytes)
+
+    def instrument(self, backend):
+        """
+        This function counts every command sent to a backend.
+        Queued operations are counted when they are sent, inside a span named "Send Queued".
+            Parameters:
+                backend (SceneBackend): The backend to measure, its functions are wrapped on the instance.
+        """
+        for name in dir(backend):
+            function = getattr(backend, name)
+            if name.startswith("_") or name in UNCOUNTED_FUNCTIONS or not callable(function):
+                continue
+            setattr(backend, name, self.counted(backend, name, function))
+
+        backend.flush = self.sending(backend, backend.flush)
+
+    def counted(self, backend, name, function):
+        """
+        This function wraps a function of a backend so its calls are counted.
+            Parameters:
+                backend (SceneBackend): The backend that owns the function.
+                name (str): Name of the command.
+                function (function): The bound function.
+            Returns:
+                wrapper (function): The wrapped function.
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Queued operations are counted once, when the queue is sent
+            if not backend.is_deferred(name):
+                self.count(name)
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    def sending(self, backend, flush):
+        """
+        This function wraps the flush function of a backend, so sending a queue that is not empty is a span.
+            Parameters:
+                backend (SceneBackend): The backend that owns the function.
+                flush (function): The bound flush function.
+            Returns:
+                wrapper (function): The wrapped function.
+        """
+        @functools.wraps(flush)
+        def wrapper():
+            if not backend.deferred:
+                return flush()
+
+            with self.span("Send Queued"):
+                return flush()
+
+        return wrapper
+
+    def report(self):
+        """
+        This function creates a table with the totals of every span path, children below their parents.
+            Returns:
+                report (str): The table.
+        """
+        lines = ["{:<40}{:>8}{:>12}{:>10}{:>12}".format("Stage", "Calls", "Total ms", "Commands", "Peak MB")]
+
+        # Children end before their parents, so paths are sorted to show the parents first
+        order = {}
+        for path in self.totals:
+            for length in range(1, len(path) + 1):
+                order.setdefault(path[:length], len(order))
+
+        paths = sorted(self.totals, key=lambda path: [order[path[:length]] for length in range(1, len(path) + 1)])
+        for path in paths:
+            total = self.totals[path]
+            lines.append("{:<40}{:>8}{:>12.2f}{:>10}{:>12.2f}".format(("  " * (len(path) - 1) + path[-1])[:39],
+                                                                      total["calls"], total["seconds"] * 1000.0,
+                                                                      total["commands"],
+                                                                      total["peakArrayBytes"] / 1e6))
+
+        if self.commands:
+            lines.append("")
+            lines.append("Scene commands: " + ", ".join("{} {}".format(command, amount) for command, amount in
+                                                        sorted(self.commands.items(), key=lambda item: -item[1])))
+        if self.peakArrays:
+            lines.append("Peak arrays: " + ", ".join("{} {:.2f} MB".format(name, size / 1e6) for name, size in
+                                                     sorted(self.peakArrays.items())))
+        if self.droppedSpans:
+            lines.append("{} spans were not kept for the trace".format(self.droppedSpans))
+
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """
+        This function returns every measurement in a form that can be saved as JSON.
+            Returns:
+                profile (dict): Spans, totals by path, scene commands and peak array sizes.
+        """
+        return {"spans": [{"name": span["name"], "path": list(span["path"]), "start": span["start"],
+                           "duration": span["duration"], "commands": span["commands"],
+                           "peakArrayBytes": span["peakArrayBytes"]} for span in self.spans],
+                "totals": [dict(total, path=list(path)) for path, total in self.totals.items()],
+                "commands": self.commands,
+                "peakArrays": self.peakArrays,
+                "droppedSpans": self.droppedSpans}
+
+    def chrome_trace(self):
+        """
+        This function returns the spans as complete events of the Chrome trace format.
+            Returns:
+                trace (dict): The trace, times are in microseconds.
+        """
+        process_id = os.getpid()
+        thread_id = threading.current_thread().ident or 0
+
+        events = []
+        for span in self.spans:
+            events.append({"name": span["name"], "cat": "TerrainGenerator", "ph": "X", "pid": process_id,
+                           "tid": thread_id, "ts": span["start"] * 1e6, "dur": span["duration"] * 1e6,
+                           "args": {"commands": span["commands"], "peakArrayBytes": span["peakArrayBytes"]}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path, trace_format="chrome"):
+        """
+        This function saves the measurements in a file.
+            Parameters:
+                path (str): Path of the .json file.
+                trace_format (str): "chrome" for the Chrome trace format, "json" for every measurement.
+                                    Default to "chrome"
+        """
+        if trace_format not in ("chrome", "json"):
+            raise ValueError("Unknown trace format '{}', use chrome or json".format(trace_format))
+
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace() if trace_format == "chrome" else self.to_dict(), trace_file, indent=1)
+
+        logger.info("Profile exported to {}".format(path))
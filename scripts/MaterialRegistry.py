@@ -0,0 +1,188 @@
+import logging
+from SceneBackend import MayaBackend
+
+"""
+    Materials of the Terrain Generator.
+    Shading networks are kept in a registry addressed by the material type, name and texture maps, so generating
+    terrains and rocks again reuses the materials and the texture nodes that are still in the scene.
+    Networks that are no longer assigned to any object are deleted by the registry.
+    by Daniel Orozco
+"""
+
+# Same logger used by the UI
+logger = logging.getLogger("TerrainGenerator")
+
+
+def create_material(name="myBlinn", color="", normal="", specular="", backend=None, texture_nodes=None):
+    """
+    This function creates a blinn with the given texture maps.
+        Parameters:
+            name (str): The desired name for the material.
+            color (str): Path of the color map. Empty to skip it.
+            normal (str): Path of the normal map. Empty to skip it.
+            specular (str): Path of the specular map. Empty to skip it.
+            backend (SceneBackend): Object used to create the nodes. Default uses maya.cmds
+            texture_nodes (dict of {(str, str):list of str}): Texture nodes by path and map, they are reused if
+                                                              they still exist and new ones are added.
+                                                              Default creates new texture nodes
+        Returns:
+            my_shader (str): The name of the created material.
+    """
+    if backend is None:
+        backend = MayaBackend()
+    if texture_nodes is None:
+        texture_nodes = {}
+
+    # Create blinn Node
+    my_shader = backend.create_shading_node("blinn", "shader")
+    my_shader = backend.rename(my_shader, name)
+
+    logger.debug("The Color is: {}".format(color))
+
+    if color:
+        nodes = texture_nodes.get((color, "color"))
+        if not nodes or not all(backend.exists(node) for node in nodes):
+            # Creating baseColor Node
+            file_node = backend.create_shading_node("file", "texture")
+            filename = color
+            backend.set_attr("%s.fileTextureName" % file_node, filename, type="string")  # Connect file to node
+            nodes = texture_nodes[(color, "color")] = [file_node]
+        # Connect attributes to Blinn
+        backend.connect_attr("%s.outColor" % nodes[-1], "%s.color" % my_shader)
+
+    if normal:
+        nodes = texture_nodes.get((normal, "normal"))
+        if not nodes or not all(backend.exists(node) for node in nodes):
+            # Creating file Node for normal Map
+            normal_node = backend.create_shading_node("file", "texture", color_managed=True)
+            backend.set_attr("%s.ignoreColorSpaceFileRules" % normal_node, 1)
+            filename = normal
+            backend.set_attr("%s.fileTextureName" % normal_node, filename, type="string")  # Connect file to node
+            backend.set_attr("%s.colorSpace" % normal_node, "Raw", type="string")
+            bump_node = backend.create_shading_node("bump2d", "utility")
+            backend.connect_attr("%s.outAlpha" % normal_node, "%s.bumpValue" % bump_node)  # Connect file to bump
+            backend.set_attr("%s.bumpInterp" % bump_node, 1)  # Set to tangent space normals
+            nodes = texture_nodes[(normal, "normal")] = [normal_node, bump_node]
+        # Connect attributes to Blinn
+        backend.connect_attr("%s.outNormal" % nodes[-1], "%s.normalCamera" % my_shader)
+
+    if specular:
+        nodes = texture_nodes.get((specular, "specular"))
+        if not nodes or not all(backend.exists(node) for node in nodes):
+            # Creating Nodes for specular
+            spec_node = backend.create_shading_node("file", "texture", color_managed=True)
+            backend.set_attr("%s.ignoreColorSpaceFileRules" % spec_node, 1)
+            filename = specular
+            backend.set_attr("%s.fileTextureName" % spec_node, filename, type="string")  # Connect file to node
+            backend.set_attr("%s.colorSpace" % spec_node, "Raw", type="string")
+            nodes = texture_nodes[(specular, "specular")] = [spec_node]
+        # Connect attributes to Blinn
+        backend.connect_attr("%s.outColor" % nodes[-1], "%s.specularColor" % my_shader)
+
+    # Change ambient color attribute
+    backend.set_attr("{}.ambientColor".format(my_shader), 0, 0, 0, type="double3")
+
+    return my_shader
+
+
+class MaterialRegistry:
+    """
+    This is a class for reusing shading networks and deleting the ones that are not used anymore.
+    Networks are only deleted by collect_garbage, shared materials are kept while they can be asked for again.
+        Attributes:
+            backend (SceneBackend): Object used to read and write the scene.
+            materials (dict of {tuple:str}): Shared materials by type, name and texture maps.
+            networks (dict of {str:dict}): Texture maps and extra nodes of every material created by the registry.
+            textureNodes (dict of {(str, str):list of str}): Texture nodes by path and map.
+    """
+
+    def __init__(self, backend=None):
+        """
+        The constructor of MaterialRegistry class
+            Parameters:
+                backend (SceneBackend): Object used to read and write the scene. Default uses maya.cmds
+        """
+        self.backend = backend if backend is not None else MayaBackend()
+
+        self.materials = {}
+        self.networks = {}
+        self.textureNodes = {}
+
+    def material(self, name, color="", normal="", specular="", shared=True):
+        """
+        This function returns a blinn with the given texture maps, reusing the one created before if it still exists.
+            Parameters:
+                name (str): The desired name for the material.
+                color (str): Path of the color map. Empty to skip it.
+                normal (str): Path of the normal map. Empty to skip it.
+                specular (str): Path of the specular map. Empty to skip it.
+                shared (bool): False for materials that are modified after creating them, they reuse only the
+                               texture nodes. Default to True
+            Returns:
+                material (str): The name of the material.
+        """
+        key = ("blinn", name, color, normal, specular)
+        if shared and key in self.materials and self.backend.exists(self.materials[key]):
+            logger.debug("Reusing material {}".format(self.materials[key]))
+            return self.materials[key]
+
+        material = create_material(name, color, normal, specular, self.backend, self.textureNodes)
+
+        self.networks[material] = {"textures": [(path, texture_map) for path, texture_map in
+                                                ((color, "color"), (normal, "normal"), (specular, "specular"))
+                                                if path],
+                                   "nodes": []}
+        if shared:
+            self.materials[key] = material
+
+        return material
+
+    def attach(self, material, nodes):
+        """
+        This function adds nodes to the network of a material, so they are deleted together with it.
+            Parameters:
+                material (str): A material created by the registry.
+                nodes (list of str): Nodes that are only used by the material.
+        """
+        self.networks[material]["nodes"].extend(nodes)
+
+    def collect_garbage(self, shared=False):
+        """
+        This function deletes the networks of the materials that are not assigned to any object,
+        and the texture nodes that are not used by any remaining material.
+            Parameters:
+                shared (bool): True to delete the shared materials that are not assigned too. Default keeps them,
+                               so material hands them out again
+            Returns:
+                deleted (list of str): The deleted materials.
+        """
+        deleted = []
+        handed_out = set() if shared else set(self.materials.values())
+
+        for material, network in list(self.networks.items()):
+            if self.backend.exists(material) and (material in handed_out or self.backend.assigned_objects(material)):
+                continue
+
+            if self.backend.exists(material):
+                self.backend.delete_material(material)
+            extra_nodes = [node for node in network["nodes"] if self.backend.exists(node)]
+            if extra_nodes:
+                self.backend.delete(extra_nodes)
+
+            del self.networks[material]
+            deleted.append(material)
+
+        self.materials = {key: material for key, material in self.materials.items() if material in self.networks}
+
+        # Texture nodes are shared, keep the ones used by a material
+        used_textures = set(texture for network in self.networks.values() for texture in network["textures"])
+        for texture in list(self.textureNodes):
+            if texture not in used_textures:
+                nodes = [node for node in self.textureNodes.pop(texture) if self.backend.exists(node)]
+                if nodes:
+                    self.backend.delete(nodes)
+
+        if deleted:
+            logger.debug("Deleted unused materials: {}".format(deleted))
+
+        return deleted
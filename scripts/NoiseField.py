@@ -0,0 +1,455 @@
+import math
+import numpy as np
+
+"""
+    Noise functions used by the Terrain Generator to deform the terrains.
+    The scalar functions evaluate a single point, the array versions evaluate a whole heightfield at once
+    and return the same values as their scalar counterparts for a given seed.
+    Value, Perlin and Simplex noise hash the lattice points with a permutation table shuffled with the seed,
+    so every lookup is an integer gather instead of a sine. Sine keeps the original value noise and is the default,
+    so a seed gives the same terrain it gave before the other types existed.
+    by Daniel Orozco
+"""
+
+# Scale and weight of every octave added together by value noise
+VALUE_NOISE_OCTAVES = ((4.0, 1.0), (8.0, .5), (16.0, .25), (32.0, .125))
+
+# Noise types and interpolations of noise_field
+NOISE_TYPES = ["Sine", "Value", "Perlin", "Simplex"]
+INTERPOLATIONS = ["Smoothstep", "Quintic", "Cosine", "Linear"]
+
+# Settings of noise_field, the defaults are the original value noise and its octaves
+DEFAULT_NOISE = {"type": "Sine", "octaves": 4, "lacunarity": 2.0, "persistence": 0.5, "scale": 4.0,
+                 "interpolation": "Smoothstep"}
+
+# Size of the permutation tables, the noise repeats every PERMUTATION_SIZE lattice points
+PERMUTATION_SIZE = 256
+
+# Unit gradients used by Perlin and Simplex noise
+GRADIENTS = np.array([[math.cos(angle), math.sin(angle)] for angle in np.arange(8) * math.pi / 4.0])
+
+# Skew factors between the square and the triangular lattice of Simplex noise
+SIMPLEX_SKEW = (math.sqrt(3.0) - 1.0) / 2.0
+SIMPLEX_UNSKEW = (3.0 - math.sqrt(3.0)) / 6.0
+
+
+def noise_field(subdivisions, random_seed=6000, noise=None, row_offset=0, column_offset=0, rows=None, columns=None):
+    """
+    This function evaluates fractal noise for every vertex of a square grid at once.
+    Every octave multiplies the frequency by the lacunarity and the weight by the persistence.
+    Index [x, y] of the result matches the vertex x * (subdivisions + 1) + y of the grid, the offsets allow
+    evaluating a tile of a bigger grid.
+        Parameters:
+            subdivisions (int): Amount of subdivisions used to normalize the coordinates.
+            random_seed (float): seed used to generate the values. Default to 6000
+            noise (dict): Type, octaves, lacunarity, persistence, scale and interpolation of the noise.
+                          Default uses DEFAULT_NOISE
+            row_offset (int): Global index of the first row. Default to 0
+            column_offset (int): Global index of the first column. Default to 0
+            rows (int): Amount of rows to evaluate. Default to subdivisions + 1
+            columns (int): Amount of columns to evaluate. Default to subdivisions + 1
+        Returns:
+            heightfield (numpy.ndarray): Array of shape (rows, columns) in the -1 to 1 range
+    """
+    noise = dict(DEFAULT_NOISE, **(noise or {}))
+    if noise["type"] not in NOISE_TYPES:
+        raise ValueError("Unknown noise type '{}', use one of {}".format(noise["type"], NOISE_TYPES))
+    if noise["interpolation"] not in INTERPOLATIONS:
+        raise ValueError("Unknown interpolation '{}', use one of {}".format(noise["interpolation"], INTERPOLATIONS))
+
+    octaves = [(noise["scale"] * noise["lacunarity"] ** octave, noise["persistence"] ** octave)
+               for octave in range(max(int(noise["octaves"]), 1))]
+
+    if noise["type"] == "Sine":
+        return value_noise_field(subdivisions, random_seed, octaves, row_offset, column_offset, rows, columns,
+                                 noise["interpolation"])
+
+    rows = subdivisions + 1 if rows is None else rows
+    columns = subdivisions + 1 if columns is None else columns
+
+    # Normalize x and y coordinates to fit range 0-1 in each tile
+    normalized_x = np.arange(row_offset, row_offset + rows) * 1.0 / subdivisions
+    normalized_y = np.arange(column_offset, column_offset + columns) * 1.0 / subdivisions
+
+    heightfield = np.zeros((rows, columns))
+    weight_sum = 0
+
+    for octave, (scale, weight) in enumerate(octaves):
+        # Each octave has its own table, so the octaves don't line up
+        table = permutation_table(random_seed, octave)
+        points_x = normalized_x[:, np.newaxis] * scale
+        points_y = normalized_y[np.newaxis, :] * scale
+
+        if noise["type"] == "Value":
+            heightfield += lattice_value_noise(points_x, points_y, table, noise["interpolation"]) * weight
+        elif noise["type"] == "Perlin":
+            heightfield += perlin_noise(points_x, points_y, table, noise["interpolation"]) * weight
+        else:
+            heightfield += simplex_noise(points_x, points_y, table) * weight
+        weight_sum += weight
+
+    # Return to -1 to 1 range
+    heightfield /= weight_sum
+
+    return heightfield
+
+
+def permutation_table(random_seed, octave=0):
+    """
+    This function shuffles the numbers from 0 to PERMUTATION_SIZE - 1 with a seed.
+        Parameters:
+            random_seed (float): seed used to shuffle the table.
+            octave (int): Octave that uses the table, each one gets a different table. Default to 0
+        Returns:
+            table (numpy.ndarray): The shuffled numbers, twice in a row so two lookups never overflow.
+    """
+    # Decimals of the seed change the table too
+    state = np.random.RandomState((int(round(random_seed * 1000)) + octave * 7919) % (2 ** 32))
+    table = state.permutation(PERMUTATION_SIZE)
+
+    return np.concatenate([table, table])
+
+
+def lattice_hash(table, grid_id_x, grid_id_y):
+    """
+    This function gives a pseudo random integer to every lattice point.
+        Parameters:
+            table (numpy.ndarray): Permutation table returned by permutation_table.
+            grid_id_x (numpy.ndarray): Integer X coordinates of the lattice points.
+            grid_id_y (numpy.ndarray): Integer Y coordinates of the lattice points.
+        Returns:
+            hashes (numpy.ndarray): Number from 0 to PERMUTATION_SIZE - 1 for every lattice point.
+    """
+    mask = PERMUTATION_SIZE - 1
+
+    return table[table[grid_id_x & mask] + (grid_id_y & mask)]
+
+
+def interpolate(first_value, second_value, alpha, interpolation="Smoothstep"):
+    """
+    This function blends two values with one of the INTERPOLATIONS.
+        Parameters:
+            first_value (numpy.ndarray): Value when alpha is 0.
+            second_value (numpy.ndarray): Value when alpha is 1.
+            alpha (numpy.ndarray): Position between both values from 0 to 1.
+            interpolation (str): One of INTERPOLATIONS. Default to Smoothstep
+        Returns:
+            blended (numpy.ndarray): The blended values.
+    """
+    if interpolation == "Cosine":
+        return cosine_interpolation(first_value, second_value, alpha)
+    if interpolation == "Smoothstep":
+        alpha = (alpha**2)*(3-(2*alpha))
+    elif interpolation == "Quintic":
+        alpha = (alpha**3)*(alpha*(alpha*6-15)+10)
+
+    return linear_interpolation(first_value, second_value, alpha)
+
+
+def lattice_window(points_x, points_y):
+    """
+    This function finds the lattice points around a set of coordinates.
+        Parameters:
+            points_x (numpy.ndarray): X coordinates, must be broadcastable with points_y
+            points_y (numpy.ndarray): Y coordinates, must be broadcastable with points_x
+        Returns:
+            local_coordinate_x (numpy.ndarray): Position of each coordinate inside its lattice cell in X.
+            local_coordinate_y (numpy.ndarray): Position of each coordinate inside its lattice cell in Y.
+            lattice_x (numpy.ndarray): Integer X coordinates of every lattice point used, as a column.
+            lattice_y (numpy.ndarray): Integer Y coordinates of every lattice point used, as a row.
+            index_x (numpy.ndarray): Row of the lattice of the cell of each coordinate.
+            index_y (numpy.ndarray): Column of the lattice of the cell of each coordinate.
+    """
+    grid_id_x = np.floor(points_x)
+    grid_id_y = np.floor(points_y)
+
+    first_x = int(grid_id_x.min())
+    first_y = int(grid_id_y.min())
+    lattice_x = np.arange(first_x, int(grid_id_x.max()) + 2)[:, np.newaxis]
+    lattice_y = np.arange(first_y, int(grid_id_y.max()) + 2)[np.newaxis, :]
+
+    return (points_x - grid_id_x, points_y - grid_id_y, lattice_x, lattice_y,
+            grid_id_x.astype(np.intp) - first_x, grid_id_y.astype(np.intp) - first_y)
+
+
+def lattice_gather(lattice, index_x, index_y):
+    """
+    This function reads a value of the lattice for every coordinate.
+    Coordinates of a grid come as a column of rows and a row of columns, they are read one axis at a time.
+        Parameters:
+            lattice (numpy.ndarray): Value of every lattice point.
+            index_x (numpy.ndarray): Rows of the lattice, must be broadcastable with index_y
+            index_y (numpy.ndarray): Columns of the lattice, must be broadcastable with index_x
+        Returns:
+            values (numpy.ndarray): The values of the lattice.
+    """
+    if index_x.ndim == 2 and index_y.ndim == 2 and index_x.shape[1] == 1 and index_y.shape[0] == 1:
+        return np.take(np.take(lattice, index_x[:, 0], axis=0), index_y[0], axis=1)
+
+    return lattice[index_x, index_y]
+
+
+def lattice_value_noise(points_x, points_y, table, interpolation="Smoothstep"):
+    """
+    This function evaluates value noise, a random value on each lattice point blended between the corners.
+    Values are looked up only once for each lattice point and then gathered for every coordinate.
+        Parameters:
+            points_x (numpy.ndarray): X coordinates, must be broadcastable with points_y
+            points_y (numpy.ndarray): Y coordinates, must be broadcastable with points_x
+            table (numpy.ndarray): Permutation table returned by permutation_table.
+            interpolation (str): One of INTERPOLATIONS. Default to Smoothstep
+        Returns:
+            noise (numpy.ndarray): The noise values in the -1 to 1 range
+    """
+    local_x, local_y, lattice_x, lattice_y, index_x, index_y = lattice_window(points_x, points_y)
+
+    # Value of every lattice point that is used by the coordinates
+    lattice = lattice_hash(table, lattice_x, lattice_y) * (2.0 / (PERMUTATION_SIZE - 1)) - 1.0
+
+    bottom = interpolate(lattice_gather(lattice, index_x, index_y), lattice_gather(lattice, index_x + 1, index_y),
+                         local_x, interpolation)
+    top = interpolate(lattice_gather(lattice, index_x, index_y + 1), lattice_gather(lattice, index_x + 1, index_y + 1),
+                      local_x, interpolation)
+
+    return interpolate(bottom, top, local_y, interpolation)
+
+
+def perlin_noise(points_x, points_y, table, interpolation="Quintic"):
+    """
+    This function evaluates Perlin noise, a random gradient on each lattice point blended between the corners.
+    Gradients are looked up only once for each lattice point and then gathered for every coordinate.
+        Parameters:
+            points_x (numpy.ndarray): X coordinates, must be broadcastable with points_y
+            points_y (numpy.ndarray): Y coordinates, must be broadcastable with points_x
+            table (numpy.ndarray): Permutation table returned by permutation_table.
+            interpolation (str): One of INTERPOLATIONS. Default to Quintic
+        Returns:
+            noise (numpy.ndarray): The noise values in the -1 to 1 range
+    """
+    local_x, local_y, lattice_x, lattice_y, index_x, index_y = lattice_window(points_x, points_y)
+
+    # Gradient of every lattice point that is used by the coordinates
+    gradients = lattice_hash(table, lattice_x, lattice_y) % len(GRADIENTS)
+    gradients_x = GRADIENTS[gradients, 0]
+    gradients_y = GRADIENTS[gradients, 1]
+
+    def corner(offset_x, offset_y):
+        # Dot product between the gradient of a corner and the vector from the corner to the coordinate
+        dot = lattice_gather(gradients_x, index_x + offset_x, index_y + offset_y) * (local_x - offset_x)
+        dot += lattice_gather(gradients_y, index_x + offset_x, index_y + offset_y) * (local_y - offset_y)
+        return dot
+
+    bottom = interpolate(corner(0, 0), corner(1, 0), local_x, interpolation)
+    top = interpolate(corner(0, 1), corner(1, 1), local_x, interpolation)
+
+    # Unit gradients reach half the diagonal at most
+    return interpolate(bottom, top, local_y, interpolation) * math.sqrt(2.0)
+
+
+def simplex_noise(points_x, points_y, table):
+    """
+    This function evaluates Simplex noise, the gradients of the three corners of a triangular lattice
+    are added with a radial falloff, so there are no square artefacts and no interpolation.
+        Parameters:
+            points_x (numpy.ndarray): X coordinates, must be broadcastable with points_y
+            points_y (numpy.ndarray): Y coordinates, must be broadcastable with points_x
+            table (numpy.ndarray): Permutation table returned by permutation_table.
+        Returns:
+            noise (numpy.ndarray): The noise values in the -1 to 1 range
+    """
+    # Skew the coordinates to find the triangle that contains them
+    skew = (points_x + points_y) * SIMPLEX_SKEW
+    local_x, local_y, lattice_x, lattice_y, index_x, index_y = lattice_window(points_x + skew, points_y + skew)
+
+    # Unskew the position inside the cell to measure distances on the original coordinates
+    unskew = (local_x + local_y) * SIMPLEX_UNSKEW
+    local_x -= unskew
+    local_y -= unskew
+
+    # Gradient of every lattice point that is used by the coordinates
+    gradients = lattice_hash(table, lattice_x, lattice_y) % len(GRADIENTS)
+    gradients_x = GRADIENTS[gradients, 0]
+    gradients_y = GRADIENTS[gradients, 1]
+
+    # The middle corner depends on which half of the skewed cell contains the coordinate
+    middle_x = (local_x > local_y).astype(np.intp)
+
+    noise = np.zeros(local_x.shape)
+    for offset_x, offset_y, unskew_offset in ((0, 0, 0.0), (middle_x, 1 - middle_x, SIMPLEX_UNSKEW),
+                                              (1, 1, 2.0 * SIMPLEX_UNSKEW)):
+        distance_x = local_x - offset_x + unskew_offset
+        distance_y = local_y - offset_y + unskew_offset
+
+        # Radial falloff, corners farther than its radius don't contribute
+        falloff = np.maximum(0.5 - distance_x ** 2 - distance_y ** 2, 0.0) ** 4
+        falloff *= gradients_x[index_x + offset_x, index_y + offset_y] * distance_x + \
+            gradients_y[index_x + offset_x, index_y + offset_y] * distance_y
+        noise += falloff
+
+    # Scale the peaks of the noise to the -1 to 1 range
+    return noise * 70.0
+
+
+def value_noise_field(subdivisions, random_seed=6000, octaves=VALUE_NOISE_OCTAVES,
+                      row_offset=0, column_offset=0, rows=None, columns=None, interpolation="Smoothstep"):
+    """
+    This function evaluates value noise for every vertex of a square grid at once.
+    Index [x, y] of the result matches the vertex x * (subdivisions + 1) + y of the grid.
+    The offsets allow evaluating a tile of a bigger grid, tiles that share a border get the same values on it.
+        Parameters:
+            subdivisions (int): Amount of subdivisions used to normalize the coordinates.
+            random_seed (float): seed used to generate the values. Default to 6000
+            octaves (tuple of (float, float)): Scale and weight of each octave added to the noise.
+            row_offset (int): Global index of the first row. Default to 0
+            column_offset (int): Global index of the first column. Default to 0
+            rows (int): Amount of rows to evaluate. Default to subdivisions + 1
+            columns (int): Amount of columns to evaluate. Default to subdivisions + 1
+            interpolation (str): One of INTERPOLATIONS. Default to Smoothstep
+        Returns:
+            heightfield (numpy.ndarray): Array of shape (rows, columns) in the 0 to 1 range
+    """
+    rows = subdivisions + 1 if rows is None else rows
+    columns = subdivisions + 1 if columns is None else columns
+
+    # Normalize x and y coordinates to fit range 0-1 in each tile
+    normalized_x = np.arange(row_offset, row_offset + rows) * 1.0 / subdivisions
+    normalized_y = np.arange(column_offset, column_offset + columns) * 1.0 / subdivisions
+
+    heightfield = np.zeros((rows, columns))
+    weight_sum = 0
+
+    # Add octaves together in the same order as the scalar implementation
+    for scale, weight in octaves:
+        heightfield += smooth_noise_array(normalized_x[:, np.newaxis] * scale,
+                                          normalized_y[np.newaxis, :] * scale,
+                                          random_seed, interpolation) * weight
+        weight_sum += weight
+
+    # Return to 0 to 1 range
+    heightfield /= weight_sum
+
+    return heightfield
+
+
+def smooth_noise_array(points_x, points_y, random_seed=6000, interpolation="Smoothstep"):
+    """
+    This function is the array version of smooth_noise.
+    Noise is evaluated only once for each lattice point and then gathered for every coordinate.
+        Parameters:
+            points_x (numpy.ndarray): X coordinates, must be broadcastable with points_y
+            points_y (numpy.ndarray): Y coordinates, must be broadcastable with points_x
+            random_seed (float): seed used to generate the values. Default to 6000
+            interpolation (str): One of INTERPOLATIONS. Default to Smoothstep, like smooth_noise
+        Returns:
+            interpolation (numpy.ndarray): The noise values obtained for specified coordinates
+    """
+    # Getting decimal part (local coordinates) and integer part (grid ID) of the coordinates
+    local_coordinate_x, grid_id_x = np.modf(points_x)
+    local_coordinate_y, grid_id_y = np.modf(points_y)
+
+    # Evaluate the noise once for every lattice point that is used by the coordinates
+    first_x = int(grid_id_x.min())
+    first_y = int(grid_id_y.min())
+    lattice_x = np.arange(first_x, int(grid_id_x.max()) + 2, dtype=np.float64)
+    lattice_y = np.arange(first_y, int(grid_id_y.max()) + 2, dtype=np.float64)
+    lattice = noise_from_coordinates_array(lattice_x[:, np.newaxis], lattice_y[np.newaxis, :], random_seed)
+
+    # Position of each coordinate in the lattice
+    index_x = grid_id_x.astype(np.intp) - first_x
+    index_y = grid_id_y.astype(np.intp) - first_y
+
+    # Interpolate both bottom corners and both top corners
+    bottom = interpolate(lattice[index_x, index_y], lattice[index_x + 1, index_y], local_coordinate_x, interpolation)
+    top = interpolate(lattice[index_x, index_y + 1], lattice[index_x + 1, index_y + 1], local_coordinate_x,
+                      interpolation)
+
+    # Calculate interpolation based on opposite corners in Y
+    return interpolate(bottom, top, local_coordinate_y, interpolation)
+
+
+def noise_from_coordinates_array(points_x, points_y, random_seed=6000):
+    """
+    This function is the array version of noise_from_coordinates.
+        Parameters:
+            points_x (numpy.ndarray): X coordinates, must be broadcastable with points_y
+            points_y (numpy.ndarray): Y coordinates, must be broadcastable with points_x
+            random_seed (float): seed used to generate the values. Default to 6000
+        Returns:
+            random_values (numpy.ndarray): The values obtained for specified coordinates
+    """
+    # Get random Y from sine curve
+    random_values = np.sin(points_x*100 + points_y*random_seed)*random_seed
+
+    # Get only the decimal part to make it go from -1 to 1
+    return np.modf(random_values)[0]
+
+
+def smooth_noise(point_x, point_y, random_seed=6000):
+    """
+    This function modifies the grid by using an implementation of value Noise.
+    Utilizes sine-based noise for each point and interpolates values from adjacent points.
+        Parameters:
+            point_x (float): X coordinate of a point
+            point_y (float): Y coordinate of a point
+            random_seed (float): seed used to generate the values. Default to 6000
+        Returns:
+            interpolation (float): The noise value obtained for specified coordinates
+    """
+    # Getting decimal part of the local grids defined by the octaves to use for smooth step
+    # Gets numbers from 0 to 1 that repeat depending on scale used
+    local_coordinate_x = math.modf(point_x)[0]
+    local_coordinate_y = math.modf(point_y)[0]
+
+    # Smooth step for local grids
+    smooth_local_x = (local_coordinate_x**2)*(3-(2*local_coordinate_x))
+    smooth_local_y = (local_coordinate_y**2)*(3-(2*local_coordinate_y))
+
+    # Getting the grid ID with integer part.
+    # Get values from 0 to 4, 0 to 8, 0 to 16... depends on scale used
+    grid_id_x = math.modf(point_x)[1]
+    grid_id_y = math.modf(point_y)[1]
+
+    # Evaluate grid locations with the noise function and interpolate both corners
+    bottom_left = noise_from_coordinates(grid_id_x, grid_id_y, random_seed)
+    bottom_right = noise_from_coordinates(grid_id_x + 1, grid_id_y, random_seed)
+    bottom = linear_interpolation(bottom_left, bottom_right, smooth_local_x)
+
+    # Evaluate grid locations with the noise function and interpolate both corners
+    top_left = noise_from_coordinates(grid_id_x, grid_id_y + 1, random_seed)
+    top_right = noise_from_coordinates(grid_id_x + 1, grid_id_y + 1, random_seed)
+    top = linear_interpolation(top_left, top_right, smooth_local_x)
+
+    # Calculate interpolation based on opposite corners using Y smooth step
+    interpolation = linear_interpolation(bottom, top, smooth_local_y)
+
+    return interpolation
+
+
+def noise_from_coordinates(point_x, point_y, random_seed=6000):
+    """
+    This function modifies obtains a simple noise based on sine for a given point
+        Parameters:
+            point_x (float): X coordinate of a point
+            point_y (float): Y coordinate of a point
+            random_seed (float): seed used to generate the values. Default to 6000
+        Returns:
+            random_value (float): The value obtained for specified coordinates
+    """
+    # Get random Y from sine curve
+    random_value = math.sin(point_x*100 + point_y*random_seed)*random_seed
+
+    # Get only the decimal part to make it go from 0 to 1
+    random_value = math.modf(random_value)[0]
+
+    # Return random Y value
+    return random_value
+
+
+def linear_interpolation(first_value, second_value, alpha):
+    return first_value * (1 - alpha) + second_value * alpha
+
+
+def cosine_interpolation(first_value, second_value, alpha):
+    # numpy's cosine works with single values and arrays
+    interpolation = (1 - np.cos(alpha*math.pi))/2.0
+    return first_value * (1 - interpolation) + second_value * interpolation
@@ -0,0 +1,83 @@
+import numpy as np
+from HeightField import evaluate_falloff_curve
+
+"""
+    Array operations over the rock meshes used by the Terrain Generator.
+    Rocks are spheres shaped with soft selection moves. These functions compute the same moves on the vertex
+    array, so every rock is written in a single operation instead of selecting and moving its vertices.
+    by Daniel Orozco
+"""
+
+
+def soft_selection_weights(points, index, radius, curve):
+    """
+    This function computes how much each vertex follows a vertex selected with soft selection.
+        Parameters:
+            points (numpy.ndarray): Array of shape (vertex count, 3) with the position of every vertex.
+            index (int): The index of the selected vertex.
+            radius (float): Falloff radius of the soft selection.
+            curve (str): Falloff curve in the format used by Maya's softSelect command.
+        Returns:
+            weights (numpy.ndarray): Weight of every vertex, 1 for the selected one.
+    """
+    # Volume falloff, the distance is measured in a straight line from the selected vertex
+    distances = np.linalg.norm(points - points[index], axis=1) / max(abs(radius), 1e-9)
+
+    return evaluate_falloff_curve(curve, distances)
+
+
+def soft_move_points(points, index, offset, radius, curve):
+    """
+    This function moves a vertex and the vertices around it like a move with soft selection.
+        Parameters:
+            points (numpy.ndarray): Array of shape (vertex count, 3), it is modified in place.
+            index (int): The index of the vertex to move.
+            offset (tuple of float): Relative movement in X, Y and Z.
+            radius (float): Falloff radius of the soft selection.
+            curve (str): Falloff curve of the soft selection.
+    """
+    points += soft_selection_weights(points, index, radius, curve)[:, np.newaxis] * np.asarray(offset)
+
+
+def soft_scale_points(points, index, scale, pivot, radius, curve):
+    """
+    This function scales a vertex and the vertices around it like a scale with soft selection.
+        Parameters:
+            points (numpy.ndarray): Array of shape (vertex count, 3), it is modified in place.
+            index (int): The index of the vertex to scale.
+            scale (tuple of float): Scale in X, Y and Z.
+            pivot (tuple of float): Position used as pivot of the scale.
+            radius (float): Falloff radius of the soft selection.
+            curve (str): Falloff curve of the soft selection.
+    """
+    weights = soft_selection_weights(points, index, radius, curve)
+    scaled = (points - np.asarray(pivot)) * np.asarray(scale) + np.asarray(pivot)
+    points += weights[:, np.newaxis] * (scaled - points)
+
+
+def rock_points(points, radius, soft_select_radius, curve="1,0,2,0,1,2"):
+    """
+    This function shapes a sphere into a rock, with a flat base and the middle and top pushed to a side.
+    The moves are applied one after the other, so each one measures distances on the result of the previous one.
+        Parameters:
+            points (numpy.ndarray): Vertices of the sphere, the last two are the bottom and top of the sphere.
+            radius (float): The radius of the sphere.
+            soft_select_radius (float): Base falloff radius of the moves.
+            curve (str): Falloff curve of the moves. Default to a smooth curve
+        Returns:
+            points (numpy.ndarray): New position of every vertex.
+    """
+    points = np.array(points, dtype=np.float64)
+    vertex_count = len(points)
+
+    # Scale the base of the sphere to create a planar base
+    soft_scale_points(points, vertex_count - 2, (1, .00005*radius, 1), (0, -1*radius, 0),
+                      3*abs(soft_select_radius), curve)
+
+    # Move a vertex in the middle of the sphere with a smaller radius
+    soft_move_points(points, vertex_count//2, (0.8*radius, 0, 0), 1.5*abs(soft_select_radius), curve)
+
+    # Move the top of the sphere
+    soft_move_points(points, vertex_count - 1, (0.4*radius, 0, 0), 1.5*abs(soft_select_radius), curve)
+
+    return points
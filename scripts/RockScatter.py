@@ -0,0 +1,201 @@
+import math
+import random
+import numpy as np
+
+"""
+    Blue noise scattering for the rocks of the Terrain Generator.
+    Rocks are placed one by one with dart throwing, a position is accepted only if it keeps a minimum distance
+    to every rock placed before. A spatial hash grid keeps every check in the cells around the position,
+    so placing n rocks takes O(n) time.
+    by Daniel Orozco
+"""
+
+# Density masks, each one gives more rocks to a part of the terrain
+DENSITY_MASKS = ["None", "Valleys", "Peaks", "Flat", "Slopes"]
+
+# Times the attempts are repeated looking only at the density when no position fits
+CROWDED_ATTEMPTS = 10
+
+
+def terrain_density(heightfield, width, depth, mask):
+    """
+    This function computes how likely it is to place a rock on each vertex of a terrain.
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex of the terrain.
+            width (float): Size of the terrain in X.
+            depth (float): Size of the terrain in Z.
+            mask (str): One of DENSITY_MASKS.
+        Returns:
+            density (numpy.ndarray): Value from 0 to 1 for every vertex. None if the mask is "None"
+    """
+    if mask == "None":
+        return None
+
+    if mask in ("Valleys", "Peaks"):
+        # Normalized height, flat terrains get the same density everywhere
+        low, high = heightfield.min(), heightfield.max()
+        density = (heightfield - low) / (high - low) if high > low else np.ones_like(heightfield)
+
+        return 1.0 - density if mask == "Valleys" else density
+
+    # Y component of the normal of each vertex, 1 on flat ground and 0 on a vertical wall
+    rows, columns = heightfield.shape
+    slope_z, slope_x = np.gradient(heightfield, depth / max(rows - 1, 1), width / max(columns - 1, 1))
+    flatness = 1.0 / np.sqrt(1.0 + slope_x ** 2 + slope_z ** 2)
+
+    return flatness if mask == "Flat" else 1.0 - flatness
+
+
+class PoissonDiskScatter:
+    """
+    This is a class for choosing rock positions that don't overlap.
+        Attributes:
+            width (float): Size of the scattering area in X, centered in the origin.
+            depth (float): Size of the scattering area in Z, centered in the origin.
+            cellSize (float): Size of the cells of the spatial hash grid.
+            density (numpy.ndarray): Chance of keeping a position on each vertex of the area. None to keep all of them
+            attempts (int): Amount of random positions tried for each rock.
+            cells (dict of {(int, int):list}): Position and radius of the rocks placed in each cell.
+            maxRadius (float): Biggest radius placed so far.
+            crowded (int): Amount of rocks that were placed without keeping their distance because no position fit.
+            randomGenerator (random.Random): Source of the random positions.
+    """
+
+    def __init__(self, width, depth, cell_size, density=None, attempts=30, random_generator=random):
+        """
+        The constructor of PoissonDiskScatter class
+            Parameters:
+                width (float): Size of the scattering area in X.
+                depth (float): Size of the scattering area in Z.
+                cell_size (float): Size of the cells, around twice the radius of the biggest rock.
+                density (numpy.ndarray): Chance of keeping a position on each vertex of the area. Default keeps all
+                attempts (int): Amount of random positions tried for each rock. Default to 30
+                random_generator (random.Random): Source of the random positions. Default uses the random module
+        """
+        self.width = width
+        self.depth = depth
+        self.cellSize = max(cell_size, 1e-6)
+        self.density = density
+        self.attempts = attempts
+        self.randomGenerator = random_generator
+
+        self.cells = {}
+        self.maxRadius = 0.0
+        self.crowded = 0
+
+    def cell(self, position_x, position_z):
+        """
+        This function returns the cell of the spatial hash grid that contains a position.
+            Parameters:
+                position_x (float): Position in X.
+                position_z (float): Position in Z.
+            Returns:
+                cell (tuple of int): Column and row of the cell.
+        """
+        return int(math.floor(position_x / self.cellSize)), int(math.floor(position_z / self.cellSize))
+
+    def fits(self, position_x, position_z, radius):
+        """
+        This function checks if a rock keeps its distance to every rock placed before.
+            Parameters:
+                position_x (float): Position in X.
+                position_z (float): Position in Z.
+                radius (float): Radius that the rock keeps free around it.
+            Returns:
+                fits (bool): True if no rock is closer than the sum of both radii.
+        """
+        # Only the cells that can contain a rock close enough are checked
+        reach = int(math.ceil((radius + self.maxRadius) / self.cellSize))
+        cell_x, cell_z = self.cell(position_x, position_z)
+
+        for neighbour_x in range(cell_x - reach, cell_x + reach + 1):
+            for neighbour_z in range(cell_z - reach, cell_z + reach + 1):
+                for other_x, other_z, other_radius in self.cells.get((neighbour_x, neighbour_z), ()):
+                    distance = radius + other_radius
+                    if (other_x - position_x) ** 2 + (other_z - position_z) ** 2 < distance * distance:
+                        return False
+
+        return True
+
+    def accepts_density(self, position_x, position_z):
+        """
+        This function randomly keeps or discards a position depending on the density around it.
+            Parameters:
+                position_x (float): Position in X.
+                position_z (float): Position in Z.
+            Returns:
+                accepted (bool): True if the position can be used.
+        """
+        if self.density is None:
+            return True
+
+        # Closest vertex of the density grid, row 0 is the border in positive Z
+        rows, columns = self.density.shape
+        column = int(round((position_x / self.width + 0.5) * (columns - 1)))
+        row = int(round((0.5 - position_z / self.depth) * (rows - 1)))
+
+        density = self.density[min(max(row, 0), rows - 1), min(max(column, 0), columns - 1)]
+        return self.randomGenerator.uniform(0, 1) < density
+
+    def densest_position(self):
+        """
+        This function returns the position of the vertex with the highest density.
+            Returns:
+                position (tuple of float): Position in X and Z.
+        """
+        rows, columns = self.density.shape
+        row, column = np.unravel_index(np.argmax(self.density), self.density.shape)
+
+        return ((float(column) / max(columns - 1, 1) - 0.5) * self.width,
+                (0.5 - float(row) / max(rows - 1, 1)) * self.depth)
+
+    def crowded_position(self, position_x, position_z):
+        """
+        This function chooses where a rock goes when no position fits, the density is still respected.
+            Parameters:
+                position_x (float): Last position that was kept by the density, None if every one was discarded.
+                position_z (float): Position in Z that goes with position_x.
+            Returns:
+                position (tuple of float): Position in X and Z.
+        """
+        self.crowded += 1
+        if position_x is not None:
+            return position_x, position_z
+
+        # Dart throwing with only the density check, areas with no density at all fall back to the densest vertex
+        for _ in range(CROWDED_ATTEMPTS * self.attempts):
+            position_x = self.randomGenerator.uniform(-self.width / 2, self.width / 2)
+            position_z = self.randomGenerator.uniform(-self.depth / 2, self.depth / 2)
+
+            if self.accepts_density(position_x, position_z):
+                return position_x, position_z
+
+        return self.densest_position()
+
+    def next_position(self, radius):
+        """
+        This function chooses the position of the next rock.
+        If no position fits after every attempt, the rock is placed on the last one that was kept by the density.
+            Parameters:
+                radius (float): Radius that the rock keeps free around it.
+            Returns:
+                position (tuple of float): Position in X and Z.
+        """
+        kept_x = kept_z = None
+        for _ in range(self.attempts):
+            position_x = self.randomGenerator.uniform(-self.width / 2, self.width / 2)
+            position_z = self.randomGenerator.uniform(-self.depth / 2, self.depth / 2)
+
+            if not self.accepts_density(position_x, position_z):
+                continue
+            if self.fits(position_x, position_z, radius):
+                break
+
+            kept_x, kept_z = position_x, position_z
+        else:
+            position_x, position_z = self.crowded_position(kept_x, kept_z)
+
+        self.cells.setdefault(self.cell(position_x, position_z), []).append((position_x, position_z, radius))
+        self.maxRadius = max(self.maxRadius, radius)
+
+        return position_x, position_z
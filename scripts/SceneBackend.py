@@ -0,0 +1,954 @@
+import copy
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+"""
+    Backends used by the Terrain Generator to read and write the scene.
+    Keeping the scene access behind these classes allows the generator to run inside Maya with MayaBackend,
+    or on plain Python with RecordingBackend, which keeps the scene in memory and records every command.
+    Operations inside a batch are undone together, and parenting and material assignments are queued so they
+    are sent in a few calls when the batch ends.
+    by Daniel Orozco
+"""
+
+# Operations that are queued while a batch is open
+DEFERRED_COMMANDS = ("parent", "assign_material")
+
+
+class SceneBackend:
+    """
+    This is the interface that every scene backend has to implement.
+    Every function that modifies the scene receives and returns node names as strings.
+        Attributes:
+            batchDepth (int): Amount of batches that are open, operations are queued while it is not zero.
+            deferred (list of (str, str, list)): Queued operations with their target and nodes.
+    """
+
+    def __init__(self):
+        """
+        The constructor of SceneBackend class
+        """
+        self.batchDepth = 0
+        self.deferred = []
+
+    @contextmanager
+    def batch(self, name="TerrainGenerator"):
+        """
+        This function groups every operation made inside a with block.
+        The outermost batch opens a single undo chunk, suspends the viewport refresh and sends the queued
+        operations when it ends. Nested batches are part of the outermost one.
+            Parameters:
+                name (str): Name of the undo chunk.
+        """
+        self.batchDepth += 1
+        if self.batchDepth == 1:
+            self.begin_batch(name)
+
+        try:
+            yield
+        finally:
+            self.batchDepth -= 1
+            if self.batchDepth == 0:
+                try:
+                    self.flush()
+                finally:
+                    self.end_batch()
+
+    def begin_batch(self, name):
+        """
+        This function is called when the outermost batch starts.
+            Parameters:
+                name (str): Name of the undo chunk.
+        """
+        pass
+
+    def end_batch(self):
+        """
+        This function is called when the outermost batch ends, after sending the queued operations.
+        """
+        pass
+
+    def defer(self, command, target, nodes):
+        """
+        This function queues an operation if a batch is open.
+            Parameters:
+                command (str): "parent" or "assign_material".
+                target (str): The group or the material.
+                nodes (str or list of str): The nodes that are parented or receive the material.
+            Returns:
+                deferred (bool): True if the operation was queued.
+        """
+        if not self.is_deferred(command):
+            return False
+
+        self.deferred.append((command, target, [nodes] if isinstance(nodes, str) else list(nodes)))
+        return True
+
+    def is_deferred(self, command):
+        """
+        This function checks if an operation would be queued instead of sent.
+            Parameters:
+                command (str): Name of the operation.
+            Returns:
+                deferred (bool): True if a batch is open and the operation can be queued.
+        """
+        return bool(self.batchDepth) and command in DEFERRED_COMMANDS
+
+    def flush(self):
+        """
+        This function sends the queued operations, nodes with the same target are sent in a single call.
+        """
+        if not self.deferred:
+            return
+
+        # Merge the nodes of every target keeping the order in which the targets were used.
+        # Every queued name was taken before parenting, so materials are assigned before anything is parented
+        merged = OrderedDict()
+        for command in ("assign_material", "parent"):
+            for deferred_command, target, nodes in self.deferred:
+                if deferred_command == command:
+                    merged.setdefault((command, target), []).extend(nodes)
+        self.deferred = []
+
+        # Send them right away instead of queueing them again
+        batch_depth, self.batchDepth = self.batchDepth, 0
+        try:
+            for (command, target), nodes in merged.items():
+                if command == "parent":
+                    self.parent(nodes, target)
+                else:
+                    self.assign_material(nodes, target)
+        finally:
+            self.batchDepth = batch_depth
+
+    def create_plane(self, name, dimensions, subdivisions):
+        """
+        This function creates a square polygon plane centered in the origin.
+            Parameters:
+                name (str): The desired name for the plane.
+                dimensions (float): Width and height of the plane.
+                subdivisions (int): Amount of subdivisions for width and height.
+            Returns:
+                plane (str): The name of the created transform.
+        """
+        raise NotImplementedError
+
+    def create_sphere(self, name, radius, subdivisions):
+        """
+        This function creates a polygon sphere centered in the origin.
+            Parameters:
+                name (str): The desired name for the sphere.
+                radius (float): Radius of the sphere.
+                subdivisions (int): Amount of subdivisions for axis and height.
+            Returns:
+                sphere (str): The name of the created transform.
+        """
+        raise NotImplementedError
+
+    def instance(self, node, name):
+        """
+        This function creates an instance of a transform, the instance shares the geometry of the original.
+            Parameters:
+                node (str): The transform to instance.
+                name (str): The desired name for the instance.
+            Returns:
+                instance (str): The name of the created instance.
+        """
+        raise NotImplementedError
+
+    def exists(self, node):
+        """
+        This function checks if a node exists in the scene.
+            Parameters:
+                node (str): The name of the node.
+            Returns:
+                exists (bool): True if the node exists.
+        """
+        raise NotImplementedError
+
+    def delete(self, nodes):
+        """
+        This function deletes nodes from the scene.
+            Parameters:
+                nodes (str or list of str): The nodes to delete.
+        """
+        raise NotImplementedError
+
+    def delete_unused_nodes(self):
+        """
+        This function deletes every shading node that is not used in the scene.
+        """
+        raise NotImplementedError
+
+    def vertex_count(self, mesh):
+        """
+        This function returns the amount of vertices of a mesh.
+            Parameters:
+                mesh (str): The mesh to query.
+            Returns:
+                count (int): The amount of vertices.
+        """
+        raise NotImplementedError
+
+    def get_points(self, mesh):
+        """
+        This function returns the object space position of every vertex of a mesh.
+            Parameters:
+                mesh (str): The mesh to query.
+            Returns:
+                points (numpy.ndarray): Array of shape (vertex count, 3) ordered by vertex index.
+        """
+        raise NotImplementedError
+
+    def set_points(self, mesh, points):
+        """
+        This function moves every vertex of a mesh to a new object space position in one operation.
+            Parameters:
+                mesh (str): The mesh to modify.
+                points (numpy.ndarray): Array of shape (vertex count, 3) ordered by vertex index.
+        """
+        raise NotImplementedError
+
+    def set_vertex_colors(self, mesh, color):
+        """
+        This function paints every vertex of a mesh with the same color.
+            Parameters:
+                mesh (str): The mesh to paint.
+                color (tuple of float): Red, green and blue from 0 to 1.
+        """
+        raise NotImplementedError
+
+    def soft_move_vertex(self, mesh, index, offset, radius, curve, local=False):
+        """
+        This function moves a vertex with soft selection enabled, so the vertices around it follow.
+            Parameters:
+                mesh (str): The mesh to modify.
+                index (int): The index of the vertex to move.
+                offset (tuple of float): Relative movement in X, Y and Z.
+                radius (float): Falloff radius of the soft selection.
+                curve (str): Falloff curve of the soft selection.
+                local (bool): True to move in the local space of the object instead of world space.
+        """
+        raise NotImplementedError
+
+    def soft_scale_vertex(self, mesh, index, scale, pivot, radius, curve):
+        """
+        This function scales a vertex around a pivot with soft selection enabled.
+            Parameters:
+                mesh (str): The mesh to modify.
+                index (int): The index of the vertex to scale.
+                scale (tuple of float): Relative scale in X, Y and Z.
+                pivot (tuple of float): The point used as pivot for the scale.
+                radius (float): Falloff radius of the soft selection.
+                curve (str): Falloff curve of the soft selection.
+        """
+        raise NotImplementedError
+
+    def disable_soft_select(self):
+        """
+        This function disables soft selection so it doesn't affect other operations.
+        """
+        raise NotImplementedError
+
+    def soften_edges(self, mesh):
+        """
+        This function softens every edge of a mesh.
+            Parameters:
+                mesh (str): The mesh to modify.
+        """
+        raise NotImplementedError
+
+    def move(self, node, translation):
+        """
+        This function moves a transform to an absolute position.
+            Parameters:
+                node (str): The transform to move.
+                translation (tuple of float): The new position in X, Y and Z.
+        """
+        raise NotImplementedError
+
+    def scale(self, node, scale):
+        """
+        This function sets the scale of a transform.
+            Parameters:
+                node (str): The transform to scale.
+                scale (tuple of float): The new scale in X, Y and Z.
+        """
+        raise NotImplementedError
+
+    def freeze_transforms(self, node):
+        """
+        This function applies the transformations of a node to its geometry and resets them.
+            Parameters:
+                node (str): The transform to freeze.
+        """
+        raise NotImplementedError
+
+    def move_pivots(self, node, offset):
+        """
+        This function moves the scale and rotate pivots of a transform.
+            Parameters:
+                node (str): The transform to modify.
+                offset (tuple of float): Relative movement in X, Y and Z.
+        """
+        raise NotImplementedError
+
+    def place_transforms(self, nodes, translations, rotations):
+        """
+        This function sets the position and rotation of several transforms.
+            Parameters:
+                nodes (list of str): The transforms to place.
+                translations (numpy.ndarray): Array of shape (nodes, 3) with the new position of each transform.
+                rotations (numpy.ndarray): Array of shape (nodes, 3) with the new rotation of each transform,
+                                           Euler angles in degrees.
+        """
+        raise NotImplementedError
+
+    def create_group(self, name):
+        """
+        This function creates an empty group.
+            Parameters:
+                name (str): The desired name for the group.
+            Returns:
+                group (str): The name of the created group.
+        """
+        raise NotImplementedError
+
+    def create_lod_group(self, name, thresholds):
+        """
+        This function creates an empty group that shows only one of its children, chosen by the camera distance.
+        The first child is shown up to the first threshold, the second one up to the second and so on.
+            Parameters:
+                name (str): The desired name for the group.
+                thresholds (list of float): Camera distance at which each child is replaced by the next one.
+            Returns:
+                group (str): The name of the created group.
+        """
+        raise NotImplementedError
+
+    def parent(self, node, group):
+        """
+        This function parents transforms to a group. It is queued inside a batch, so the names returned there are
+        the names before parenting, every command that takes the name of a transform has to be sent before.
+            Parameters:
+                node (str or list of str): The transforms to parent.
+                group (str): The new parent.
+            Returns:
+                node (str or list of str): The new name of the transforms. The current name inside a batch
+        """
+        raise NotImplementedError
+
+    def list_shapes(self, node):
+        """
+        This function lists the shapes of a transform.
+            Parameters:
+                node (str): The transform to query.
+            Returns:
+                shapes (list of str): The shapes of the transform.
+        """
+        raise NotImplementedError
+
+    def create_shading_node(self, node_type, kind, color_managed=False):
+        """
+        This function creates a shading node.
+            Parameters:
+                node_type (str): The type of node, like blinn or file.
+                kind (str): One of "shader", "texture" or "utility".
+                color_managed (bool): True to create the node with color management.
+            Returns:
+                node (str): The name of the created node.
+        """
+        raise NotImplementedError
+
+    def rename(self, node, name):
+        """
+        This function renames a node.
+            Parameters:
+                node (str): The node to rename.
+                name (str): The desired name.
+            Returns:
+                node (str): The new name of the node.
+        """
+        raise NotImplementedError
+
+    def set_attr(self, plug, *values, **kwargs):
+        """
+        This function sets the value of an attribute.
+            Parameters:
+                plug (str): The attribute to set, like node.attribute
+                *values (list): The values of the attribute.
+                **kwargs (dict): Accepts type, the data type of the attribute.
+        """
+        raise NotImplementedError
+
+    def connect_attr(self, source, destination):
+        """
+        This function connects two attributes.
+            Parameters:
+                source (str): The output attribute.
+                destination (str): The input attribute.
+        """
+        raise NotImplementedError
+
+    def assign_material(self, nodes, material):
+        """
+        This function assigns a material to objects. It is queued inside a batch.
+            Parameters:
+                nodes (str or list of str): The objects that receive the material.
+                material (str): The material to assign.
+        """
+        raise NotImplementedError
+
+    def assigned_objects(self, material):
+        """
+        This function lists the objects that use a material.
+            Parameters:
+                material (str): The material to query.
+            Returns:
+                objects (list of str): The objects that have the material assigned.
+        """
+        raise NotImplementedError
+
+    def delete_material(self, material):
+        """
+        This function deletes a material together with its shading groups.
+            Parameters:
+                material (str): The material to delete.
+        """
+        raise NotImplementedError
+
+
+class MayaBackend(SceneBackend):
+    """
+    This is the backend that talks to Maya through maya.cmds and maya.mel.
+        Attributes:
+            cmds (module): maya.cmds, or an object that mimics it.
+            mel (module): maya.mel, or an object that mimics it. None until it is used
+    """
+
+    def __init__(self, cmds_module=None, mel_module=None):
+        """
+        The constructor of MayaBackend class
+            Parameters:
+                cmds_module (module): Object used instead of maya.cmds. Default imports maya.cmds
+                mel_module (module): Object used instead of maya.mel. Default imports maya.mel when it is used
+        """
+        SceneBackend.__init__(self)
+
+        if cmds_module is None:
+            import maya.cmds as cmds_module
+
+        self.cmds = cmds_module
+        self.mel = mel_module
+
+    def begin_batch(self, name):
+        self.cmds.undoInfo(openChunk=True, chunkName=name)
+        self.cmds.refresh(suspend=True)
+
+    def end_batch(self):
+        self.cmds.refresh(suspend=False)
+        self.cmds.undoInfo(closeChunk=True)
+
+    def create_plane(self, name, dimensions, subdivisions):
+        self.cmds.polyPlane(name=name, width=dimensions, height=dimensions,
+                            sx=subdivisions, sy=subdivisions)
+
+        # The new plane is left selected
+        return self.cmds.ls(selection=True)[0]
+
+    def create_sphere(self, name, radius, subdivisions):
+        return self.cmds.polySphere(name=name, radius=radius,
+                                    subdivisionsAxis=subdivisions, subdivisionsHeight=subdivisions)[0]
+
+    def instance(self, node, name):
+        return self.cmds.instance(node, name=name)[0]
+
+    def exists(self, node):
+        return bool(node) and self.cmds.objExists(node)
+
+    def delete(self, nodes):
+        self.flush()
+        self.cmds.delete(nodes)
+
+    def _eval_mel(self, script):
+        # maya.mel is imported the first time it is needed
+        if self.mel is None:
+            import maya.mel as mel_module
+            self.mel = mel_module
+        return self.mel.eval(script)
+
+    def delete_unused_nodes(self):
+        self._eval_mel('MLdeleteUnused;')
+
+    def vertex_count(self, mesh):
+        return self.cmds.polyEvaluate(mesh, vertex=True)
+
+    def get_points(self, mesh):
+        # Query every vertex with a single command, Maya returns a flat list of coordinates
+        flat_points = self.cmds.xform(mesh + ".vtx[*]", query=True, translation=True, objectSpace=True)
+
+        return np.array(flat_points, dtype=np.float64).reshape(-1, 3)
+
+    def set_points(self, mesh, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        current_points = self.get_points(mesh)
+        if len(points) != len(current_points):
+            raise ValueError("{} has {} vertices but {} points were given".format(mesh, len(current_points),
+                                                                                   len(points)))
+        if not len(points):
+            return
+
+        # Every vertex is its original position plus its tweak, so the tweaks are moved by the difference
+        # and written back with a single setAttr, which goes to the undo queue like any other command
+        tweaks_plug = "{}.pnts[0:{}]".format(mesh, len(points) - 1)
+        tweaks = np.array(self.cmds.getAttr(tweaks_plug), dtype=np.float64).reshape(-1, 3)
+        tweaks += points - current_points
+        self.cmds.setAttr(tweaks_plug, *tweaks.ravel().tolist())
+
+    def set_vertex_colors(self, mesh, color):
+        self.cmds.polyColorPerVertex(mesh + ".vtx[*]", rgb=tuple(color), colorDisplayOption=True)
+
+    def soft_move_vertex(self, mesh, index, offset, radius, curve, local=False):
+        self.cmds.softSelect(sse=True, ssd=radius, ssc=curve)
+        self.cmds.select("%s.vtx[%i]" % (mesh, index))
+
+        if local:
+            self.cmds.move(offset[0], offset[1], offset[2], r=True, cs=True, ls=True, wd=True)
+        else:
+            self.cmds.move(offset[0], offset[1], offset[2], r=True)
+
+    def soft_scale_vertex(self, mesh, index, scale, pivot, radius, curve):
+        self.cmds.softSelect(sse=True, ssd=radius, ssc=curve)
+        self.cmds.select("%s.vtx[%i]" % (mesh, index))
+        self.cmds.scale(scale[0], scale[1], scale[2], pivot=pivot, r=True)
+
+    def disable_soft_select(self):
+        self.cmds.softSelect(sse=False)
+
+    def soften_edges(self, mesh):
+        self.cmds.polySoftEdge(mesh, a=180, ch=1)
+
+    def move(self, node, translation):
+        self.cmds.move(translation[0], translation[1], translation[2], node)
+
+    def scale(self, node, scale):
+        self.cmds.scale(scale[0], scale[1], scale[2], node)
+
+    def freeze_transforms(self, node):
+        self.cmds.makeIdentity(node, apply=True)
+
+    def move_pivots(self, node, offset):
+        self.cmds.move(offset[0], offset[1], offset[2], node + ".scalePivot", r=True)
+        self.cmds.move(offset[0], offset[1], offset[2], node + ".rotatePivot", r=True)
+
+    def place_transforms(self, nodes, translations, rotations):
+        translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3).tolist()
+        rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3).tolist()
+        if not nodes:
+            return
+
+        # Every transform is placed by one MEL script, a single call from Python whose xform commands
+        # go to the undo queue like any other command
+        commands = ['xform -translation {0[0]} {0[1]} {0[2]} -rotation {1[0]} {1[1]} {1[2]} "{2}";'.format(
+            translation, rotation, node) for node, translation, rotation in zip(nodes, translations, rotations)]
+        self._eval_mel("\n".join(commands))
+
+    def create_group(self, name):
+        return self.cmds.group(name=name, empty=True)
+
+    def create_lod_group(self, name, thresholds):
+        group = self.cmds.createNode("lodGroup", name=name)
+
+        # Same connection made by Level of Detail > Group, the distance is measured from the perspective camera
+        camera = self.cmds.listRelatives("persp", shapes=True) or []
+        if camera:
+            self.cmds.connectAttr(camera[0] + ".worldMatrix[0]", group + ".cameraMatrix")
+
+        for index, threshold in enumerate(thresholds):
+            self.cmds.setAttr("{}.threshold[{}]".format(group, index), threshold)
+
+        return group
+
+    def parent(self, node, group):
+        if self.defer("parent", group, node):
+            return node
+
+        parented = self.cmds.parent(node, group)
+        return parented[0] if isinstance(node, str) else parented
+
+    def list_shapes(self, node):
+        return self.cmds.listRelatives(node, shapes=True) or []
+
+    def create_shading_node(self, node_type, kind, color_managed=False):
+        flags = {"as" + kind.capitalize(): True}
+        if color_managed:
+            flags["isColorManaged"] = True
+
+        return self.cmds.shadingNode(node_type, **flags)
+
+    def rename(self, node, name):
+        return self.cmds.rename(node, name)
+
+    def set_attr(self, plug, *values, **kwargs):
+        self.cmds.setAttr(plug, *values, **kwargs)
+
+    def connect_attr(self, source, destination):
+        self.cmds.connectAttr(source, destination)
+
+    def assign_material(self, nodes, material):
+        if self.defer("assign_material", material, nodes):
+            return
+
+        self.cmds.select(nodes)
+        self.cmds.hyperShade(assign=material)
+
+    def assigned_objects(self, material):
+        self.flush()
+
+        # Objects are members of the shading groups connected to the material
+        objects = []
+        for shading_group in set(self.cmds.listConnections(material, type="shadingEngine") or []):
+            objects.extend(self.cmds.sets(shading_group, query=True) or [])
+        return objects
+
+    def delete_material(self, material):
+        self.flush()
+        shading_groups = set(self.cmds.listConnections(material, type="shadingEngine") or [])
+        self.cmds.delete([material] + list(shading_groups))
+
+
+class RecordingBackend(SceneBackend):
+    """
+    This is a backend that keeps the scene in memory and records every command it receives.
+    It runs on plain Python, so terrains can be generated and profiled without Maya.
+        Attributes:
+            nodes (dict of {str:dict}): Every node in the scene with its type, attributes and geometry.
+            connections (list of (str, str)): Every connection made between attributes.
+            assignments (dict of {str:str}): The material assigned to each object.
+            commands (list of (str, tuple)): Every command issued with its arguments.
+            nameNumbers (dict of {str:int}): First number that can be free for each name.
+            undoQueue (list of tuple): State of the scene before each batch, None if undo is disabled.
+    """
+
+    def __init__(self, undo=False):
+        """
+        The constructor of RecordingBackend class
+            Parameters:
+                undo (bool): True to keep the state of the scene before every batch so it can be undone.
+                             Default doesn't keep it, which saves copying the meshes
+        """
+        SceneBackend.__init__(self)
+
+        self.nodes = {}
+        self.connections = []
+        self.assignments = {}
+        self.commands = []
+        self.undoQueue = [] if undo else None
+
+        # First number that can be free for each name, so naming many nodes the same doesn't get slower
+        self.nameNumbers = {}
+
+        # Soft selection state, kept only to record it
+        self.softSelect = False
+
+    def _record(self, command, *args):
+        self.commands.append((command, args))
+
+    def begin_batch(self, name):
+        self._record("begin_batch", name)
+
+        # A batch is a single undo chunk, like in Maya
+        if self.undoQueue is not None:
+            self.undoQueue.append(copy.deepcopy((self.nodes, self.connections, self.assignments, self.nameNumbers)))
+
+    def end_batch(self):
+        self._record("end_batch")
+
+    def undo(self):
+        """
+        This function restores the scene to the state it had before the last batch.
+        """
+        if not self.undoQueue:
+            raise RuntimeError("There are no more commands to undo")
+
+        self._record("undo")
+        self.nodes, self.connections, self.assignments, self.nameNumbers = self.undoQueue.pop()
+
+    def _unique_name(self, name):
+        # Add a number to the name until it is unique, just like Maya does
+        if name not in self.nodes:
+            return name
+
+        # Numbers below the one saved for a name are taken, deleting or renaming a node forgets its name
+        base_name = name.rstrip("0123456789")
+        number = self.nameNumbers.get(base_name, 1)
+        while "{}{}".format(base_name, number) in self.nodes:
+            number += 1
+        self.nameNumbers[base_name] = number + 1
+
+        return "{}{}".format(base_name, number)
+
+    def _add_node(self, name, node_type, points=None):
+        name = self._unique_name(name)
+        self.nodes[name] = {"type": node_type, "attributes": {}, "parent": None,
+                            "translate": [0.0, 0.0, 0.0], "scale": [1.0, 1.0, 1.0],
+                            "rotate": [0.0, 0.0, 0.0], "pivot": [0.0, 0.0, 0.0],
+                            "points": points, "instanceOf": None}
+        return name
+
+    def _mesh(self, mesh):
+        # Get the node that keeps the points for a transform or a shape
+        if mesh not in self.nodes:
+            raise ValueError("No object matches name: {}".format(mesh))
+        if self.nodes[mesh]["points"] is None:
+            raise ValueError("Object is not a mesh: {}".format(mesh))
+        return self.nodes[mesh]
+
+    def create_plane(self, name, dimensions, subdivisions):
+        self._record("create_plane", name, dimensions, subdivisions)
+
+        # Same vertex order as Maya, rows go from positive to negative Z and columns from negative to positive X
+        coordinates = np.linspace(-dimensions / 2.0, dimensions / 2.0, subdivisions + 1)
+        points = np.zeros((subdivisions + 1, subdivisions + 1, 3))
+        points[:, :, 0] = coordinates[np.newaxis, :]
+        points[:, :, 2] = -coordinates[:, np.newaxis]
+
+        return self._add_node(name, "mesh", points.reshape(-1, 3))
+
+    def create_sphere(self, name, radius, subdivisions):
+        self._record("create_sphere", name, radius, subdivisions)
+
+        # Same vertex order as Maya, rings from bottom to top followed by the bottom and top poles
+        heights = -np.pi / 2 + np.pi * np.arange(1, subdivisions) / subdivisions
+        angles = 2 * np.pi * np.arange(subdivisions) / subdivisions
+        rings = np.zeros((subdivisions - 1, subdivisions, 3))
+        rings[:, :, 0] = np.cos(heights)[:, np.newaxis] * np.cos(angles)[np.newaxis, :]
+        rings[:, :, 1] = np.sin(heights)[:, np.newaxis]
+        rings[:, :, 2] = -np.cos(heights)[:, np.newaxis] * np.sin(angles)[np.newaxis, :]
+        points = np.vstack([rings.reshape(-1, 3), [[0, -1, 0], [0, 1, 0]]]) * radius
+
+        return self._add_node(name, "mesh", points)
+
+    def instance(self, node, name):
+        self._record("instance", node, name)
+
+        # The instance shares the points of the original and copies its transformations
+        original = self.nodes[node]
+        instance = self._add_node(name, original["type"], original["points"])
+        for attribute in ("parent", "translate", "scale", "rotate", "pivot"):
+            self.nodes[instance][attribute] = copy.deepcopy(original[attribute])
+        self.nodes[instance]["instanceOf"] = original["instanceOf"] or node
+
+        return instance
+
+    def exists(self, node):
+        return bool(node) and node in self.nodes
+
+    def delete(self, nodes):
+        self.flush()
+        self._record("delete", nodes)
+
+        pending = [nodes] if isinstance(nodes, str) else list(nodes)
+        for node in pending:
+            if node not in self.nodes:
+                raise ValueError("No object matches name: {}".format(node))
+
+        # Children are deleted with their parents
+        while pending:
+            node = pending.pop()
+            if node not in self.nodes:
+                continue
+            del self.nodes[node]
+            self.nameNumbers.pop(node.rstrip("0123456789"), None)
+            pending.extend(name for name, data in self.nodes.items() if data["parent"] == node)
+
+        self.assignments = {node: material for node, material in self.assignments.items()
+                            if node in self.nodes and material in self.nodes}
+        self.connections = [(source, destination) for source, destination in self.connections
+                            if source.split(".")[0] in self.nodes and destination.split(".")[0] in self.nodes]
+
+    def delete_unused_nodes(self):
+        self._record("delete_unused_nodes")
+
+        # Shading nodes that are not assigned nor connected to anything assigned
+        used = set(self.assignments.values())
+        pending = list(used)
+        while pending:
+            node = pending.pop()
+            for source, destination in self.connections:
+                if destination.split(".")[0] == node and source.split(".")[0] not in used:
+                    used.add(source.split(".")[0])
+                    pending.append(source.split(".")[0])
+
+        for node in [name for name, data in self.nodes.items()
+                     if data["type"] in ("shader", "texture", "utility") and name not in used]:
+            del self.nodes[node]
+            self.nameNumbers.pop(node.rstrip("0123456789"), None)
+
+        self.connections = [(source, destination) for source, destination in self.connections
+                            if source.split(".")[0] in self.nodes and destination.split(".")[0] in self.nodes]
+
+    def vertex_count(self, mesh):
+        self._record("vertex_count", mesh)
+        return len(self._mesh(mesh)["points"])
+
+    def get_points(self, mesh):
+        self._record("get_points", mesh)
+        return self._mesh(mesh)["points"].copy()
+
+    def set_points(self, mesh, points):
+        self._record("set_points", mesh)
+        self._mesh(mesh)["points"] = np.array(points, dtype=np.float64).reshape(-1, 3)
+
+    def set_vertex_colors(self, mesh, color):
+        self._record("set_vertex_colors", mesh, color)
+        self._mesh(mesh)["attributes"]["vertexColor"] = tuple(color)
+
+    def _soft_weights(self, points, index, radius):
+        # Smooth falloff around the vertex, an approximation of Maya's soft selection
+        distances = np.linalg.norm(points - points[index], axis=1)
+        weights = np.clip(1.0 - distances / max(abs(radius), 1e-9), 0.0, 1.0)
+        return weights ** 2 * (3 - 2 * weights)
+
+    def soft_move_vertex(self, mesh, index, offset, radius, curve, local=False):
+        self._record("soft_move_vertex", mesh, index, offset, radius, curve, local)
+        self.softSelect = True
+
+        points = self._mesh(mesh)["points"]
+        points += self._soft_weights(points, index, radius)[:, np.newaxis] * np.asarray(offset)
+
+    def soft_scale_vertex(self, mesh, index, scale, pivot, radius, curve):
+        self._record("soft_scale_vertex", mesh, index, scale, pivot, radius, curve)
+        self.softSelect = True
+
+        points = self._mesh(mesh)["points"]
+        scaled = (points - np.asarray(pivot)) * np.asarray(scale) + np.asarray(pivot)
+        points += self._soft_weights(points, index, radius)[:, np.newaxis] * (scaled - points)
+
+    def disable_soft_select(self):
+        self._record("disable_soft_select")
+        self.softSelect = False
+
+    def soften_edges(self, mesh):
+        self._record("soften_edges", mesh)
+        self._mesh(mesh)
+
+    def move(self, node, translation):
+        self._record("move", node, translation)
+        self.nodes[node]["translate"] = list(translation)
+
+    def scale(self, node, scale):
+        self._record("scale", node, scale)
+        self.nodes[node]["scale"] = list(scale)
+
+    def freeze_transforms(self, node):
+        self._record("freeze_transforms", node)
+
+        data = self.nodes[node]
+        if data["points"] is not None:
+            data["points"] = data["points"] * np.asarray(data["scale"]) + np.asarray(data["translate"])
+        data["scale"] = [1.0, 1.0, 1.0]
+        data["translate"] = [0.0, 0.0, 0.0]
+
+    def move_pivots(self, node, offset):
+        self._record("move_pivots", node, offset)
+        self.nodes[node]["pivot"] = list(np.asarray(self.nodes[node]["pivot"]) + np.asarray(offset))
+
+    def place_transforms(self, nodes, translations, rotations):
+        self._record("place_transforms", nodes)
+
+        for node, translation, rotation in zip(nodes, translations, rotations):
+            self.nodes[node]["translate"] = [float(value) for value in translation]
+            self.nodes[node]["rotate"] = [float(value) for value in rotation]
+
+    def create_group(self, name):
+        self._record("create_group", name)
+        return self._add_node(name, "transform")
+
+    def create_lod_group(self, name, thresholds):
+        self._record("create_lod_group", name, thresholds)
+        group = self._add_node(name, "lodGroup")
+        self.nodes[group]["attributes"]["threshold"] = [float(threshold) for threshold in thresholds]
+
+        return group
+
+    def parent(self, node, group):
+        if self.defer("parent", group, node):
+            return node
+
+        self._record("parent", node, group)
+
+        for child in [node] if isinstance(node, str) else node:
+            if child not in self.nodes or group not in self.nodes:
+                raise ValueError("No object matches name: {}".format(child if group in self.nodes else group))
+            self.nodes[child]["parent"] = group
+
+        return node
+
+    def list_shapes(self, node):
+        self._record("list_shapes", node)
+        # Instances share the shape of the original
+        shape_owner = self.nodes[node]["instanceOf"] or node
+        return [shape_owner + "Shape"] if self.nodes[node]["points"] is not None else []
+
+    def create_shading_node(self, node_type, kind, color_managed=False):
+        self._record("create_shading_node", node_type, kind, color_managed)
+        node = self._add_node(node_type + "1", kind)
+        self.nodes[node]["attributes"]["nodeType"] = node_type
+        return node
+
+    def rename(self, node, name):
+        self._record("rename", node, name)
+
+        new_name = self._unique_name(name) if name != node else node
+        self.nodes[new_name] = self.nodes.pop(node)
+        self.nameNumbers.pop(node.rstrip("0123456789"), None)
+
+        # The material and the children follow the node
+        if node in self.assignments:
+            self.assignments[new_name] = self.assignments.pop(node)
+        for values in self.nodes.values():
+            if values["parent"] == node:
+                values["parent"] = new_name
+        return new_name
+
+    def set_attr(self, plug, *values, **kwargs):
+        self._record("set_attr", plug, values)
+
+        node, attribute = plug.split(".", 1)
+        self.nodes[node]["attributes"][attribute] = values[0] if len(values) == 1 else values
+
+    def connect_attr(self, source, destination):
+        self._record("connect_attr", source, destination)
+        self.connections.append((source, destination))
+
+    def assign_material(self, nodes, material):
+        if self.defer("assign_material", material, nodes):
+            return
+
+        self._record("assign_material", nodes, material)
+
+        for node in [nodes] if isinstance(nodes, str) else nodes:
+            self.assignments[node] = material
+
+    def assigned_objects(self, material):
+        self.flush()
+        self._record("assigned_objects", material)
+        return [node for node, assigned in self.assignments.items() if assigned == material]
+
+    def delete_material(self, material):
+        self._record("delete_material", material)
+        self.delete(material)
+
+    def command_count(self, command=None):
+        """
+        This function counts the commands that were issued to this backend.
+            Parameters:
+                command (str): Count only this command. Default counts every command
+            Returns:
+                count (int): The amount of commands.
+        """
+        if command is None:
+            return len(self.commands)
+        return sum(1 for name, args in self.commands if name == command)
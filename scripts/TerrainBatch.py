@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import copy
+import time
+import zlib
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from TerrainCore import TerrainGenerator, MAX_NOISE_SEED, rock_layout
+from SceneBackend import RecordingBackend
+from HeightCache import HeightfieldCache
+from TerrainTiles import pool_context
+
+"""
+    Batch generation of terrain variants for the Terrain Generator.
+    A JSON or YAML parameter file lists the variants, each one is generated on a RecordingBackend by a pool of
+    processes and written to disk as a heightmap and a JSON manifest with its parameters and rocks.
+    Every variant draws its random values from its own seed, a variant without a seed gets one derived from
+    its name and the base seed, so the results don't depend on the order of the file or the amount of workers.
+    A variant whose manifest already has the same parameters is not generated again.
+    Parameter file:
+        {"defaults": {"dimensions": 100, "subdivisions": 200},
+         "variants": [{"name": "dunes", "method": "noise", "settings": {"noiseType": "Perlin"}},
+                      {"name": "hills", "method": "soft", "seed": 12, "rocks": {"amount": 300}}]}
+    Usage:
+        python TerrainBatch.py variants.json --output variants --workers 4
+    by Daniel Orozco
+"""
+
+# Seed used to derive the seed of the variants that don't set one
+BATCH_SEED = 6000
+
+# Deformation methods by name, the same indexes used by TerrainGenerator.deform_terrain
+DEFORMATION_METHODS = {"soft": 0, "noise": 1, "heightmap": 2}
+
+# Parameters of a variant that aren't set in the file
+# settings are attributes of TerrainGenerator, rocks settings are set before creating the rocks
+VARIANT_DEFAULTS = {
+    "name": "",
+    "dimensions": 100,
+    "subdivisions": 100,
+    "tiles": [1, 1],
+    "method": "noise",
+    "seed": None,
+    "heightmap": "",
+    "format": "png",
+    "settings": {},
+    "rocks": {"amount": 0, "hue": 30, "brightness": [0.2, 0.6], "saturation": [0.1, 0.4], "settings": {}},
+    "materials": {"terrain": {"name": "terrainMaterial", "color": "", "normal": "", "specular": ""},
+                  "rocks": {"name": "rockMaterial", "color": "", "normal": ""}},
+}
+
+
+def load_variants(path):
+    """
+    This function reads the variants of a parameter file.
+        Parameters:
+            path (str): Path of a .json, .yaml or .yml file. It has a list of variants, or a dictionary with the
+                        list in "variants" and the values shared by all of them in "defaults".
+        Returns:
+            defaults (dict): Values shared by every variant.
+            variants (list of dict): Parameters of each variant as they are in the file.
+    """
+    with open(path) as parameter_file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            # PyYAML is only needed for YAML files
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is needed to read {}, use a JSON file instead".format(path))
+            data = yaml.safe_load(parameter_file)
+        else:
+            data = json.load(parameter_file)
+
+    if isinstance(data, list):
+        return {}, data
+
+    return data.get("defaults", {}), data.get("variants", [])
+
+
+def merge_parameters(base, overrides):
+    """
+    This function combines two sets of parameters, nested dictionaries are combined too.
+        Parameters:
+            base (dict): Parameters that are used when they are not overridden.
+            overrides (dict): Parameters that replace the base ones.
+        Returns:
+            parameters (dict): The combined parameters.
+    """
+    parameters = copy.deepcopy(base)
+
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(parameters.get(key), dict):
+            parameters[key] = merge_parameters(parameters[key], value)
+        else:
+            parameters[key] = copy.deepcopy(value)
+
+    return parameters
+
+
+def variant_seed(name, base_seed=BATCH_SEED):
+    """
+    This function derives the seed of a variant that doesn't set one.
+    It depends on the name and not on the position in the file, so adding a variant doesn't change the others.
+        Parameters:
+            name (str): Name of the variant.
+            base_seed (int): Seed of the whole batch. Default to BATCH_SEED
+        Returns:
+            seed (int): Whole number from 1 to MAX_NOISE_SEED.
+    """
+    return zlib.crc32("{}:{}".format(base_seed, name).encode("utf-8")) % MAX_NOISE_SEED + 1
+
+
+def resolve_variants(defaults, variants, base_seed=BATCH_SEED, directory=""):
+    """
+    This function fills the parameters of every variant and checks them before anything is generated.
+        Parameters:
+            defaults (dict): Values shared by every variant.
+            variants (list of dict): Parameters of each variant as they are in the file.
+            base_seed (int): Seed of the whole batch. Default to BATCH_SEED
+            directory (str): Directory of the parameter file, relative heightmap paths start there.
+        Returns:
+            variants (list of dict): Every parameter of each variant, with its seed and method index.
+    """
+    generator = TerrainGenerator(RecordingBackend())
+    resolved = []
+    names = set()
+
+    for index, variant in enumerate(variants):
+        parameters = merge_parameters(merge_parameters(VARIANT_DEFAULTS, defaults), variant)
+
+        # Variants are written in files named after them
+        if not parameters["name"]:
+            parameters["name"] = "variant_{}".format(index)
+        if parameters["name"] in names:
+            raise ValueError("Variant name '{}' is used more than once".format(parameters["name"]))
+        names.add(parameters["name"])
+
+        method = parameters["method"]
+        if method not in DEFORMATION_METHODS and method not in DEFORMATION_METHODS.values():
+            raise ValueError("Unknown method '{}' in variant '{}', use one of {}".format(
+                method, parameters["name"], sorted(DEFORMATION_METHODS)))
+        parameters["method"] = DEFORMATION_METHODS.get(method, method)
+
+        for attribute in list(parameters["settings"]) + list(parameters["rocks"]["settings"]):
+            if not hasattr(generator, attribute):
+                raise ValueError("Unknown setting '{}' in variant '{}'".format(attribute, parameters["name"]))
+
+        if parameters["seed"] is None:
+            parameters["seed"] = variant_seed(parameters["name"], base_seed)
+
+        if parameters["heightmap"]:
+            parameters["heightmap"] = os.path.join(directory, parameters["heightmap"])
+        if parameters["method"] == 2 and not os.path.exists(parameters["heightmap"]):
+            raise ValueError("Heightmap '{}' of variant '{}' doesn't exist".format(parameters["heightmap"],
+                                                                                   parameters["name"]))
+
+        resolved.append(parameters)
+
+    return resolved
+
+
+def variant_paths(parameters, output_directory):
+    """
+    This function returns the files written for a variant.
+        Parameters:
+            parameters (dict): Every parameter of the variant.
+            output_directory (str): Directory of the results.
+        Returns:
+            heightmap_path (str): Path of the heightmap.
+            manifest_path (str): Path of the JSON manifest.
+    """
+    base_path = os.path.join(output_directory, parameters["name"])
+
+    return "{}.{}".format(base_path, parameters["format"]), base_path + ".json"
+
+
+def is_generated(parameters, output_directory):
+    """
+    This function checks if a variant was already generated with the same parameters.
+        Parameters:
+            parameters (dict): Every parameter of the variant.
+            output_directory (str): Directory of the results.
+        Returns:
+            generated (bool): True if the heightmap exists and the manifest has the same parameters.
+    """
+    heightmap_path, manifest_path = variant_paths(parameters, output_directory)
+    if not os.path.exists(heightmap_path) or not os.path.exists(manifest_path):
+        return False
+
+    with open(manifest_path) as manifest_file:
+        try:
+            return json.load(manifest_file).get("parameters") == parameters
+        except ValueError:
+            return False
+
+
+def generate_variant(parameters, output_directory):
+    """
+    This function generates a variant on a RecordingBackend and writes its heightmap and manifest.
+    It runs on the worker processes, so it only receives and returns plain values.
+        Parameters:
+            parameters (dict): Every parameter of the variant.
+            output_directory (str): Directory of the results.
+        Returns:
+            result (dict): Name, seconds, scene commands and files of the variant.
+    """
+    start_time = time.perf_counter()
+
+    generator = TerrainGenerator(RecordingBackend())
+
+    # Every random value of the variant comes from its seed
+    generator.randomGenerator = random.Random(parameters["seed"])
+    generator.heightCache = HeightfieldCache(cache_directory=None)
+    generator.seed = parameters["seed"]
+    generator.heightmapPath = parameters["heightmap"]
+    for attribute, value in parameters["settings"].items():
+        setattr(generator, attribute, value)
+
+    generator.create_terrain(parameters["name"], parameters["dimensions"], parameters["subdivisions"],
+                             tuple(parameters["tiles"]))
+    generator.deform_terrain(parameters["method"])
+
+    terrain_material = parameters["materials"]["terrain"]
+    material = generator.materials.material(terrain_material["name"], terrain_material["color"],
+                                            terrain_material["normal"], terrain_material["specular"])
+    generator.backend.assign_material(generator.terrain_nodes(), material)
+
+    rocks = parameters["rocks"]
+    layout = None
+    if rocks["amount"] > 0:
+        for attribute, value in rocks["settings"].items():
+            setattr(generator, attribute, value)
+
+        # The layout is kept for the manifest, the same one creates the rocks
+        heightfield, width, depth = generator.terrain_heightfield()
+        layout = rock_layout(generator.rock_settings(), rocks["amount"], generator.rock_radius(), heightfield, width,
+                             depth, rocks["hue"], tuple(rocks["brightness"]), tuple(rocks["saturation"]))
+        rock_material = parameters["materials"]["rocks"]
+        generator.create_rocks(parameters["name"] + "_rock", rocks["amount"], rock_material["name"],
+                               rock_material["color"], rock_material["normal"], rocks["hue"],
+                               tuple(rocks["brightness"]), tuple(rocks["saturation"]), layout)
+
+    # The heights of the heightmap are mapped back to the scene with the range in the manifest
+    heightfield = generator.terrain_heightfield()[0]
+    height_range = (float(heightfield.min()), float(heightfield.max()))
+
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+    heightmap_path, manifest_path = variant_paths(parameters, output_directory)
+    generator.export_heightmap(heightmap_path, height_range)
+
+    manifest = {"parameters": parameters, "noiseSeed": generator.noise_seed, "heightRange": height_range,
+                "shape": list(heightfield.shape), "heightmap": os.path.basename(heightmap_path),
+                "commands": generator.backend.command_count(), "rocks": None}
+    if layout is not None:
+        manifest["rocks"] = {"positions": layout["positions"].tolist(), "scales": layout["scales"],
+                             "colors": layout["colors"], "prototypes": layout["prototypes"],
+                             "crowded": layout["crowded"]}
+
+    # Written last, so a variant that stopped halfway is generated again
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+    return {"name": parameters["name"], "seconds": time.perf_counter() - start_time,
+            "commands": manifest["commands"], "heightmap": heightmap_path, "manifest": manifest_path}
+
+
+def run_batch(variants, output_directory, workers=1, force=False, report=None):
+    """
+    This function generates every variant that wasn't generated yet with the same parameters.
+        Parameters:
+            variants (list of dict): Every parameter of each variant, returned by resolve_variants.
+            output_directory (str): Directory of the results.
+            workers (int): Amount of processes. Default generates the variants one by one in this process
+            force (bool): Generate the variants that were already generated too. Default to False
+            report (function): Receives the result of each variant when it ends. Default doesn't report them
+        Returns:
+            results (list of dict): Result of each variant in the order of the file, with its state.
+    """
+    results = {}
+    pending = []
+
+    for parameters in variants:
+        if not force and is_generated(parameters, output_directory):
+            results[parameters["name"]] = {"name": parameters["name"], "state": "Cached"}
+            if report is not None:
+                report(results[parameters["name"]])
+        else:
+            pending.append(parameters)
+
+    def finish(name, compute):
+        try:
+            result = dict(compute(), state="Done")
+        except Exception as error:
+            result = {"name": name, "state": "Failed", "error": "{}: {}".format(type(error).__name__, error)}
+        results[name] = result
+        if report is not None:
+            report(result)
+
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=pool_context()) as executor:
+            futures = dict((executor.submit(generate_variant, parameters, output_directory), parameters["name"])
+                           for parameters in pending)
+            for future in as_completed(futures):
+                finish(futures[future], future.result)
+    else:
+        for parameters in pending:
+            finish(parameters["name"], lambda: generate_variant(parameters, output_directory))
+
+    return [results[parameters["name"]] for parameters in variants]
+
+
+def format_result(result):
+    """
+    This function formats the result of a variant as a line of the report.
+        Parameters:
+            result (dict): Result returned by run_batch.
+        Returns:
+            line (str): The line of the report.
+    """
+    if result["state"] != "Done":
+        return "{:<28}{:>10}  {}".format(result["name"], result["state"], result.get("error", "")).rstrip()
+
+    return "{:<28}{:>10}{:>12.3f}{:>12}".format(result["name"], result["state"], result["seconds"],
+                                                result["commands"])
+
+
+def main(arguments=None):
+    """
+    This function generates the variants of a parameter file from the command line.
+        Parameters:
+            arguments (list of str): Command line arguments. Default uses sys.argv
+        Returns:
+            exit_code (int): 1 if a variant failed, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Generates terrain variants from a JSON or YAML parameter file.")
+    parser.add_argument("parameters", help="JSON or YAML file with the variants.")
+    parser.add_argument("--output", default="variants", help="Directory of the heightmaps and manifests.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Amount of processes.")
+    parser.add_argument("--seed", type=int, default=BATCH_SEED, help="Seed of the variants that don't set one.")
+    parser.add_argument("--filter", default="", help="Generate only the variants that contain this text.")
+    parser.add_argument("--force", action="store_true", help="Generate the variants already generated too.")
+    options = parser.parse_args(arguments)
+
+    defaults, variants = load_variants(options.parameters)
+    variants = resolve_variants(defaults, variants, options.seed, os.path.dirname(options.parameters))
+    variants = [parameters for parameters in variants if options.filter in parameters["name"]]
+
+    print("{:<28}{:>10}{:>12}{:>12}".format("variant", "state", "seconds", "commands"))
+
+    def report(result):
+        print(format_result(result))
+        sys.stdout.flush()
+
+    results = run_batch(variants, options.output, options.workers, options.force, report)
+
+    failed = [result["name"] for result in results if result["state"] == "Failed"]
+    print("{} variants in {}, {} failed".format(len(results), options.output, len(failed)))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
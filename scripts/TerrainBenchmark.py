@@ -0,0 +1,249 @@
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from TerrainCore import TerrainGenerator
+from SceneBackend import RecordingBackend
+from HeightCache import HeightfieldCache
+
+"""
+    Benchmarks of the Terrain Generator.
+    Terrains and rocks are generated on a RecordingBackend, so the suite runs without Maya and every case issues
+    the same commands on any machine. Each case reports its wall time, peak memory and amount of scene commands,
+    and can be compared with a baseline saved by a previous run.
+    Usage:
+        python TerrainBenchmark.py --save-baseline baseline.json
+        python TerrainBenchmark.py --baseline baseline.json
+    by Daniel Orozco
+"""
+
+# Seed used by every case, so the same random values are chosen on every run
+BENCHMARK_SEED = 6000
+
+# Sizes swept by the suite
+TERRAIN_SUBDIVISIONS = [10, 100, 500, 1000, 2000]
+DEFORMATION_METHODS = {0: "soft", 1: "noise"}
+ROCK_AMOUNTS = [1, 10, 100, 1000, 10000]
+
+# Material options of the rocks, texture maps are only file paths for a RecordingBackend
+ROCK_MATERIALS = {
+    "per_rock": {"rockColorMode": "Per Rock", "rockPrototypes": 0},
+    "palette": {"rockColorMode": "Palette", "rockPrototypes": 16},
+    "vertex_color": {"rockColorMode": "Vertex Color", "rockPrototypes": 16},
+    "textured": {"rockColorMode": "Palette", "rockPrototypes": 16, "color": "rock_color.png",
+                 "normal": "rock_normal.png"},
+}
+
+# Largest sizes used by a quick run
+QUICK_SUBDIVISIONS = 500
+QUICK_ROCKS = 1000
+
+
+def benchmark_cases(quick=False):
+    """
+    This function lists every case of the suite.
+        Parameters:
+            quick (bool): Skip the biggest terrains and rock amounts. Default runs every case
+        Returns:
+            cases (list of dict): Name and parameters of each case.
+    """
+    cases = []
+
+    for subdivisions in TERRAIN_SUBDIVISIONS:
+        if quick and subdivisions > QUICK_SUBDIVISIONS:
+            continue
+        for method, method_name in sorted(DEFORMATION_METHODS.items()):
+            cases.append({"name": "terrain_{}_{}".format(method_name, subdivisions), "kind": "terrain",
+                          "subdivisions": subdivisions, "method": method})
+
+    for rocks_amount in ROCK_AMOUNTS:
+        if quick and rocks_amount > QUICK_ROCKS:
+            continue
+        for material_name in ROCK_MATERIALS:
+            cases.append({"name": "rocks_{}_{}".format(material_name, rocks_amount), "kind": "rocks",
+                          "rocks": rocks_amount, "material": material_name})
+
+    return cases
+
+
+def benchmark_generator():
+    """
+    This function creates a generator on an empty RecordingBackend, with fixed seeds and a cache only in memory,
+    so every case starts from the same state and computes every heightfield.
+        Returns:
+            generator (TerrainGenerator): The generator used by a case.
+    """
+    generator = TerrainGenerator(RecordingBackend())
+    generator.randomGenerator = random.Random(BENCHMARK_SEED)
+    generator.heightCache = HeightfieldCache(cache_directory=None)
+    generator.seed = BENCHMARK_SEED
+
+    return generator
+
+
+def prepare_case(generator, case):
+    """
+    This function creates what a case needs before it is measured, rocks are placed on a deformed terrain.
+        Parameters:
+            generator (TerrainGenerator): The generator used by the case.
+            case (dict): Name and parameters of the case.
+        Returns:
+            run (function): Function without parameters that runs the measured part of the case.
+    """
+    if case["kind"] == "terrain":
+        def run():
+            generator.create_terrain("benchTerrain", 100, case["subdivisions"])
+            generator.deform_terrain(case["method"])
+
+        return run
+
+    generator.create_terrain("benchTerrain", 100, 100)
+    generator.deform_terrain(1)
+
+    options = dict(ROCK_MATERIALS[case["material"]])
+    color = options.pop("color", "")
+    normal = options.pop("normal", "")
+    for attribute, value in options.items():
+        setattr(generator, attribute, value)
+
+    def run():
+        generator.create_rocks("benchRock", case["rocks"], "benchRockMat", color, normal, 30, (0.2, 0.6), (0.1, 0.4))
+
+    return run
+
+
+def run_case(case, repeats=1):
+    """
+    This function measures a case.
+    Time is the best of every repetition, memory is measured on a separate run because tracing allocations
+    slows down the code.
+        Parameters:
+            case (dict): Name and parameters of the case.
+            repeats (int): Amount of timed runs. Default to 1
+        Returns:
+            result (dict): Seconds, peak bytes allocated and amount of scene commands of the case.
+    """
+    seconds = None
+    for _ in range(max(repeats, 1)):
+        generator = benchmark_generator()
+        run = prepare_case(generator, case)
+
+        start_time = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start_time
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    generator = benchmark_generator()
+    run = prepare_case(generator, case)
+    commands_before = generator.backend.command_count()
+
+    tracemalloc.start()
+    try:
+        run()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": seconds, "peakBytes": peak_bytes,
+            "commands": generator.backend.command_count() - commands_before}
+
+
+def compare_results(results, baseline, time_tolerance=0.25, memory_tolerance=0.1, time_floor=0.05):
+    """
+    This function finds the cases that got worse than in a baseline.
+    Command counts don't depend on the machine, so any new command is a regression.
+        Parameters:
+            results (dict of {str:dict}): Results of this run by case name.
+            baseline (dict of {str:dict}): Results of a previous run by case name.
+            time_tolerance (float): Fraction of extra time allowed. Default to 25%
+            memory_tolerance (float): Fraction of extra peak memory allowed. Default to 10%
+            time_floor (float): Seconds of extra time always allowed, so tiny cases don't fail by noise.
+                                Default to 0.05
+        Returns:
+            regressions (list of str): Description of each regression.
+    """
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        base = baseline[name]
+
+        if result["commands"] > base["commands"]:
+            regressions.append("{}: {} scene commands, baseline {}".format(name, result["commands"],
+                                                                           base["commands"]))
+
+        if result["seconds"] > base["seconds"] * (1.0 + time_tolerance) + time_floor:
+            regressions.append("{}: {:.3f} s, baseline {:.3f} s".format(name, result["seconds"], base["seconds"]))
+
+        if result["peakBytes"] > base["peakBytes"] * (1.0 + memory_tolerance):
+            regressions.append("{}: {:.1f} MB peak, baseline {:.1f} MB".format(name, result["peakBytes"] / 1e6,
+                                                                              base["peakBytes"] / 1e6))
+
+    return regressions
+
+
+def format_result(name, result):
+    """
+    This function formats the result of a case as a line of the report.
+        Parameters:
+            name (str): Name of the case.
+            result (dict): Result returned by run_case.
+        Returns:
+            line (str): The line of the report.
+    """
+    return "{:<28}{:>12.4f}{:>14.2f}{:>12}".format(name, result["seconds"], result["peakBytes"] / 1e6,
+                                                   result["commands"])
+
+
+def main(arguments=None):
+    """
+    This function runs the suite from the command line.
+        Parameters:
+            arguments (list of str): Command line arguments. Default uses sys.argv
+        Returns:
+            exit_code (int): 1 if a case regressed against the baseline, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of the Terrain Generator on a RecordingBackend.")
+    parser.add_argument("--baseline", help="JSON file of a previous run, regressions against it fail the run.")
+    parser.add_argument("--save-baseline", help="Save the results of this run as a baseline in this JSON file.")
+    parser.add_argument("--filter", default="", help="Run only the cases that contain this text.")
+    parser.add_argument("--quick", action="store_true", help="Skip the biggest terrains and rock amounts.")
+    parser.add_argument("--repeats", type=int, default=1, help="Timed runs of each case, the best one is kept.")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="Fraction of extra time allowed.")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1, help="Fraction of extra memory allowed.")
+    options = parser.parse_args(arguments)
+
+    results = {}
+    print("{:<28}{:>12}{:>14}{:>12}".format("case", "seconds", "peak MB", "commands"))
+
+    for case in benchmark_cases(options.quick):
+        if options.filter not in case["name"]:
+            continue
+        results[case["name"]] = run_case(case, options.repeats)
+        print(format_result(case["name"], results[case["name"]]))
+        sys.stdout.flush()
+
+    if options.save_baseline:
+        with open(options.save_baseline, "w") as baseline_file:
+            json.dump({"cases": results}, baseline_file, indent=2, sort_keys=True)
+        print("Baseline saved in {}".format(options.save_baseline))
+
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["cases"]
+
+        regressions = compare_results(results, baseline, options.time_tolerance, options.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION {}".format(regression))
+        if regressions:
+            return 1
+        print("No regressions against {}".format(options.baseline))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1500 @@
+import os
+import copy
+import logging
+import functools
+import random
+from types import MappingProxyType
+import colorsys
+import numpy as np
+from NoiseField import noise_field
+from Erosion import erode_heightfield
+from HeightField import soft_selection_field, sample_heightfield, sample_normals, normal_rotations, \
+    heightfield_pyramid
+from RockMesh import rock_points
+from RockScatter import PoissonDiskScatter, terrain_density
+from TerrainTiles import tile_origin, tile_parameters, iter_tile_heightfields
+from HeightCache import HeightfieldCache
+from HeightmapIO import export_heightmap, heightmap_format, import_heightmap
+from SceneBackend import MayaBackend
+from Instrumentation import Profiler
+from MaterialRegistry import MaterialRegistry
+
+"""
+    Core of the Terrain Generator. Creates the terrains, rocks and materials through a scene backend,
+    so it can be imported without a Maya session when it is used with RecordingBackend.
+    by Daniel Orozco
+"""
+
+# Same logger used by the UI
+logger = logging.getLogger("TerrainGenerator")
+
+# Ways of giving a random color to each rock
+ROCK_COLOR_MODES = ["Per Rock", "Palette", "Vertex Color"]
+
+# Largest noise seed chosen when no seed is set
+MAX_NOISE_SEED = 10000
+
+
+def batched(function):
+    """
+    This function makes a method of TerrainGenerator run inside a batch of its backend,
+    so it is undone with a single undo and the viewport is not refreshed until it ends.
+        Parameters:
+            function (function): The method to wrap.
+        Returns:
+            wrapper (function): The wrapped method.
+    """
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        with self.backend.batch(function.__name__):
+            return function(self, *args, **kwargs)
+
+    return wrapper
+
+
+def stage(name):
+    """
+    This function makes a method of TerrainGenerator run as a span of its profiler.
+        Parameters:
+            name (str): Name of the span.
+        Returns:
+            decorator (function): Decorator that wraps the method.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.span(name):
+                return function(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TerrainGenerator:
+    """
+    This is a class for creating and deforming terrains and rocks.
+        Attributes:
+            gridObject (str): Reference to the grid used to generate the terrain.
+            gridDimensions (int): Width and height of the grid.
+            gridSubdivisions (int): Quantity of subdivisions uses by the grid.
+            gridTiles (list of list of str): Planes of a tiled terrain by row and column. Empty for a single grid.
+            lodLevels (int): Amount of reduced meshes created for each mesh of the terrain, each one with half the
+                             subdivisions of the previous one. Zero creates only the full resolution
+            lodDistance (float): Camera distance at which the first reduced mesh is shown, in terrain sizes.
+                                 Every next level is shown at twice the distance.
+            terrainLods (dict of {str:list of str}): Reduced meshes of each mesh of the terrain, from high to low.
+            terrainRoot (str): Top node of the terrain, gridObject or the level of detail group of a single grid.
+            workers (int): Amount of processes used to compute the tiles of a tiled terrain, and of threads used
+                           by the erosion.
+            maxHeight (float): Max amount of movement in Y axis possible for a vertex.
+            maxPoints (int): Max number of vertices that can be used in softSelection method.
+            softSelectRadius (float): Max radius that is used by the softSelectTool.
+            curves (list of str): Falloff curves used by the softSelectTool.
+            analyticSoftSelect (bool): Compute the Soft Selection method and the rocks with arrays instead of the
+                                       softSelectTool.
+            noise_seed (int): Seed used for generating noise
+            seed (float): Seed used by value noise on every deformation. None to use a random one each time
+            noiseType (str): One of NOISE_TYPES, used by the Noise method.
+            noiseOctaves (int): Amount of octaves added together by the noise.
+            noiseLacunarity (float): Frequency multiplier between an octave and the next one.
+            noisePersistence (float): Weight multiplier between an octave and the next one.
+            noiseScale (float): Frequency of the first octave, in lattice cells per terrain.
+            noiseInterpolation (str): One of INTERPOLATIONS, used by Value, Perlin and Sine noise.
+            erosionMode (str): One of EROSION_MODES, applied to the heights before they are written.
+            erosionIterations (int): Amount of iterations of the erosion.
+            erosionTalus (float): Slope over which thermal erosion moves material down.
+            heightCache (HeightfieldCache): Heightfields computed before, addressed by their parameters.
+            randomGenerator (random.Random): Source of every random value, seeding it reproduces a generation.
+            heightmapPath (str): Heightmap file used by the Heightmap method.
+            appliedDeformation (dict): Parameters of the deformation written in place, used to update it when only
+                                       its height or its seed changes. None if the terrain wasn't deformed in place
+            rocksName (str): The name used for the creating rocks and their group
+            rocksAmount (int): The number of rocks that are going to be generated.
+            sphereStartRadius (float): The starting point for generating rocks.
+            rockPrototypes (int): Amount of different rock meshes, every rock is an instance of one of them.
+                                  Zero creates a mesh for each rock
+            rockScatter (str): "Random" for independent positions, "Poisson Disk" to keep rocks apart.
+            rockSpacing (float): Multiplier of the distance kept between rocks by Poisson Disk.
+            rockDensityMask (str): Part of the terrain that gets more rocks with Poisson Disk, one of DENSITY_MASKS.
+            rockColorMode (str): One of ROCK_COLOR_MODES. "Per Rock" creates a color node for each rock, "Palette"
+                                 shares rockPaletteSize color nodes and "Vertex Color" paints the meshes.
+            rockPaletteSize (int): Max amount of color nodes created by the "Palette" color mode.
+            backend (SceneBackend): Object used to read and write the scene.
+            materials (MaterialRegistry): Materials created for the terrains and rocks, reused when possible.
+            profiler (Profiler): Time, scene commands and array sizes of every stage of the generation.
+    """
+
+    def __init__(self, backend=None):
+        """
+        The constructor of TerrainGenerator class
+            Parameters:
+                backend (SceneBackend): Object used to read and write the scene. Default uses maya.cmds
+        """
+        # Scene backend used for every scene operation
+        self.backend = backend if backend is not None else MayaBackend()
+
+        # Measures every stage and counts the commands sent to the backend
+        self.profiler = Profiler()
+        self.profiler.instrument(self.backend)
+
+        # Shading networks shared by every generation
+        self.materials = MaterialRegistry(self.backend)
+
+        # Terrain attributes
+        self.gridObject = ""
+        self.gridDimensions = 10
+        self.gridSubdivisions = 10
+        self.gridTiles = []
+        self.workers = 1
+
+        # Levels of detail of the terrain
+        self.lodLevels = 0
+        self.lodDistance = 1.0
+        self.terrainLods = {}
+        self.terrainRoot = ""
+
+        # Maximum modification values, these were obtained by trial with a 100x100 grid.
+        self.maxHeight = 7.5
+        self.maxPoints = 100
+
+        # Attributes for Soft Selection
+        self.softSelectRadius = 20.0
+        self.curves = ["1,0,2,0,1,2", "1,0.5,2,0,1,2,1,0,2", "1,0.05,3,0,1,3,0.5,0.4,3"]
+        self.analyticSoftSelect = True
+
+        # Random values of the soft selection moves, the noise seeds and the rocks, kept apart from the random module
+        self.randomGenerator = random.Random()
+
+        # Attributes for value noise
+        self.noise_seed = 6000
+        self.seed = None
+        self.noiseType = "Sine"
+        self.noiseOctaves = 4
+        self.noiseLacunarity = 2.0
+        self.noisePersistence = 0.5
+        self.noiseScale = 4.0
+        self.noiseInterpolation = "Smoothstep"
+
+        # Attributes for erosion
+        self.erosionMode = "None"
+        self.erosionIterations = 50
+        self.erosionTalus = 0.8
+
+        # Computed heightfields, so going back to a previous variant doesn't compute them again
+        self.heightCache = HeightfieldCache()
+
+        # Attributes for heightmap import
+        self.heightmapPath = ""
+
+        # Deformation written in place by redeform_terrain
+        self.appliedDeformation = None
+
+        # Attributes for rock creation
+        self.rocksName = ""
+        self.rocksAmount = 1
+        self.sphereStartRadius = .8
+        self.rockPrototypes = 0
+        self.rockScatter = "Random"
+        self.rockSpacing = 1.0
+        self.rockDensityMask = "None"
+        self.rockColorMode = "Per Rock"
+        self.rockPaletteSize = 16
+
+    @stage("Grid Creation")
+    @batched
+    def create_terrain(self, grid_name, dimensions, subdivisions, tiles=(1, 1)):
+        """
+        This function creates the grid with parameters given.
+            Parameters:
+                grid_name (str): The name that the terrain is going to have.
+                dimensions (int): Dimensions for width and height.
+                subdivisions (int): Amount of subdivisions for the grid.
+                tiles (tuple of int): Rows and columns of tiles. Default creates a single grid
+        """
+        self.gridTiles = []
+        self.terrainLods = {}
+
+        # Save those values so they can be accessed by other functions
+        self.gridDimensions = dimensions
+        self.gridSubdivisions = subdivisions
+        self.appliedDeformation = None
+
+        if tiles[0] * tiles[1] > 1:
+            # Create a group with a polyPlane of the given size for each tile
+            self.gridObject = self.backend.create_group(grid_name)
+
+            for tile_row in range(tiles[0]):
+                self.gridTiles.append([])
+                for tile_column in range(tiles[1]):
+                    tile_name = "{}_{}_{}".format(grid_name, tile_row, tile_column)
+                    translation = tile_origin(tile_row, tile_column, tiles[0], tiles[1], dimensions)
+                    tile = self.backend.create_plane(tile_name, dimensions, subdivisions)
+                    self.backend.move(tile, translation)
+
+                    if self.lod_subdivisions():
+                        # Each tile switches its level on its own, by its distance to the camera
+                        lod_group = self.create_lods(tile, tile_name, translation)
+                        self.gridTiles[-1].append(tile)
+                        self.backend.parent(lod_group, self.gridObject)
+                    else:
+                        self.gridTiles[-1].append(self.backend.parent(tile, self.gridObject))
+        else:
+            # Create polyPlane with given parameters
+            self.gridObject = self.backend.create_plane(grid_name, dimensions, subdivisions)
+
+            if self.lod_subdivisions():
+                self.terrainRoot = self.create_lods(self.gridObject, grid_name, (0, 0, 0))
+                return
+
+        self.terrainRoot = self.gridObject
+
+    def lod_subdivisions(self):
+        """
+        This function returns the subdivisions of each reduced level of detail of the terrain.
+        Levels stop when they would have less than one subdivision.
+            Returns:
+                subdivisions (list of int): Subdivisions of each level after the full resolution, from high to low.
+        """
+        subdivisions = []
+        for level in range(1, self.lodLevels + 1):
+            if self.gridSubdivisions >> level < 1:
+                break
+            subdivisions.append(self.gridSubdivisions >> level)
+
+        return subdivisions
+
+    def create_lods(self, mesh, name, translation):
+        """
+        This function creates the reduced meshes of a mesh of the terrain, grouped with it in a level of detail group.
+        Their heights are written by update_lods after every deformation.
+            Parameters:
+                mesh (str): Mesh of the terrain at full resolution.
+                name (str): Name of the mesh, used for the group and the reduced meshes.
+                translation (tuple of float): Position of the mesh.
+            Returns:
+                lod_group (str): The level of detail group.
+        """
+        subdivisions = self.lod_subdivisions()
+        thresholds = [self.gridDimensions * self.lodDistance * 2 ** level for level in range(len(subdivisions))]
+        lod_group = self.backend.create_lod_group(name + "_LOD", thresholds)
+
+        # The full resolution is the first child, so it is shown when the camera is close
+        self.backend.parent(mesh, lod_group)
+
+        self.terrainLods[mesh] = []
+        for level, level_subdivisions in enumerate(subdivisions, 1):
+            lod = self.backend.create_plane("{}_LOD{}".format(name, level), self.gridDimensions, level_subdivisions)
+            self.backend.move(lod, translation)
+            self.terrainLods[mesh].append(self.backend.parent(lod, lod_group))
+
+        return lod_group
+
+    def update_lods(self):
+        """
+        This function writes the heights of the reduced meshes, reduced from the heights of the full resolution.
+        """
+        if not self.terrainLods or not self.backend.exists(self.gridObject):
+            return
+
+        vertices = self.gridSubdivisions + 1
+        subdivisions = self.lod_subdivisions()
+
+        with self.profiler.span("LOD"):
+            for mesh, lods in self.terrainLods.items():
+                heightfield = self.backend.get_points(mesh)[:, 1].reshape(vertices, vertices)
+
+                for lod, lod_heightfield in zip(lods, heightfield_pyramid(heightfield, subdivisions)):
+                    points = self.backend.get_points(lod)
+                    points[:, 1] = lod_heightfield.ravel()
+                    self.backend.set_points(lod, points)
+
+    def delete_terrain(self):
+        """
+        This function deletes the terrain with its levels of detail, nothing is done if it doesn't exist.
+        """
+        if self.backend.exists(self.terrainRoot):
+            self.backend.delete(self.terrainRoot)
+
+        self.gridObject = ""
+        self.terrainRoot = ""
+        self.gridTiles = []
+        self.terrainLods = {}
+        self.appliedDeformation = None
+
+    def terrain_nodes(self):
+        """
+        This function lists the nodes that receive the material of the terrain.
+            Returns:
+                nodes (list of str): The terrain and the reduced meshes of every level of detail.
+        """
+        return [self.gridObject] + [lod for lods in self.terrainLods.values() for lod in lods]
+
+    @stage("Deformation")
+    @batched
+    def deform_terrain(self, deformation_method):
+        """
+        This function deforms the terrain previously created.
+            Parameters:
+                deformation_method (int): The desired method to deform the grid.
+        """
+        # Select deformation based on the value entered
+        if self.gridTiles:
+            self.deform_tiles(deformation_method)
+        elif deformation_method == 0:
+            self.soft_random()
+        elif deformation_method == 1:
+            self.value_noise()
+        elif deformation_method == 2:
+            self.heightmap_deform()
+
+        self.update_lods()
+
+    @batched
+    def modify_terrain(self, deformation_method):
+        """
+        This function replaces the deformation of the terrain with a new one.
+        The grid is kept, so its material and history are not lost and the mesh is not created again.
+            Parameters:
+                deformation_method (int): The desired method to deform the grid.
+        """
+        self.redeform_terrain(deformation_method)
+
+    def deform_tiles(self, deformation_method):
+        """
+        This function deforms every tile of a tiled terrain.
+        Each heightfield is computed, written and released before the next one, so memory depends on the tile size.
+        With more than one worker the heightfields are computed by a pool of processes, only the writes happen here.
+            Parameters:
+                deformation_method (int): The desired method to deform the grid.
+        """
+        logger.debug("Starting deformation of {} tiles".format(len(self.gridTiles) * len(self.gridTiles[0])))
+
+        if not self.check_terrain() or (deformation_method == 2 and not self.check_heightmap()):
+            return
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        self.write_deformation(self.deformation_parameters(deformation_method))
+
+        if deformation_method == 0:
+            self.soften_terrain()
+
+    @stage("Deformation")
+    @batched
+    def redeform_terrain(self, deformation_method):
+        """
+        This function deforms the terrain again without deleting it, the new heights replace the previous ones.
+        The mesh, its history and its material are kept. Soft Selection is always computed analytically.
+            Parameters:
+                deformation_method (int): The desired method to deform the grid.
+        """
+        if not self.check_terrain() or (deformation_method == 2 and not self.check_heightmap()):
+            return
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        self.appliedDeformation = self.deformation_parameters(deformation_method)
+        self.write_heights()
+
+        if deformation_method == 0:
+            self.soften_terrain()
+
+    @stage("Rescale")
+    @batched
+    def rescale_terrain(self, max_height):
+        """
+        This function changes the height of the deformation written in place.
+        Only the cached heightfields are scaled again, nothing is computed.
+            Parameters:
+                max_height (float): Max amount of movement in Y axis possible for a vertex.
+        """
+        self.maxHeight = max_height
+
+        if self.appliedDeformation is not None and self.check_terrain():
+            self.write_heights()
+
+    @stage("Reseed")
+    @batched
+    def reseed_terrain(self, seed):
+        """
+        This function changes the seed of the Value Noise written in place, only the noise is computed again.
+            Parameters:
+                seed (float): Seed used by value noise. None to use a random one
+        """
+        self.seed = seed
+
+        if self.appliedDeformation is None or self.appliedDeformation["method"] != 1 or not self.check_terrain():
+            return
+
+        self.noise_seed = self.choose_noise_seed()
+        self.appliedDeformation["seed"] = self.noise_seed
+        self.appliedDeformation["cached"] = self.cacheable(1)
+        self.write_heights()
+
+    def soften_terrain(self):
+        """
+        This function softens the edges of every mesh of the terrain, like the soft selection method does.
+        """
+        for tiles in self.gridTiles or [[self.gridObject]]:
+            for tile in tiles:
+                self.backend.soften_edges(tile)
+
+    def write_heights(self):
+        """
+        This function overwrites the height of every vertex with the deformation written in place.
+        """
+        self.write_deformation(self.appliedDeformation, replace=True)
+        self.update_lods()
+
+    def write_deformation(self, parameters, replace=False):
+        """
+        This function moves every vertex of the terrain on Y with a deformation.
+        Without erosion each mesh is written as soon as its heightfield is computed. Erosion needs the whole
+        terrain, so the heights of every mesh are kept and eroded together before any of them is written.
+            Parameters:
+                parameters (dict): Values returned by deformation_parameters.
+                replace (bool): Overwrite the heights instead of adding the deformation to them. Default adds it
+        """
+        pending = []
+
+        for mesh, heightfield in self.iter_deformation(parameters):
+            with self.profiler.span("Write Back"):
+                points = self.backend.get_points(mesh)
+                self.profiler.track_array("points", points)
+                if replace:
+                    points[:, 1] = heightfield.ravel()
+                else:
+                    points[:, 1] += heightfield.ravel()
+
+                if self.erosionMode == "None":
+                    self.backend.set_points(mesh, points)
+                else:
+                    pending.append((mesh, points))
+
+        if not pending:
+            return
+
+        # Place every mesh in the heightfield of the whole terrain
+        tiles = self.gridTiles or [[self.gridObject]]
+        windows = dict((tiles[tile_row][tile_column], window) for (tile_row, tile_column), window in
+                       self.tile_windows().items())
+
+        vertices = self.gridSubdivisions + 1
+        heightfield = np.zeros(self.heightfield_shape())
+        for mesh, points in pending:
+            heightfield[windows[mesh]] = points[:, 1].reshape(vertices, vertices)
+
+        heightfield = self.erode_heights(heightfield)
+
+        with self.profiler.span("Write Back"):
+            for mesh, points in pending:
+                points[:, 1] = heightfield[windows[mesh]].ravel()
+                self.backend.set_points(mesh, points)
+
+    def tile_windows(self):
+        """
+        This function returns the part of the heightfield of the whole terrain covered by each tile.
+        Tiles share their borders, so neighbour windows overlap on a row or a column.
+            Returns:
+                windows (dict of {tuple:tuple}): Row and column slices by tile row and column.
+        """
+        tile_rows, tile_columns = (len(self.gridTiles), len(self.gridTiles[0])) if self.gridTiles else (1, 1)
+
+        return heightfield_windows(tile_rows, tile_columns, self.gridSubdivisions)
+
+    @stage("Deformation")
+    @batched
+    def apply_heights(self, heightfield, parameters, replace=False):
+        """
+        This function writes the heights computed by compute_heights on the terrain.
+            Parameters:
+                heightfield (numpy.ndarray): Height of every vertex of the whole terrain.
+                parameters (dict): Values used to compute the heights.
+                replace (bool): The heights replaced the deformation, so it can be rescaled later. Default to False
+        """
+        if not self.check_terrain():
+            return
+
+        if heightfield.shape != self.heightfield_shape():
+            logger.error("The terrain changed while its heights were computed. Please deform it again.")
+            return
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        tiles = self.gridTiles or [[self.gridObject]]
+        with self.profiler.span("Write Back"):
+            for (tile_row, tile_column), window in self.tile_windows().items():
+                mesh = tiles[tile_row][tile_column]
+                points = self.backend.get_points(mesh)
+                points[:, 1] = heightfield[window].ravel()
+                self.backend.set_points(mesh, points)
+
+                if parameters["method"] == 0:
+                    self.backend.soften_edges(mesh)
+
+        if replace:
+            self.appliedDeformation = parameters
+
+        self.update_lods()
+
+    def erode_points(self, points):
+        """
+        This function erodes the vertices of a single grid before they are written, nothing changes without erosion.
+            Parameters:
+                points (numpy.ndarray): Position of every vertex of the grid, it is modified in place.
+        """
+        if self.erosionMode == "None":
+            return
+
+        vertices = self.gridSubdivisions + 1
+        points[:, 1] = self.erode_heights(points[:, 1].reshape(vertices, vertices)).ravel()
+
+    def erode_heights(self, heightfield):
+        """
+        This function erodes the heightfield of the whole terrain with the erosion attributes.
+        Big heightfields are eroded by tiles on one thread for each worker.
+            Parameters:
+                heightfield (numpy.ndarray): Height of every vertex of the terrain.
+            Returns:
+                heightfield (numpy.ndarray): The eroded heights.
+        """
+        with self.profiler.span("Erosion"):
+            logger.debug("Eroding with {} erosion, {} iterations".format(self.erosionMode, self.erosionIterations))
+            heightfield = erode_heightfield(heightfield, self.gridDimensions / float(self.gridSubdivisions),
+                                            self.erosion_settings(), self.workers)
+            self.profiler.track_array("heightfield", heightfield)
+
+        return heightfield
+
+    def erosion_settings(self):
+        """
+        This function returns the settings used by the erosion.
+            Returns:
+                erosion (dict): Mode, iterations and talus slope, the other settings use DEFAULT_EROSION.
+        """
+        return {"mode": self.erosionMode, "iterations": self.erosionIterations, "talus": self.erosionTalus}
+
+    def deformation_parameters(self, deformation_method):
+        """
+        This function chooses the random values of a deformation, so it can be computed again later.
+            Parameters:
+                deformation_method (int): The desired method to deform the grid.
+            Returns:
+                parameters (dict): Method, noise seed and settings, soft selection moves, heightmap file, the
+                                   max height used to create the moves and if the heightfields are cached.
+        """
+        tile_rows, tile_columns = (len(self.gridTiles), len(self.gridTiles[0])) if self.gridTiles else (1, 1)
+        parameters = {"method": deformation_method, "seed": self.noise_seed, "noise": self.noise_settings(),
+                      "bumps": [], "heightmap": self.heightmapPath, "maxHeight": self.maxHeight,
+                      "cached": self.cacheable(deformation_method)}
+
+        if deformation_method == 0:
+            # Random moves distributed across the whole terrain, applied analytically on each tile
+            parameters["bumps"] = self.soft_random_layout(tile_rows, tile_columns)
+        elif deformation_method == 1:
+            self.noise_seed = self.choose_noise_seed()
+            parameters["seed"] = self.noise_seed
+
+        return parameters
+
+    def heights_settings(self, parameters):
+        """
+        This function copies every value that compute_heights reads, so the heights can be computed on a worker
+        thread while the attributes change. It is called on the main thread before the job starts.
+            Parameters:
+                parameters (dict): Values returned by deformation_parameters.
+            Returns:
+                settings (MappingProxyType): Read only copy of the parameters, the tiles and size of the terrain, the
+                                             height limit, the erosion settings, the workers and the cache.
+        """
+        tile_rows, tile_columns = (len(self.gridTiles), len(self.gridTiles[0])) if self.gridTiles else (1, 1)
+
+        return MappingProxyType({"parameters": MappingProxyType(copy.deepcopy(parameters)),
+                                 "tiles": (tile_rows, tile_columns), "subdivisions": self.gridSubdivisions,
+                                 "dimensions": self.gridDimensions, "heightLimit": self.height_limit(parameters),
+                                 "erosion": MappingProxyType(self.erosion_settings()), "workers": self.workers,
+                                 "cache": self.heightCache if parameters["cached"] else None})
+
+    def terrain_settings(self, deformation_method, dimensions, subdivisions, tiles=(1, 1)):
+        """
+        This function chooses the deformation of a terrain that is not created yet and copies the values that
+        compute_heights reads, so the terrain can be created later together with its heights.
+            Parameters:
+                deformation_method (int): The desired method to deform the grid.
+                dimensions (int): Dimensions for width and height of the terrain.
+                subdivisions (int): Amount of subdivisions of each grid.
+                tiles (tuple of int): Rows and columns of tiles. Default to a single grid
+            Returns:
+                parameters (dict): Values returned by deformation_parameters.
+                settings (MappingProxyType): Values returned by heights_settings.
+        """
+        grid = self.gridDimensions, self.gridSubdivisions, self.gridTiles
+
+        # Only the size and the amount of tiles are read, the names of the tiles don't exist yet
+        self.gridDimensions = dimensions
+        self.gridSubdivisions = subdivisions
+        self.gridTiles = [[""] * tiles[1] for _ in range(tiles[0])] if tiles[0] * tiles[1] > 1 else []
+        try:
+            parameters = self.deformation_parameters(deformation_method)
+            return parameters, self.heights_settings(parameters)
+        finally:
+            self.gridDimensions, self.gridSubdivisions, self.gridTiles = grid
+
+    def height_limit(self, parameters):
+        """
+        This function returns the height that multiplies the heightfields of a deformation.
+            Parameters:
+                parameters (dict): Values returned by deformation_parameters.
+            Returns:
+                height_limit (float): Max displacement in Y of the deformation.
+        """
+        if parameters["method"] == 0:
+            # Moves were created with the max height of that moment
+            return self.maxHeight / parameters["maxHeight"] if parameters["maxHeight"] else 0.0
+
+        if parameters["method"] == 2:
+            # The heightmap is resampled once over the whole terrain, each tile reads its own window
+            return self.heightmap_height_limit(parameters["heightmap"])
+
+        # Same max Y value as value_noise
+        return self.maxHeight * self.gridDimensions / 100.0 * 3.0
+
+    def cacheable(self, deformation_method):
+        """
+        This function checks if the heightfields of a deformation can be asked for again, only those are cached.
+        Without a seed the soft selection moves and the noise are random, so their heightfields are never reused.
+            Parameters:
+                deformation_method (int): The method used to deform the grid.
+            Returns:
+                cacheable (bool): True for heightmaps and for the deformations with a seed.
+        """
+        return deformation_method == 2 or self.seed is not None
+
+    def iter_deformation(self, parameters):
+        """
+        This function computes the heightfield of every mesh of the terrain, a single grid is the tile 0, 0.
+        Heightfields are taken from the cache when possible and scaled with the current max height.
+            Parameters:
+                parameters (dict): Values returned by deformation_parameters.
+            Yields:
+                deformation (tuple of (str, numpy.ndarray)): Mesh and displacement in Y of each of its vertices.
+        """
+        tiles = self.gridTiles if self.gridTiles else [[self.gridObject]]
+        tile_heightfields = self.tile_heightfields(parameters)
+
+        while True:
+            # Only computing the heightfield is measured, not the code that uses it
+            with self.profiler.span("Heightfield"):
+                tile = next(tile_heightfields, None)
+                if tile is not None:
+                    self.profiler.track_array("heightfield", tile[2])
+
+            if tile is None:
+                return
+
+            yield tiles[tile[0]][tile[1]], tile[2]
+
+    def tile_heightfields(self, parameters):
+        """
+        This function returns an iterator over the heightfields of every tile, it doesn't use the scene.
+            Parameters:
+                parameters (dict): Values returned by deformation_parameters.
+            Returns:
+                tile_heightfields (iterator): Row, column and displacement in Y of each tile, in any order.
+        """
+        return settings_tile_heightfields(self.heights_settings(parameters))
+
+    def soft_random(self):
+        """
+        This function modifies the grid by using Soft Selection
+        """
+        logger.debug("Starting deformation with soft selection")
+
+        if not self.check_terrain():
+            return
+
+        # Random moves with the same distribution for both modes
+        bumps = self.soft_random_layout()
+
+        if self.analyticSoftSelect:
+            # Add every falloff in a single pass and write the vertices once
+            with self.profiler.span("Heightfield"):
+                heightfield = self.heightCache.get_or_compute(
+                    tile_parameters(0, 0, 0, self.gridSubdivisions, self.gridDimensions, bumps=bumps),
+                    lambda: soft_selection_field(self.gridSubdivisions, self.gridDimensions, bumps),
+                    self.cacheable(0))
+                self.profiler.track_array("heightfield", heightfield)
+
+            with self.profiler.span("Write Back"):
+                points = self.backend.get_points(self.gridObject)
+                self.profiler.track_array("points", points)
+                points[:, 1] += heightfield.ravel()
+                self.erode_points(points)
+                self.backend.set_points(self.gridObject, points)
+        else:
+            for row, column, random_y, radius, curve in bumps:
+                # Apply movement with soft selection enabled
+                self.backend.soft_move_vertex(self.gridObject, row * (self.gridSubdivisions + 1) + column,
+                                              (0, random_y, 0), radius, curve)
+
+            # Disable softSelection to avoid errors in other functions
+            self.backend.disable_soft_select()
+
+            # The softSelectTool moves the vertices in the scene, so they are read again to erode them
+            if self.erosionMode != "None":
+                points = self.backend.get_points(self.gridObject)
+                self.erode_points(points)
+                self.backend.set_points(self.gridObject, points)
+
+        # Soften edges
+        self.backend.soften_edges(self.gridObject)
+
+    def soft_random_layout(self, tile_rows=1, tile_columns=1):
+        """
+        This function chooses the vertices moved by the Soft Selection method and how they are moved.
+            Parameters:
+                tile_rows (int): Amount of rows of tiles that share the layout. Default to 1
+                tile_columns (int): Amount of columns of tiles that share the layout. Default to 1
+            Returns:
+                bumps (list of (int, int, float, float, str)): Row, column, movement in Y, falloff radius and
+                                                              falloff curve of every move.
+        """
+        # Multipliers to scale deformation according to the selected size.
+        radius_multiplier = self.gridDimensions/100.0
+        height_multiplier = self.gridDimensions/100.0
+        points_multiplier = self.gridSubdivisions/100.0
+
+        # Scale the limit of the height to modify it after randomizing
+        height_limit = self.maxHeight*height_multiplier/2.0
+
+        # Index of every vertex on the object, tiles share their borders
+        columns = tile_columns * self.gridSubdivisions + 1
+        vertices = list(range((tile_rows * self.gridSubdivisions + 1) * columns))
+
+        # Number of vertices that are going to be modified.
+        # We add 2 to at least modify 2 vertices
+        vertices_to_edit = int(self.maxPoints * points_multiplier * tile_rows * tile_columns + 2)
+
+        logger.debug("About to edit: {} vertices".format(vertices_to_edit))
+
+        # Number of sections to divide the terrain
+        # These sections are used to better distribute the deformed vertices
+        # If there are not enough vertices, use all of them individually
+        section_amount = 8 if vertices_to_edit >= 8 else vertices_to_edit
+
+        # The size that each section should have
+        section_size = len(vertices)//section_amount
+
+        # Create a list from index i until the section is full
+        # Do that from index 0 in vertices to the end of the list,
+        # skipping the number of elements of the section
+        vertex_sections = [vertices[i:i + section_size]
+                           for i in range(0, len(vertices), section_size)]
+
+        # Fill a list with numbers from 0 to the number of sections in that the grid is divided
+        grid_indexes = [i for i in range(0, section_amount)]
+
+        # Shuffle that so the grids are chosen in a random order
+        self.randomGenerator.shuffle(grid_indexes)
+
+        bumps = []
+
+        # Loop with through a set number of vertices
+        for v in range(vertices_to_edit):
+            # Soft selection falloff used to move smoothly
+            curve = self.randomGenerator.choice(self.curves)
+
+            # Select a random vertex on the grid
+            grid_index = v % section_amount
+
+            vertex = self.randomGenerator.choice(vertex_sections[grid_indexes[grid_index]])
+
+            # Randomize movement on that vertex
+            random_y = self.randomGenerator.uniform(-height_limit, height_limit)
+
+            # Add variation so the range doesn't start in 0
+            random_y = random_y + height_limit if random_y >= 0 else random_y - height_limit
+
+            row, column = divmod(vertex, columns)
+            bumps.append((row, column, random_y, self.softSelectRadius*radius_multiplier, curve))
+
+        return bumps
+
+    def value_noise(self):
+        """
+        This function modifies the grid with fractal noise, its type and octaves are set by the noise attributes
+        """
+        logger.debug("Starting deformation with {} noise".format(self.noiseType))
+
+        if not self.check_terrain():
+            return
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        self.noise_seed = self.choose_noise_seed()
+
+        logger.debug("Random seed is: {}".format(self.noise_seed))
+
+        # Multiplier to scale deformation according to the selected size.
+        height_multiplier = self.gridDimensions / 100.0
+
+        # Set the max Y value for the points.
+        # Multiply by 3 because this generates smaller values than soft selection
+        height_limit = self.maxHeight * height_multiplier * 3.0
+
+        # Evaluate the noise for every vertex at once, index [x, y] is the vertex x * (subdivisions+1) + y
+        noise = self.noise_settings()
+        with self.profiler.span("Heightfield"):
+            heightfield = self.heightCache.get_or_compute(
+                tile_parameters(1, 0, 0, self.gridSubdivisions, self.gridDimensions, self.noise_seed, noise=noise),
+                lambda: noise_field(self.gridSubdivisions, self.noise_seed, noise), self.cacheable(1))
+            self.profiler.track_array("heightfield", heightfield)
+
+        # Move every vertex on Y with the noise value and write them back in a single operation
+        with self.profiler.span("Write Back"):
+            points = self.backend.get_points(self.gridObject)
+            self.profiler.track_array("points", points)
+            points[:, 1] += heightfield.ravel() * height_limit
+            self.erode_points(points)
+            self.backend.set_points(self.gridObject, points)
+
+    def choose_noise_seed(self):
+        """
+        This function chooses the seed of the next noise deformation.
+        Without a seed set a whole number is drawn from randomGenerator, so seeding it reproduces the terrain,
+        the seed logged can be typed in the UI and the heightfield is found in the cache again.
+            Returns:
+                seed (float): The seed attribute, or a random whole number up to MAX_NOISE_SEED.
+        """
+        return self.randomGenerator.randint(1, MAX_NOISE_SEED) if self.seed is None else self.seed
+
+    def noise_settings(self):
+        """
+        This function returns the settings used by the Noise method.
+            Returns:
+                noise (dict): Type, octaves, lacunarity, persistence, scale and interpolation of the noise.
+        """
+        return {"type": self.noiseType, "octaves": self.noiseOctaves, "lacunarity": self.noiseLacunarity,
+                "persistence": self.noisePersistence, "scale": self.noiseScale,
+                "interpolation": self.noiseInterpolation}
+
+    def heightmap_deform(self):
+        """
+        This function modifies the grid with the heights of a heightmap file
+        """
+        logger.debug("Starting deformation with heightmap {}".format(self.heightmapPath))
+
+        if not self.check_terrain() or not self.check_heightmap():
+            return
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        height_limit = self.heightmap_height_limit(self.heightmapPath)
+
+        # Only the rows needed by the grid are read from the file
+        with self.profiler.span("Heightfield"):
+            heightfield = self.heightCache.get_or_compute(
+                tile_parameters(2, 0, 0, self.gridSubdivisions, self.gridDimensions, heightmap=self.heightmapPath),
+                lambda: import_heightmap(self.heightmapPath, self.gridSubdivisions + 1, self.gridSubdivisions + 1))
+            self.profiler.track_array("heightfield", heightfield)
+
+        # Move every vertex on Y with the heightmap value and write them back in a single operation
+        with self.profiler.span("Write Back"):
+            points = self.backend.get_points(self.gridObject)
+            self.profiler.track_array("points", points)
+            points[:, 1] += heightfield.ravel() * height_limit
+            self.erode_points(points)
+            self.backend.set_points(self.gridObject, points)
+
+    def heightmap_height_limit(self, heightmap_path):
+        """
+        This function returns the height given to the white of a heightmap.
+        16-bit files use the same max height as value noise, NumPy files already have the heights.
+            Parameters:
+                heightmap_path (str): Path of the heightmap.
+            Returns:
+                height_limit (float): Multiplier for the values of the heightmap.
+        """
+        if heightmap_format(heightmap_path) == "npy":
+            return 1.0
+
+        return self.maxHeight * self.gridDimensions / 100.0 * 3.0
+
+    @stage("Rock Creation")
+    @batched
+    def create_rocks(self, rocks_name, rocks_amount, mat_name, color, normal, hue, brightness_range, saturation_range,
+                     layout=None):
+        """
+        This function creates certain amount of rocks with a set name
+            Parameters:
+                rocks_name: The name that rocks will have
+                rocks_amount: The amount of rocks that are going to be generated
+                mat_name: The name for Rocks' Blinn
+                color: Color map used by the Blinn
+                normal: Normal map used
+                hue: The hue selected for the rocks to use in the ambient color
+                brightness_range: range given by the user to set the ambient color
+                layout: Values returned by rock_layout, the amount of rocks is taken from it. Default computes it
+
+        """
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        # Assign a group name based on the name selected
+        rocks_group = rocks_name + "_grp"
+
+        sphere_radius = self.rock_radius()
+
+        # The terrain is read before the random values, they depend on its size and its slopes
+        with self.profiler.span("Terrain Sampling"):
+            heightfield, width, depth = self.terrain_heightfield()
+            self.profiler.track_array("terrain heightfield", heightfield)
+
+        if layout is None:
+            with self.profiler.span("Scatter"):
+                layout = rock_layout(self.rock_settings(), rocks_amount, sphere_radius, heightfield, width, depth,
+                                     hue, brightness_range, saturation_range)
+
+        # Assign material
+        # The ambient color of the material is connected to these rocks, so it can't be shared
+        with self.profiler.span("Material"):
+            material = self.materials.material(mat_name, color, normal, shared=False)
+
+            # Vertex colors are kept in the meshes, the other modes choose the color of each rock with a switch
+            vertex_colors = layout["colorMode"] == "Vertex Color"
+            if not vertex_colors:
+                switch_node = self.backend.create_shading_node("tripleShadingSwitch", "utility")
+                self.backend.connect_attr("%s.output" % switch_node, "%s.ambientColor" % material)
+                self.materials.attach(material, [switch_node])
+
+        # Color nodes shared by the rocks, by their color
+        palette = {}
+
+        # Library of deformed rocks that are instanced instead of creating a mesh for each rock
+        prototypes = []
+        for _ in range(len(layout["prototypeColors"])):
+            prototypes.append(self.create_rock_mesh(rocks_name + "_prototype", sphere_radius))
+
+        if prototypes and vertex_colors:
+            # Instances share the vertices, so each prototype gets a color
+            for prototype, prototype_color in zip(prototypes, layout["prototypeColors"]):
+                self.backend.set_vertex_colors(prototype, prototype_color)
+
+        # Amount of instances of each prototype, the hidden prototype is the instance 0 of its shape
+        instance_numbers = [0] * len(prototypes)
+        instanced_rocks = []
+
+        # Rocks that are placed on the terrain all at once
+        rocks = []
+
+        # Rock creation
+        for i, (prototype_index, scale, rock_color) in enumerate(zip(layout["prototypes"], layout["scales"],
+                                                                     layout["colors"])):
+            if prototypes:
+                # Instance a random prototype, it shares the geometry so it doesn't need to be deformed
+                new_sphere = self.backend.instance(prototypes[prototype_index], rocks_name)
+                instance_numbers[prototype_index] += 1
+                instance_number = instance_numbers[prototype_index]
+            else:
+                # Create and deform a sphere for this rock
+                new_sphere = self.create_rock_mesh(rocks_name, sphere_radius)
+                instance_number = 0
+
+            # Scale using the random variations
+            self.backend.scale(new_sphere, scale)
+
+            # Freeze transformations, instances keep them so they can share the geometry
+            if not prototypes:
+                self.backend.freeze_transforms(new_sphere)
+
+            # Every command that takes the name of the rock is sent before it is parented
+            rocks.append(new_sphere)
+
+            if vertex_colors:
+                # Paint the rock, instances were painted with their prototype
+                if not prototypes:
+                    self.backend.set_vertex_colors(new_sphere, rock_color)
+            else:
+                # Connect shape to switch Node, each instance of a shape has its own plug
+                sphere_shape = self.backend.list_shapes(new_sphere)[0]
+                self.backend.connect_attr("%s.instObjGroups[%i]" % (sphere_shape, instance_number),
+                                          "%s.input[%i].inShape" % (switch_node, i))
+
+                if layout["colorMode"] == "Palette":
+                    # Colors were rounded to the palette, reuse their nodes
+                    if rock_color not in palette:
+                        palette[rock_color] = self.create_color_node(rock_color)
+                        self.materials.attach(material, [palette[rock_color]])
+                    color_node = palette[rock_color]
+                else:
+                    color_node = self.create_color_node(rock_color)
+                    self.materials.attach(material, [color_node])
+
+                self.backend.connect_attr("%s.outColor" % color_node, "%s.input[%i].inTriple" % (switch_node, i))
+
+            # Assign material to rock, instances are assigned all at once
+            if prototypes:
+                instanced_rocks.append(new_sphere)
+            else:
+                self.backend.assign_material(new_sphere, material)
+
+        if instanced_rocks:
+            self.backend.assign_material(instanced_rocks, material)
+
+        if layout["crowded"]:
+            logger.warning("{} rocks didn't fit and overlap other rocks".format(layout["crowded"]))
+
+        # Move every rock to its position on the terrain
+        if rocks:
+            self.place_rocks(rocks, layout["positions"], -.95*sphere_radius, heightfield, width, depth)
+
+        if prototypes:
+            # Keep the prototypes hidden in their own group, only their instances are visible
+            prototypes_group = self.backend.create_group(rocks_name + "_prototypes_grp")
+            self.backend.parent(prototypes, prototypes_group)
+            self.backend.set_attr(prototypes_group + ".visibility", False)
+
+        if rocks:
+            # If the group doesn't exist, then create it
+            if not self.backend.exists(rocks_group):
+                self.backend.create_group(rocks_group)
+
+            # Parent every rock at once, their names are not used after this
+            self.backend.parent(rocks, rocks_group)
+
+        # The new rocks have their material, the networks left behind by deleted rocks are removed
+        self.materials.collect_garbage()
+
+    def rock_radius(self):
+        """
+        This function returns the radius of the rocks before they are scaled, it depends on the terrain size.
+            Returns:
+                radius (float): Radius of the sphere of each rock.
+        """
+        # Get a percentage of the size compared to original rock
+        size_multiplier = self.gridDimensions/100.0
+
+        return self.sphereStartRadius*size_multiplier
+
+    def rock_settings(self):
+        """
+        This function copies the rock attributes read by rock_layout, so the layout can be chosen on a worker
+        thread while they change. It is called on the main thread before the job starts.
+            Returns:
+                settings (MappingProxyType): Read only prototypes, scatter, spacing, density mask, color mode and
+                                             palette size, with a random generator of its own seeded from
+                                             randomGenerator.
+        """
+        return MappingProxyType({"prototypes": self.rockPrototypes, "scatter": self.rockScatter,
+                                 "spacing": self.rockSpacing, "densityMask": self.rockDensityMask,
+                                 "colorMode": self.rockColorMode, "paletteSize": self.rockPaletteSize,
+                                 "random": random.Random(self.randomGenerator.getrandbits(64))})
+
+    @stage("Material")
+    def create_color_node(self, color):
+        """
+        This function creates a node with a constant color.
+            Parameters:
+                color (tuple of float): Red, green and blue from 0 to 1.
+            Returns:
+                color_node (str): The name of the created node.
+        """
+        logger.debug("Rock is having {} color".format(color))
+
+        color_node = self.backend.create_shading_node("colorConstant", "utility")
+        self.backend.set_attr("%s.inColor" % color_node, color[0], color[1], color[2], type="double3")
+
+        return color_node
+
+    def terrain_heightfield(self):
+        """
+        This function reads the heightfield of the whole terrain, which is centered in the origin.
+            Returns:
+                heightfield (numpy.ndarray): Height of every vertex. None if there is no terrain
+                width (float): Size of the terrain in X.
+                depth (float): Size of the terrain in Z.
+        """
+        tile_rows, tile_columns = (len(self.gridTiles), len(self.gridTiles[0])) if self.gridTiles else (1, 1)
+        width, depth = tile_columns * self.gridDimensions, tile_rows * self.gridDimensions
+
+        if not self.backend.exists(self.gridObject):
+            return None, width, depth
+
+        return np.vstack(list(self.iter_heightfield_blocks())), width, depth
+
+    @stage("Snap")
+    def place_rocks(self, rocks, positions, pivot_height, heightfield, width, depth):
+        """
+        This function places rocks on the terrain and aims them along its normals.
+        Heights and normals are sampled from the heightfield of the terrain for every rock at once.
+            Parameters:
+                rocks (list of str): The rocks to place.
+                positions (numpy.ndarray): Array of shape (rocks, 2) with the position of each rock in X and Z.
+                pivot_height (float): Height of the pivot of the rocks, the pivot is placed on the surface.
+                heightfield (numpy.ndarray): Height of every vertex of the terrain. None if there is no terrain
+                width (float): Size of the terrain in X.
+                depth (float): Size of the terrain in Z.
+        """
+        translations = np.zeros((len(rocks), 3))
+        translations[:, 0] = positions[:, 0]
+        translations[:, 2] = positions[:, 1]
+        rotations = np.zeros((len(rocks), 3))
+
+        if heightfield is not None:
+            translations[:, 1] = sample_heightfield(heightfield, width, depth, positions[:, 0], positions[:, 1])
+            translations[:, 1] -= pivot_height
+            rotations = normal_rotations(sample_normals(heightfield, width, depth, positions[:, 0], positions[:, 1]))
+        else:
+            logger.warning("No terrain was previously created, or got deleted. Spawning rocks randomly...")
+
+        self.backend.place_transforms(rocks, translations, rotations)
+
+    def create_rock_mesh(self, rocks_name, sphere_radius):
+        """
+        This function creates a sphere and deforms it into a rock.
+            Parameters:
+                rocks_name (str): The name that the rock will have.
+                sphere_radius (float): The radius of the sphere.
+            Returns:
+                rock (str): The name of the created rock.
+        """
+        # Create sphere as base for rocks
+        new_sphere = self.backend.create_sphere(rocks_name, sphere_radius, 20)
+
+        # Deform newly created sphere
+        self.deform_rock(new_sphere, sphere_radius)
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        return new_sphere
+
+    @stage("Rock Deform")
+    def deform_rock(self, sphere, radius):
+        """
+        This function takes a sphere with its radius and deforms it.
+            Parameters:
+                sphere (str): The sphere that is going to be modified.
+                radius (float): The radius of the sphere.
+        """
+        logger.debug("Deforming a rock: {}".format(sphere))
+
+        # Random radius used for soft selection
+        soft_select_radius = self.randomGenerator.uniform(-.1, .1) * radius
+
+        # Smooth curve used for selection
+        rock_falloff = "1,0,2,0,1,2"
+
+        # Move random range far from 0
+        # If radius was greater than 0, add 1. Else substract 1
+        soft_select_radius = (soft_select_radius + 1 * radius) \
+            if soft_select_radius >= 0 \
+            else (soft_select_radius - 1 * radius)
+
+        if self.analyticSoftSelect:
+            # Compute the same moves on the vertices and write them in a single operation
+            self.backend.set_points(sphere, rock_points(self.backend.get_points(sphere), radius,
+                                                        soft_select_radius, rock_falloff))
+
+            # Move pivot down to base of the sphere
+            self.backend.move_pivots(sphere, (0, -.95*radius, 0))
+            return
+
+        # Amount of vertices on the object, the last two are the bottom and top of the sphere
+        vertex_count = self.backend.vertex_count(sphere)
+
+        # Select and scale base of sphere to create planar base
+        self.backend.soft_scale_vertex(sphere, vertex_count - 2, (1, .00005*radius, 1), (0, -1*radius, 0),
+                                       3*abs(soft_select_radius), rock_falloff)
+
+        # Select and move a vertex in the middle of the sphere with a smaller selection radius
+        self.backend.soft_move_vertex(sphere, vertex_count//2, (0.8*radius, 0, 0),
+                                      1.5*abs(soft_select_radius), rock_falloff, local=True)
+
+        # Select and move the top of the sphere
+        self.backend.soft_move_vertex(sphere, vertex_count - 1, (0.4*radius, 0, 0),
+                                      1.5*abs(soft_select_radius), rock_falloff, local=True)
+
+        # Disable softSelection to avoid errors in other functions
+        self.backend.disable_soft_select()
+
+        # Move pivot down to base of the sphere
+        self.backend.move_pivots(sphere, (0, -.95*radius, 0))
+
+    def heightfield_shape(self):
+        """
+        This function returns the size of the heightfield of the whole terrain, tiles share their borders.
+            Returns:
+                shape (tuple of int): Amount of rows and columns of vertices.
+        """
+        tile_rows, tile_columns = (len(self.gridTiles), len(self.gridTiles[0])) if self.gridTiles else (1, 1)
+
+        return tile_rows * self.gridSubdivisions + 1, tile_columns * self.gridSubdivisions + 1
+
+    def iter_heightfield_blocks(self):
+        """
+        This function reads the height of the terrain from the scene by blocks of rows.
+        A tiled terrain is read one row of tiles at a time.
+            Yields:
+                block (numpy.ndarray): Heights of consecutive rows of vertices of the whole terrain.
+        """
+        vertices = self.gridSubdivisions + 1
+
+        for tile_row, tiles in enumerate(self.gridTiles or [[self.gridObject]]):
+            heightfields = [self.backend.get_points(tile)[:, 1].reshape(vertices, vertices) for tile in tiles]
+
+            # Remove the column and row that are shared with the previous tiles
+            block = np.hstack([heightfields[0]] + [heightfield[:, 1:] for heightfield in heightfields[1:]])
+
+            yield block if tile_row == 0 else block[1:]
+
+    def export_heightmap(self, path, height_range=None):
+        """
+        This function writes the height of the terrain to a heightmap file.
+            Parameters:
+                path (str): Path of the heightmap, .r16, .raw, .png or .npy
+                height_range (tuple of float): Heights mapped to black and white in 16-bit formats.
+                                               Default uses the lowest and highest vertices
+        """
+        if not self.check_terrain():
+            return
+
+        if height_range is None:
+            # First pass to find the range without keeping the heights in memory
+            low, high = float("inf"), float("-inf")
+            for block in self.iter_heightfield_blocks():
+                low, high = min(low, block.min()), max(high, block.max())
+            height_range = (low, high)
+
+        export_heightmap(path, self.iter_heightfield_blocks(), self.heightfield_shape(), height_range)
+
+        logger.info("Heightmap exported to {} with heights from {} to {}".format(path, *height_range))
+
+    def check_terrain(self):
+        # Check if object exists, if it doesn't give warning to user
+        if not self.backend.exists(self.gridObject):
+            logger.error("No terrain was previously created, or got deleted. Please create one before deforming.")
+            return False
+
+        return True
+
+    def check_heightmap(self):
+        # Check if the heightmap file exists, if it doesn't give warning to user
+        if not os.path.isfile(self.heightmapPath):
+            logger.error("Heightmap file '{}' doesn't exist. Please choose one before deforming.".format(
+                self.heightmapPath))
+            return False
+
+        return True
+
+
+def heightfield_windows(tile_rows, tile_columns, subdivisions):
+    """
+    This function returns the part of the heightfield of a whole terrain covered by each tile.
+    Tiles share their borders, so neighbour windows overlap on a row or a column.
+        Parameters:
+            tile_rows (int): Amount of rows of tiles.
+            tile_columns (int): Amount of columns of tiles.
+            subdivisions (int): Subdivisions of each tile.
+        Returns:
+            windows (dict of {tuple:tuple}): Row and column slices by tile row and column.
+    """
+    return dict(((tile_row, tile_column),
+                 (slice(tile_row * subdivisions, (tile_row + 1) * subdivisions + 1),
+                  slice(tile_column * subdivisions, (tile_column + 1) * subdivisions + 1)))
+                for tile_row in range(tile_rows) for tile_column in range(tile_columns))
+
+
+def settings_tile_heightfields(settings):
+    """
+    This function returns an iterator over the heightfields of every tile, it doesn't use the scene.
+        Parameters:
+            settings (MappingProxyType): Values returned by TerrainGenerator.heights_settings.
+        Returns:
+            tile_heightfields (iterator): Row, column and displacement in Y of each tile, in any order.
+    """
+    parameters = settings["parameters"]
+    tile_rows, tile_columns = settings["tiles"]
+
+    return iter_tile_heightfields(parameters["method"], tile_rows, tile_columns, settings["subdivisions"],
+                                  settings["dimensions"], parameters["seed"], settings["heightLimit"],
+                                  parameters["bumps"], settings["workers"], settings["cache"], parameters["heightmap"],
+                                  parameters["noise"])
+
+
+def compute_heights(settings, base=None, replace=False, progress=None):
+    """
+    This function computes the final height of every vertex of the terrain, erosion included.
+    It only reads the settings, so it can run on a worker thread while the scene and the generator are used.
+        Parameters:
+            settings (MappingProxyType): Values returned by TerrainGenerator.heights_settings.
+            base (numpy.ndarray): Heights of the whole terrain before the deformation. Default is a flat terrain
+            replace (bool): Overwrite the heights instead of adding the deformation to them. Default adds it
+            progress (function): Receives the work done and the total, an exception raised by it stops the
+                                 computation. Default doesn't report it
+        Returns:
+            heightfield (numpy.ndarray): Height of every vertex of the whole terrain.
+    """
+    tile_rows, tile_columns = settings["tiles"]
+    subdivisions = settings["subdivisions"]
+    windows = heightfield_windows(tile_rows, tile_columns, subdivisions)
+
+    shape = (tile_rows * subdivisions + 1, tile_columns * subdivisions + 1)
+    base = np.zeros(shape) if base is None else np.asarray(base, dtype=np.float64)
+    heightfield = base.copy()
+
+    # Erosion takes most of the time when it is enabled
+    erosion = settings["erosion"]
+    eroding = erosion["mode"] != "None" and erosion["iterations"] > 0
+    tiles_share = 0.2 if eroding else 1.0
+
+    for done, (tile_row, tile_column, tile) in enumerate(settings_tile_heightfields(settings), 1):
+        # Each tile is written over the base, so the shared borders are not added twice
+        window = windows[(tile_row, tile_column)]
+        heightfield[window] = tile if replace else base[window] + tile
+        if progress is not None:
+            progress(done * tiles_share / len(windows), 1.0)
+
+    if eroding:
+        heightfield = erode_heightfield(heightfield, settings["dimensions"] / float(subdivisions), erosion,
+                                        settings["workers"],
+                                        progress=None if progress is None else
+                                        lambda iteration, total: progress(tiles_share + (1 - tiles_share) *
+                                                                          iteration / float(total), 1.0))
+
+    return heightfield
+
+
+def rock_layout(settings, rocks_amount, sphere_radius, heightfield, width, depth, hue, brightness_range,
+                saturation_range, progress=None):
+    """
+    This function chooses the random values of every rock, the rock settings choose how.
+    It doesn't use the scene or the generator, so it can run on a worker thread while they are used.
+        Parameters:
+            settings (MappingProxyType): Values returned by TerrainGenerator.rock_settings.
+            rocks_amount (int): The amount of rocks.
+            sphere_radius (float): Radius of the rocks before they are scaled.
+            heightfield (numpy.ndarray): Height of every vertex of the terrain. None if there is no terrain
+            width (float): Size of the terrain in X.
+            depth (float): Size of the terrain in Z.
+            hue (float): The hue of the rock colors.
+            brightness_range (tuple of float): Range of the brightness of the rock colors.
+            saturation_range (tuple of float): Range of the saturation of the rock colors.
+            progress (function): Receives the rocks done and the total, an exception raised by it stops the
+                                 layout. Default doesn't report it
+        Returns:
+            layout (dict): Prototype, scale and color of each rock, positions as an array of shape (rocks, 2),
+                           vertex color of each prototype, color mode and amount of rocks that didn't fit.
+    """
+    random_generator = settings["random"]
+    vertex_colors = settings["colorMode"] == "Vertex Color"
+    palette_levels = max(int(settings["paletteSize"] ** 0.5), 1)
+
+    # Instances share the vertices, so with vertex colors each prototype gets a color
+    prototype_colors = [random_rock_color(hue, brightness_range, saturation_range,
+                                          random_generator=random_generator) if vertex_colors else None
+                        for _ in range(settings["prototypes"])]
+
+    scatter = None
+    if settings["scatter"] == "Poisson Disk":
+        # Cells fit the biggest rock, so only the neighbour cells are checked
+        density = None
+        if heightfield is not None:
+            density = terrain_density(heightfield, width, depth, settings["densityMask"])
+        scatter = PoissonDiskScatter(width, depth, 2.2 * sphere_radius * settings["spacing"], density,
+                                     random_generator=random_generator)
+
+    layout = {"prototypes": [], "scales": [], "colors": [], "prototypeColors": prototype_colors,
+              "colorMode": settings["colorMode"]}
+    positions = []
+
+    for i in range(rocks_amount):
+        if progress is not None and i % 100 == 0:
+            progress(i, rocks_amount)
+
+        # A random prototype to instance
+        layout["prototypes"].append(random_generator.randrange(settings["prototypes"])
+                                    if settings["prototypes"] else None)
+
+        # Variations to scale
+        random_scale_x = random_generator.uniform(.2, 1)
+        random_scale_y = random_scale_x + random_generator.uniform(-.1, .1)  # Small variations on other axes
+        random_scale_z = random_scale_x + random_generator.uniform(-.1, .1)  # Small variations on other axes
+        layout["scales"].append((random_scale_x, random_scale_y, random_scale_z))
+
+        if scatter is not None:
+            # Keep a distance to the other rocks depending on the size of this one
+            footprint = sphere_radius * max(random_scale_x, random_scale_z) * settings["spacing"]
+            positions.append(scatter.next_position(footprint))
+        else:
+            # Random numbers locations based on terrain size
+            positions.append((random_generator.uniform(-width / 2, width / 2),
+                              random_generator.uniform(-depth / 2, depth / 2)))
+
+        if vertex_colors and settings["prototypes"]:
+            # Painted with its prototype
+            layout["colors"].append(None)
+        elif settings["colorMode"] == "Palette":
+            # Round the color to the palette
+            layout["colors"].append(random_rock_color(hue, brightness_range, saturation_range, palette_levels,
+                                                    random_generator))
+        else:
+            layout["colors"].append(random_rock_color(hue, brightness_range, saturation_range,
+                                                    random_generator=random_generator))
+
+    layout["positions"] = np.array(positions, dtype=np.float64).reshape(-1, 2)
+    layout["crowded"] = scatter.crowded if scatter is not None else 0
+
+    if progress is not None:
+        progress(rocks_amount, rocks_amount)
+
+    return layout
+
+
+def random_rock_color(hue, brightness_range, saturation_range, levels=None, random_generator=random):
+    """
+    This function chooses a random color for a rock.
+        Parameters:
+            hue (float): The hue of the rocks from 0 to 360.
+            brightness_range (tuple of float): Min and max brightness.
+            saturation_range (tuple of float): Min and max saturation.
+            levels (int): Amount of values that brightness and saturation can have, so there are at most
+                          levels * levels colors. Default doesn't limit them
+            random_generator (random.Random): Source of the random values. Default uses the random module
+        Returns:
+            color (tuple of float): Red, green and blue from 0 to 1.
+    """
+    random_brightness = random_generator.uniform(brightness_range[0], brightness_range[1])
+    random_saturation = random_generator.uniform(saturation_range[0], saturation_range[1])
+
+    if levels is not None:
+        # Move each value to the center of its level inside the range
+        random_brightness = quantize(random_brightness, brightness_range, levels)
+        random_saturation = quantize(random_saturation, saturation_range, levels)
+
+    return colorsys.hsv_to_rgb(hue/360.0, random_saturation, random_brightness*1.0)
+
+
+def quantize(value, value_range, levels):
+    """
+    This function rounds a value to one of several evenly spaced levels of a range.
+        Parameters:
+            value (float): The value to round.
+            value_range (tuple of float): Min and max value.
+            levels (int): Amount of levels.
+        Returns:
+            value (float): The center of the level that contains the value.
+    """
+    low, high = value_range
+    if high <= low:
+        return low
+
+    level = min(int((value - low) / (high - low) * levels), levels - 1)
+
+    return low + (level + 0.5) * (high - low) / levels
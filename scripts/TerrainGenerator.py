@@ -1,15 +1,21 @@
 import maya.cmds as cmds
-import maya.mel as mel
-import math
+import maya.utils
 import logging
-from random import uniform as rand
-from random import choice
-from random import shuffle
 import os
 import colorsys
+import random
+import multiprocessing
+from NoiseField import NOISE_TYPES, INTERPOLATIONS
+from Erosion import EROSION_MODES
+from SceneBackend import MayaBackend
+from TerrainCore import TerrainGenerator, ROCK_COLOR_MODES, MAX_NOISE_SEED, compute_heights, rock_layout
+from TerrainPreview import ProgressivePreview
+from BackgroundJobs import JobRunner
+from RockScatter import DENSITY_MASKS
 
 """
     This tool creates a window that allows the user to create randomly generated terrains and add rocks to it.
+    The terrains and rocks are generated by TerrainCore, this module only contains the UI.
     by Daniel Orozco
 """
 
@@ -17,10 +23,6 @@ import colorsys
 logger = logging.getLogger("TerrainGenerator")
 logger.setLevel(logging.INFO)  # Allows us to see debug messages, change to INFO to hide
 
-# Import timer in debug mode
-if logger.level == logging.DEBUG:
-    import time
-
 
 class WindowCreator:
     """
@@ -29,10 +31,24 @@ class WindowCreator:
         terrainName (str): The textField that receives the terrain's name.
         dimensionSlider (str): The slider for terrain's dimension.
         subdivisionSlider (str): The slider for terrain's subdivisions.
+        previewCheck (str): The checkBox to build a preview of the terrain while the sliders are dragged.
         methodField (str): The optionMenu to select the deformation method.
+        heightmapField (str): The textFieldButtonGrp with the heightmap file used by the Heightmap method.
+        heightSlider (str): The slider for the max height of the deformation.
+        inPlaceCheck (str): The checkBox to replace the deformation of the terrain instead of adding to it.
         valueDictionary (dict of {str:value}): The UI keys and the values they have.
         deformOptions (list of str): The possible deformation methods.
         terrainGenerator (TerrainGenerator): Object that manages how the terrain gets created.
+        profileField (str): The scrollField that shows the stages measured by the profiler.
+        preview (ProgressivePreview): Builds the coarse preview and refines it when Maya is idle.
+        backgroundCheck (str): The checkBox to compute terrains and rocks on a worker thread.
+        progressBar (str): The progressBar of the job that runs in the background.
+        statusText (str): The text with the name and state of the job that runs in the background.
+        cancelButton (str): The button that cancels the job that runs in the background.
+        jobs (JobRunner): Computes heightfields and rock layouts on a worker thread, the scene is edited here.
+        previewTerrain (str): Top node of the terrain built by the preview, replaced by every new step.
+        previewSeed (int): Seed shared by every step of the preview, so the refined terrain keeps its shape.
+        previewJob (BackgroundJob): Job that computes the full resolution of the preview. None if none was started
     """
 
     # String that is used as a key to retrieve the window
@@ -49,7 +65,25 @@ class WindowCreator:
         self.terrainName = "terrainName"
         self.dimensionSlider = "dimensionSlider"
         self.subdivisionSlider = "subdivisionSlider"
+        self.previewCheck = "previewCheck"
+        self.tilesField = "tilesField"
+        self.workersSlider = "workersSlider"
+        self.lodSlider = "lodSlider"
         self.methodField = "methodField"
+        self.analyticCheck = "analyticCheck"
+        self.seedField = "seedField"
+        self.noiseTypeField = "noiseTypeField"
+        self.octavesSlider = "octavesSlider"
+        self.lacunaritySlider = "lacunaritySlider"
+        self.persistenceSlider = "persistenceSlider"
+        self.noiseScaleSlider = "noiseScaleSlider"
+        self.interpolationField = "interpolationField"
+        self.erosionField = "erosionField"
+        self.erosionIterationsSlider = "erosionIterationsSlider"
+        self.talusSlider = "talusSlider"
+        self.heightmapField = "heightmapField"
+        self.heightSlider = "heightSlider"
+        self.inPlaceCheck = "inPlaceCheck"
         self.terrainShaderName = "terrainShaderName"
         self.terrainColorIcon = "terrainColorIcon"
         self.terrainNormalIcon = "terrainNormalIcon"
@@ -57,6 +91,12 @@ class WindowCreator:
 
         self.rocksName = "rocksName"
         self.rockSlider = "rockSlider"
+        self.prototypeSlider = "prototypeSlider"
+        self.scatterField = "scatterField"
+        self.spacingSlider = "spacingSlider"
+        self.densityField = "densityField"
+        self.colorModeField = "colorModeField"
+        self.paletteSlider = "paletteSlider"
         self.rocksShaderName = "rocksShaderName"
         self.rocksColorIcon = "rocksColorIcon"
         self.rocksNormalIcon = "rocksNormalIcon"
@@ -67,17 +107,48 @@ class WindowCreator:
         self.minSaturation = "minSaturation"
         self.maxSaturation = "maxSaturation"
 
+        self.profileField = "profileField"
+        self.backgroundCheck = "backgroundCheck"
+        self.progressBar = "progressBar"
+        self.statusText = "statusText"
+        self.cancelButton = "cancelButton"
+
         # Dictionary that uses UI elements as a key to store their values
         self.valueDictionary = {self.terrainName: "myTerrain",
                                 self.dimensionSlider: 50,
                                 self.subdivisionSlider: 50,
+                                self.previewCheck: False,
+                                self.backgroundCheck: True,
+                                self.tilesField: (1, 1),
+                                self.workersSlider: 1,
+                                self.lodSlider: 0,
                                 self.methodField: "Random Soft Select",
+                                self.analyticCheck: True,
+                                self.seedField: 0,
+                                self.noiseTypeField: "Sine",
+                                self.octavesSlider: 4,
+                                self.lacunaritySlider: 2.0,
+                                self.persistenceSlider: 0.5,
+                                self.noiseScaleSlider: 4.0,
+                                self.interpolationField: "Smoothstep",
+                                self.erosionField: "None",
+                                self.erosionIterationsSlider: 50,
+                                self.talusSlider: 0.8,
+                                self.heightmapField: "",
+                                self.heightSlider: 7.5,
+                                self.inPlaceCheck: False,
                                 self.rocksName: "myRocks",
                                 self.terrainShaderName: "terrain_mat",
                                 self.terrainColorIcon: "",
                                 self.terrainNormalIcon: "",
                                 self.terrainSpecularIcon: "",
                                 self.rockSlider: 1,
+                                self.prototypeSlider: 0,
+                                self.scatterField: "Random",
+                                self.spacingSlider: 1.0,
+                                self.densityField: "None",
+                                self.colorModeField: "Per Rock",
+                                self.paletteSlider: 16,
                                 self.rocksShaderName: "rocks_mat",
                                 self.rocksColorIcon: "",
                                 self.rocksNormalIcon: "",
@@ -90,10 +161,22 @@ class WindowCreator:
                                 }
 
         # Possible options to deform the terrain
-        self.deformOptions = ["Random Soft Select", "Value Noise"]
+        self.deformOptions = ["Random Soft Select", "Noise", "Heightmap"]
 
         # Terrain generator object
-        self.terrainGenerator = TerrainGenerator()
+        self.terrainGenerator = TerrainGenerator(MayaBackend(cmds))
+
+        # Refinement steps run when Maya is idle, so dragging a slider again comes first.
+        # The full resolution is computed in the background when it can, so it can be cancelled
+        self.preview = ProgressivePreview(self.build_preview,
+                                          lambda function: cmds.evalDeferred(function, lowestPriority=True),
+                                          build_final=self.build_final_preview)
+        self.previewTerrain = ""
+        self.previewSeed = None
+        self.previewJob = None
+
+        # Progress and results are sent back to the main thread, the only one that can edit the scene
+        self.jobs = JobRunner(maya.utils.executeDeferred, self.show_progress, self.finish_job)
 
         self.windowWidth = 500
 
@@ -125,6 +208,9 @@ class WindowCreator:
         This function creates the fields, sliders, etc contained in the window
         """
 
+        # Main column layout with the tabs and the progress of the background jobs below them
+        cmds.columnLayout()
+
         tabs = cmds.tabLayout(innerMarginWidth=5, innerMarginHeight=5)
 
         '''
@@ -144,12 +230,38 @@ class WindowCreator:
                           ann="The desired name for the terrain that is being created.")
         cmds.intSliderGrp(self.dimensionSlider, label="Terrain Dimension",
                           field=True, min=1, max=150, value=self.valueDictionary[self.dimensionSlider],
-                          changeCommand=lambda new_val: self.update_value(new_val, self.dimensionSlider),
+                          dragCommand=lambda new_val: self.drag_preview(new_val, self.dimensionSlider),
+                          changeCommand=lambda new_val: self.change_preview(new_val, self.dimensionSlider),
                           ann="Width and height sized for the terrain. This tool creates square terrains.")
         cmds.intSliderGrp(self.subdivisionSlider, label="Terrain Subdivisions",
                           field=True, min=1, max=150, value=self.valueDictionary[self.subdivisionSlider],
-                          changeCommand=lambda new_val: self.update_value(new_val, self.subdivisionSlider),
+                          dragCommand=lambda new_val: self.drag_preview(new_val, self.subdivisionSlider),
+                          changeCommand=lambda new_val: self.change_preview(new_val, self.subdivisionSlider),
                           ann="Amount of subdivisions of the new terrain. Uniform for width and height.")
+        cmds.checkBox(self.previewCheck, label="Live Preview",
+                      value=self.valueDictionary[self.previewCheck],
+                      changeCommand=self.toggle_preview,
+                      ann="Builds a coarse terrain while Dimension and Subdivisions are dragged, and refines it "
+                          "to the full subdivisions once they are released.")
+        cmds.intFieldGrp(self.tilesField, label="Tiles (Rows, Columns)", numberOfFields=2,
+                         value1=self.valueDictionary[self.tilesField][0],
+                         value2=self.valueDictionary[self.tilesField][1],
+                         changeCommand=lambda *args: self.update_value(
+                             (max(cmds.intFieldGrp(self.tilesField, query=True, value1=True), 1),
+                              max(cmds.intFieldGrp(self.tilesField, query=True, value2=True), 1)),
+                             self.tilesField),
+                         ann="Creates a grid of terrain tiles with seamless borders. "
+                             "Dimension and subdivisions are used for each tile.")
+        cmds.intSliderGrp(self.workersSlider, label="Worker Processes",
+                          field=True, min=1, max=max(multiprocessing.cpu_count(), 2),
+                          value=self.valueDictionary[self.workersSlider],
+                          changeCommand=lambda new_val: self.update_value(new_val, self.workersSlider),
+                          ann="Amount of processes used to compute the tiles. The result is the same for any amount.")
+        cmds.intSliderGrp(self.lodSlider, label="LOD Levels", field=True, min=0, max=5,
+                          value=self.valueDictionary[self.lodSlider],
+                          changeCommand=lambda new_val: self.update_value(new_val, self.lodSlider),
+                          ann="Reduced meshes created for each tile, each one with half the subdivisions. "
+                              "Maya shows them instead of the full mesh when the camera is far away.")
 
         self.make_separator(10)
 
@@ -162,8 +274,79 @@ class WindowCreator:
                         ann="The method or algorithm used to deform the terrain.")
         cmds.menuItem(label="Random Soft Select",
                       annotation="Chooses random vertices with soft selection enabled and modifies their location")
-        cmds.menuItem(label="Value Noise",
-                      annotation="Calculates value noise using the coordinates of each vertex")
+        cmds.menuItem(label="Noise",
+                      annotation="Calculates fractal noise using the coordinates of each vertex")
+        cmds.menuItem(label="Heightmap",
+                      annotation="Reads the height of each vertex from a heightmap file")
+
+        cmds.checkBox(self.analyticCheck, label="Analytic Soft Select",
+                      value=self.valueDictionary[self.analyticCheck],
+                      changeCommand=lambda new_val: self.update_value(new_val, self.analyticCheck),
+                      ann="Computes the soft selection falloffs of the terrain and the rocks with arrays and moves "
+                          "every vertex at once. Disable to use Maya's soft selection tool.")
+        cmds.intFieldGrp(self.seedField, label="Noise Seed", value1=self.valueDictionary[self.seedField],
+                         changeCommand=self.update_seed,
+                         ann="Seed used by Noise. Use ZERO for a random seed on every deformation. "
+                             "Terrains that were generated before with the same seed are taken from the cache.")
+        cmds.optionMenuGrp(self.noiseTypeField, label="Noise Type",
+                           changeCommand=lambda new_val: self.update_value(new_val, self.noiseTypeField),
+                           ann="Sine is the original value noise. Value blends random heights, Perlin blends "
+                               "random slopes and Simplex uses a triangular grid without square artefacts.")
+        for noise_type in NOISE_TYPES:
+            cmds.menuItem(label=noise_type)
+        cmds.intSliderGrp(self.octavesSlider, label="Octaves", field=True, min=1, max=10,
+                          value=self.valueDictionary[self.octavesSlider],
+                          changeCommand=lambda new_val: self.update_value(new_val, self.octavesSlider),
+                          ann="Amount of layers of noise added together, each one with finer details.")
+        cmds.floatSliderGrp(self.lacunaritySlider, label="Lacunarity", field=True, min=1.0, max=4.0,
+                            value=self.valueDictionary[self.lacunaritySlider],
+                            changeCommand=lambda new_val: self.update_value(new_val, self.lacunaritySlider),
+                            ann="Frequency multiplier between an octave and the next one.")
+        cmds.floatSliderGrp(self.persistenceSlider, label="Persistence", field=True, min=0.05, max=1.0,
+                            value=self.valueDictionary[self.persistenceSlider],
+                            changeCommand=lambda new_val: self.update_value(new_val, self.persistenceSlider),
+                            ann="Weight multiplier between an octave and the next one. Higher values are rougher.")
+        cmds.floatSliderGrp(self.noiseScaleSlider, label="Noise Scale", field=True, min=0.5, max=32.0,
+                            value=self.valueDictionary[self.noiseScaleSlider],
+                            changeCommand=lambda new_val: self.update_value(new_val, self.noiseScaleSlider),
+                            ann="Amount of hills across a tile on the first octave.")
+        cmds.optionMenuGrp(self.interpolationField, label="Interpolation",
+                           changeCommand=lambda new_val: self.update_value(new_val, self.interpolationField),
+                           ann="How Value, Perlin and Sine noise blend between grid points. Simplex ignores it.")
+        for interpolation in INTERPOLATIONS:
+            cmds.menuItem(label=interpolation)
+        cmds.optionMenuGrp(self.erosionField, label="Erosion",
+                           changeCommand=lambda new_val: self.update_value(new_val, self.erosionField),
+                           ann="Erodes the terrain before it is written. Thermal slides material down steep slopes, "
+                               "Hydraulic carves the terrain with rain and Both runs them together.")
+        for erosion_mode in EROSION_MODES:
+            cmds.menuItem(label=erosion_mode)
+        cmds.intSliderGrp(self.erosionIterationsSlider, label="Erosion Iterations", field=True, min=1, max=500,
+                          value=self.valueDictionary[self.erosionIterationsSlider],
+                          changeCommand=lambda new_val: self.update_value(new_val, self.erosionIterationsSlider),
+                          ann="More iterations erode the terrain further. Worker Processes erode big terrains "
+                              "by tiles with the same result. Big terrains take seconds to erode, Run In Background "
+                              "keeps Maya responsive meanwhile.")
+        cmds.floatSliderGrp(self.talusSlider, label="Talus Slope", field=True, min=0.05, max=3.0,
+                            value=self.valueDictionary[self.talusSlider],
+                            changeCommand=lambda new_val: self.update_value(new_val, self.talusSlider),
+                            ann="Thermal erosion flattens the slopes steeper than this height per unit of distance.")
+        cmds.textFieldButtonGrp(self.heightmapField, label="Heightmap File", buttonLabel="Browse",
+                                text=self.valueDictionary[self.heightmapField],
+                                changeCommand=lambda new_val: self.update_value(new_val, self.heightmapField),
+                                buttonCommand=self.update_heightmap,
+                                ann="Heightmap used by the Heightmap method. 16-bit RAW, 8 or 16-bit PNG or NumPy. "
+                                    "It is resampled to the subdivisions of the terrain.")
+        cmds.floatSliderGrp(self.heightSlider, label="Max Height", field=True, min=0.0, max=30.0,
+                            value=self.valueDictionary[self.heightSlider],
+                            dragCommand=self.update_height, changeCommand=self.update_height,
+                            ann="Max height of the deformation for a terrain of 100 units. "
+                                "Terrains deformed in place are updated while dragging.")
+        cmds.checkBox(self.inPlaceCheck, label="Deform In Place",
+                      value=self.valueDictionary[self.inPlaceCheck],
+                      changeCommand=lambda new_val: self.update_value(new_val, self.inPlaceCheck),
+                      ann="Replaces the deformation of the terrain instead of adding another layer. "
+                          "Max Height and Noise Seed changes update the terrain without computing everything again.")
 
         cmds.setParent('..')  # Exit Menu column Layout
 
@@ -210,6 +393,8 @@ class WindowCreator:
         cmds.button(label="Add deformation", width=self.windowWidth/4, command=self.just_deform,
                     ann="Adds another layer of deformation to the PREVIOUSLY created terrain with the selected method.")
         cmds.setParent('..')  # Exit Row Layout
+        cmds.button(label="Export heightmap", width=self.windowWidth/4, command=self.export_heightmap,
+                    ann="Saves the height of the PREVIOUSLY created terrain as a 16-bit RAW, 16-bit PNG or .npy file.")
         cmds.setParent('..')  # Exit Centered column layout
 
         cmds.setParent('..')  # Exit MAIN column layout
@@ -230,9 +415,41 @@ class WindowCreator:
                           ann="Common name shared within all the rocks created. This tool groups the rocks inside a "
                               "group with the same name with _grp suffix")
         cmds.intSliderGrp(self.rockSlider, label="Rocks Amount",
-                          field=True, min=1, max=100, value=self.valueDictionary[self.rockSlider],
+                          field=True, min=1, max=100, fieldMaxValue=10000, value=self.valueDictionary[self.rockSlider],
                           changeCommand=lambda new_val: self.update_value(new_val, self.rockSlider),
                           ann="The amount of rocks generated")
+        cmds.intSliderGrp(self.prototypeSlider, label="Rock Prototypes",
+                          field=True, min=0, max=20, value=self.valueDictionary[self.prototypeSlider],
+                          changeCommand=lambda new_val: self.update_value(new_val, self.prototypeSlider),
+                          ann="Amount of different rock meshes, every rock is an instance of one of them. "
+                              "Use ZERO to create a unique mesh for each rock.")
+        cmds.optionMenuGrp(self.scatterField, label="Rock Scatter",
+                           changeCommand=lambda new_val: self.update_value(new_val, self.scatterField),
+                           ann="How rock positions are chosen.")
+        cmds.menuItem(label="Random",
+                      annotation="Every rock gets an independent random position, rocks can overlap")
+        cmds.menuItem(label="Poisson Disk",
+                      annotation="Rocks keep a distance between them that depends on their size")
+        cmds.floatSliderGrp(self.spacingSlider, label="Rock Spacing", field=True, min=0.1, max=5.0,
+                            value=self.valueDictionary[self.spacingSlider],
+                            changeCommand=lambda new_val: self.update_value(new_val, self.spacingSlider),
+                            ann="Multiplier of the distance kept between rocks with Poisson Disk.")
+        cmds.optionMenuGrp(self.densityField, label="Density Mask",
+                           changeCommand=lambda new_val: self.update_value(new_val, self.densityField),
+                           ann="Part of the terrain that gets more rocks with Poisson Disk.")
+        for mask in DENSITY_MASKS:
+            cmds.menuItem(label=mask)
+        cmds.optionMenuGrp(self.colorModeField, label="Rock Colors",
+                           changeCommand=lambda new_val: self.update_value(new_val, self.colorModeField),
+                           ann="Per Rock creates a color node for each rock. Palette shares a few color nodes. "
+                               "Vertex Color paints the rocks without creating nodes, instances share the color "
+                               "of their prototype.")
+        for mode in ROCK_COLOR_MODES:
+            cmds.menuItem(label=mode)
+        cmds.intSliderGrp(self.paletteSlider, label="Palette Size",
+                          field=True, min=1, max=64, value=self.valueDictionary[self.paletteSlider],
+                          changeCommand=lambda new_val: self.update_value(new_val, self.paletteSlider),
+                          ann="Max amount of color nodes shared by the rocks with the Palette colors.")
 
         # Texture section
         self.make_separator(10)
@@ -321,7 +538,56 @@ class WindowCreator:
         '''
         ----------------------------------------------------------------------------------------------------------------
         '''
-        cmds.tabLayout(tabs, edit=True, tabLabel=((terrain_tab, 'Terrain'), (rocks_tab, 'Rocks')))
+        '''
+        ----------------------------    Tab for the profile of the generations  -------------------------------
+        '''
+        profile_tab = cmds.columnLayout()
+
+        # Main column layout for the profile
+        cmds.columnLayout(rowSpacing=2)
+        self.make_separator(10)
+
+        cmds.scrollField(self.profileField, editable=False, wordWrap=False, font="fixedWidthFont",
+                         width=self.windowWidth, height=400,
+                         text="Create a terrain or rocks and press Refresh to see how long each stage took.",
+                         ann="Time, scene commands and biggest array of every stage since the profile was cleared.")
+
+        self.make_separator(10)
+        cmds.columnLayout(columnAttach=('both', self.windowWidth / 8), columnWidth=self.windowWidth)
+        cmds.rowLayout(numberOfColumns=3, columnWidth3=[self.windowWidth/4, self.windowWidth/4, self.windowWidth/4])
+        cmds.button(label="Refresh", width=self.windowWidth/4 - 10, command=self.show_profile,
+                    ann="Shows the stages measured since the profile was cleared.")
+        cmds.button(label="Clear", width=self.windowWidth/4 - 10, command=self.clear_profile,
+                    ann="Forgets every stage measured so far.")
+        cmds.button(label="Export", width=self.windowWidth/4 - 10, command=self.export_profile,
+                    ann="Saves the stages as a Chrome trace, for chrome://tracing or Perfetto, or as JSON.")
+        cmds.setParent('..')  # Exit Row Layout
+        cmds.setParent('..')  # Exit Button Column Layout
+
+        cmds.setParent('..')  # Exit Main column Layout
+        cmds.setParent('..')  # Exit Frame Layout
+
+        '''
+        ----------------------------------------------------------------------------------------------------------------
+        '''
+        cmds.tabLayout(tabs, edit=True, tabLabel=((terrain_tab, 'Terrain'), (rocks_tab, 'Rocks'),
+                                                  (profile_tab, 'Profile')))
+        cmds.setParent('..')  # Exit Tab Layout
+
+        # Progress of the job that runs in the background
+        cmds.rowLayout(numberOfColumns=4, columnWidth4=[self.windowWidth/3, self.windowWidth/3,
+                                                        self.windowWidth/6, self.windowWidth/6])
+        cmds.checkBox(self.backgroundCheck, label="Run In Background",
+                      value=self.valueDictionary[self.backgroundCheck],
+                      changeCommand=lambda new_val: self.update_value(new_val, self.backgroundCheck),
+                      ann="Computes the heights of the terrain and the layout of the rocks on a worker thread, "
+                          "so Maya keeps responding. Only the final scene changes block it.")
+        cmds.progressBar(self.progressBar, maxValue=100, width=self.windowWidth/3 - 10)
+        cmds.text(self.statusText, label="Ready", align="left", width=self.windowWidth/6)
+        cmds.button(self.cancelButton, label="Cancel", enable=False, width=self.windowWidth/6 - 10,
+                    command=lambda *args: self.jobs.cancel(),
+                    ann="Stops the job that runs in the background, nothing is left in the scene.")
+        cmds.setParent('..')  # Exit Row Layout
 
         '''
         ------------------------------------ Development Tools ---------------------------------------------------------
@@ -330,12 +596,13 @@ class WindowCreator:
             cmds.frameLayout(label="Development Tools", bgc=(.5, 0, 0))
             cmds.gridLayout(nc=3, cellWidthHeight=(self.windowWidth / 3, 20))
             cmds.button(label="Delete Unused Nodes", w=self.windowWidth / 3,
-                        command=lambda x: mel.eval('MLdeleteUnused;'))
+                        command=self.delete_unused)
             cmds.button(label="Delete All Objects", w=self.windowWidth / 3,
                         command=lambda x: cmds.delete(cmds.ls(dag=True)))
 
     def delete_unused(self, *args):
-        mel.eval('MLdeleteUnused;')
+        self.terrainGenerator.materials.collect_garbage(shared=True)
+        self.terrainGenerator.backend.delete_unused_nodes()
 
     def create_and_deform(self, *args):
         """
@@ -344,630 +611,525 @@ class WindowCreator:
             *args (list): Used to keep the information sent by the UI elements
         """
         logger.debug("Create NEW Terrain")
-        # Execute function for terrain creation
-        self.terrainGenerator.create_terrain(
-            grid_name=self.valueDictionary[self.terrainName],
-            dimensions=self.valueDictionary[self.dimensionSlider],
-            subdivisions=self.valueDictionary[self.subdivisionSlider])
-
-        # Execute deformation
-        deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
 
-        self.terrainGenerator.deform_terrain(deformation_index)
+        # The preview terrain is kept as it is, a new terrain is created next to it
+        self.preview.cancel()
+        self.previewTerrain = ""
 
-        # Assign material
-        material = create_material(self.valueDictionary[self.terrainShaderName],
-                                   self.valueDictionary[self.terrainColorIcon],
-                                   self.valueDictionary[self.terrainNormalIcon],
-                                   self.valueDictionary[self.terrainSpecularIcon])
-
-        cmds.select(self.terrainGenerator.gridObject)
-        cmds.hyperShade(assign=material)
+        if not self.in_background():
+            self.generate_terrain(self.valueDictionary[self.subdivisionSlider])
+            return
 
-    def just_deform(self, *args):
+        generator = self.terrainGenerator
+        deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
+        replace = self.valueDictionary[self.inPlaceCheck]
+
+        # The terrain is created when its heights are ready, so creating it is undone at once
+        self.update_deformation_settings()
+        terrain = {"grid_name": self.valueDictionary[self.terrainName],
+                   "dimensions": self.valueDictionary[self.dimensionSlider],
+                   "subdivisions": self.valueDictionary[self.subdivisionSlider],
+                   "tiles": self.valueDictionary[self.tilesField]}
+        parameters, settings = generator.terrain_settings(deformation_index, terrain["dimensions"],
+                                                          terrain["subdivisions"], terrain["tiles"])
+
+        # A new terrain is flat, adding the deformation or replacing the heights is the same
+        self.start_job("Create Terrain",
+                       lambda job: compute_heights(settings, replace=True, progress=job.report),
+                       lambda heightfield: self.finish_terrain(heightfield, parameters, replace, terrain))
+
+    def generate_terrain(self, subdivisions, seed=None, undo_name="Create Terrain", random_generator=None):
         """
-        This function modifies an existing terrain using the Generator object
+        This function creates a terrain with the settings of the UI, deforms it and assigns its material
         Parameters:
-            *args (list): Used to keep the information sent by the UI elements
+            subdivisions (int): Amount of subdivisions of the terrain
+            seed (int): Seed of the deformation. Default uses the Noise Seed field
+            undo_name (str): Name of the undo chunk and of the span measured. Default to "Create Terrain"
+            random_generator (random.Random): Source of the random values of this terrain only. Default uses the
+                                              one of the Generator object
         """
-        logger.debug("Just deform Terrain")
-
-        # Execute deformation
-        deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
+        generator_random = self.terrainGenerator.randomGenerator
+        if random_generator is not None:
+            self.terrainGenerator.randomGenerator = random_generator
 
-        self.terrainGenerator.deform_terrain(deformation_index)
+        try:
+            self.build_terrain(subdivisions, seed, undo_name)
+        finally:
+            self.terrainGenerator.randomGenerator = generator_random
 
-    def create_rocks(self, *args):
+    def build_terrain(self, subdivisions, seed, undo_name):
         """
-        This function creates random rocks using the Generator object
+        This function creates a terrain with the settings of the UI in a single undo chunk, used by generate_terrain
         Parameters:
-            *args (list): Used to keep the information sent by the UI elements
+            subdivisions (int): Amount of subdivisions of the terrain
+            seed (int): Seed of the deformation. None uses the Noise Seed field
+            undo_name (str): Name of the undo chunk and of the span measured
         """
-        logger.debug("Bring the rocks!")
-
-        self.terrainGenerator.create_rocks(self.valueDictionary[self.rocksName],
-                                           self.valueDictionary[self.rockSlider],
-                                           self.valueDictionary[self.rocksShaderName],
-                                           self.valueDictionary[self.rocksColorIcon],
-                                           self.valueDictionary[self.rocksNormalIcon],
-                                           self.valueDictionary[self.colorSlider],
-                                           (self.valueDictionary[self.minBrightness],
-                                            self.valueDictionary[self.maxBrightness]),
-                                           (self.valueDictionary[self.minSaturation],
-                                            self.valueDictionary[self.maxSaturation])
-                                           )
-
-    def update_color(self, hue, color_slider):
-        logger.debug("Hue is: {}".format(hue))
-
-        rgb = colorsys.hsv_to_rgb(hue/360.0, 1.0, 1.0)
+        # A whole generation is undone at once and measured as a single span
+        with self.terrainGenerator.profiler.span(undo_name), self.terrainGenerator.backend.batch(undo_name):
+            self.update_deformation_settings()
+            if seed is not None:
+                self.terrainGenerator.seed = seed
+
+            # Execute function for terrain creation
+            self.terrainGenerator.create_terrain(
+                grid_name=self.valueDictionary[self.terrainName],
+                dimensions=self.valueDictionary[self.dimensionSlider],
+                subdivisions=subdivisions,
+                tiles=self.valueDictionary[self.tilesField])
+
+            # Execute deformation
+            deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
+
+            if self.valueDictionary[self.inPlaceCheck]:
+                self.terrainGenerator.redeform_terrain(deformation_index)
+            else:
+                self.terrainGenerator.deform_terrain(deformation_index)
+
+            self.assign_terrain_material()
+
+    def assign_terrain_material(self):
+        """
+        This function assigns the terrain material of the UI to the terrain and its levels of detail
+        """
+        # Assign material, the same maps reuse the material created before
+        material = self.terrainGenerator.materials.material(self.valueDictionary[self.terrainShaderName],
+                                                            self.valueDictionary[self.terrainColorIcon],
+                                                            self.valueDictionary[self.terrainNormalIcon],
+                                                            self.valueDictionary[self.terrainSpecularIcon])
 
-        logger.debug("RGB is: {}".format(rgb))
+        self.terrainGenerator.backend.assign_material(self.terrainGenerator.terrain_nodes(), material)
 
-        cmds.button("colorDisplay", edit=True, backgroundColor=rgb)
+    def in_background(self):
+        """
+        This function checks if the next deformation can be computed on a worker thread
+        Returns:
+            background (bool): False if Run In Background is disabled or Maya's soft selection tool is used
+        """
+        deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
 
-        self.update_value(hue, color_slider)
+        # The soft selection tool moves the vertices in the scene
+        return self.valueDictionary[self.backgroundCheck] and (deformation_index != 0 or
+                                                               self.valueDictionary[self.analyticCheck])
 
-    def update_icon(self, icon):
+    def start_job(self, name, compute, apply, cleanup=None):
         """
-        This function receives the name of an icon and updates its image with a selected file.
+        This function starts a job in the background and shows it below the tabs
         Parameters:
-            icon (str): The name that is used to reference the icon
+            name (str): Name shown while the job runs
+            compute (function): Receives the job and returns the result, runs on the worker thread
+            apply (function): Receives the result and edits the scene
+            cleanup (function): Removes what was created for the job if it doesn't finish. Default does nothing
+        Returns:
+            job (BackgroundJob): The job started
         """
-        map_name = icon
-        map_name = map_name[map_name.find("terrain")+len("terrain"):map_name.rfind("Icon")]
-        filename = cmds.fileDialog2(fileMode=1, caption="Import {} Map".format(map_name))
+        job = self.jobs.submit(name, compute, apply, cleanup)
 
-        if filename:
-            the_file = filename and os.path.normpath(filename[0])
-            cmds.iconTextButton(icon, e=True, style="iconOnly")
-            cmds.iconTextButton(icon, e=True, image=the_file)
-        else:
-            the_file = ""
-            cmds.iconTextButton(icon, e=True, style="textOnly")
+        cmds.progressBar(self.progressBar, edit=True, progress=0)
+        cmds.text(self.statusText, edit=True, label=name)
+        cmds.button(self.cancelButton, edit=True, enable=True)
 
-        self.update_value(the_file, icon)
+        return job
 
-    def update_value(self, *args):
+    def show_progress(self, name, fraction):
         """
-        This function creates a terrain and deforms it using the Generator object
+        This function shows the progress of the job that runs in the background
         Parameters:
-            *args (list): Used to keep the information sent by the UI elements.
-                          First index saves the value; Second index saves UI's key to access the value.
+            name (str): Name of the job
+            fraction (float): Fraction of the job done
         """
-        logger.debug("Value has changed")
-        logger.debug("Updating value from: " + str(args[1]))
-
-        # Change value that is connected to this key
-        self.valueDictionary[args[1]] = args[0]
+        if not cmds.window(self.mainWindow, exists=True):
+            return
 
-        logger.debug("New value is: " + str(self.valueDictionary[args[1]]))
+        cmds.progressBar(self.progressBar, edit=True, progress=int(fraction * 100))
+        cmds.text(self.statusText, edit=True, label="{} {}%".format(name, int(fraction * 100)))
 
-    def make_separator(self, height):
+    def finish_job(self, name, state):
         """
-        This function creates an UI separator
+        This function shows how the job that ran in the background ended
         Parameters:
-            height (int): The height in pixels for this separator
+            name (str): Name of the job
+            state (str): "Done", "Cancelled" or "Failed"
         """
-        cmds.separator(height=height)
-
+        if not cmds.window(self.mainWindow, exists=True):
+            return
 
-class TerrainGenerator:
-    """
-    This is a class for creating and displaying UI elements that communicate with Terrain generator.
-        Attributes:
-            gridObject (str): Reference to the grid used to generate the terrain.
-            gridDimensions (int): Width and height of the grid.
-            gridSubdivisions (int): Quantity of subdivisions uses by the grid.
-            maxHeight (float): Max amount of movement in Y axis possible for a vertex.
-            maxPoints (int): Max number of vertices that can be used in softSelection method.
-            softSelectRadius (float): Max radius that is used by the softSelectTool.
-            curves (list of str): Falloff curves used by the softSelectTool.
-            noise_seed (int): Seed used for generating noise
-            rocksName (str): The name used for the creating rocks and their group
-            rocksAmount (int): The number of rocks that are going to be generated.
-            sphereStartRadius (float): The starting point for generating rocks.
-    """
+        cmds.progressBar(self.progressBar, edit=True, progress=100 if state == "Done" else 0)
+        cmds.text(self.statusText, edit=True, label="{} {}".format(name, state.lower()))
+        cmds.button(self.cancelButton, edit=True, enable=self.jobs.busy)
 
-    def __init__(self):
+    def finish_terrain(self, heightfield, parameters, replace, new_terrain=None):
         """
-        The constructor of TerrainGenerator class
+        This function writes the heights computed in the background on the terrain
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex of the whole terrain
+            parameters (dict): Values used to compute the heights
+            replace (bool): The heights replaced the deformation, so it can be rescaled later
+            new_terrain (dict): Arguments of create_terrain, the terrain is created with its heights and gets its
+                                material. Default writes the heights on the current terrain
         """
-        # Terrain attributes
-        self.gridObject = ""
-        self.gridDimensions = 10
-        self.gridSubdivisions = 10
-
-        # Maximum modification values, these were obtained by trial with a 100x100 grid.
-        self.maxHeight = 7.5
-        self.maxPoints = 100
+        undo_name = "Apply Terrain" if new_terrain is None else "Create Terrain"
 
-        # Attributes for Soft Selection
-        self.softSelectRadius = 20.0
-        self.curves = ["1,0,2,0,1,2", "1,0.5,2,0,1,2,1,0,2", "1,0.05,3,0,1,3,0.5,0.4,3"]
+        with self.terrainGenerator.profiler.span(undo_name), self.terrainGenerator.backend.batch(undo_name):
+            if new_terrain is not None:
+                self.terrainGenerator.create_terrain(**new_terrain)
 
-        # Attributes for value noise
-        self.noise_seed = 6000
+            self.terrainGenerator.apply_heights(heightfield, parameters, replace)
 
-        # Attributes for rock creation
-        self.rocksName = ""
-        self.rocksAmount = 1
-        self.sphereStartRadius = .8
+            if new_terrain is not None:
+                self.assign_terrain_material()
 
-    def create_terrain(self, grid_name, dimensions, subdivisions):
+    def toggle_preview(self, enabled):
         """
-        This function creates the grid with parameters given.
-            Parameters:
-                grid_name (str): The name that the terrain is going to have.
-                dimensions (int): Dimensions for width and height.
-                subdivisions (int): Amount of subdivisions for the grid.
+        This function turns the live preview on or off, a new seed is chosen when it is turned on
+        Parameters:
+            enabled (bool): The value of the checkBox
         """
-        if logger.level == logging.DEBUG:
-            start_time = time.time()
+        self.update_value(enabled, self.previewCheck)
 
-        # Create polyPlane with given parameters
-        cmds.polyPlane(name=grid_name, width=dimensions, height=dimensions,
-                       sx=subdivisions, sy=subdivisions)
+        self.previewSeed = None
+        if not enabled:
+            self.preview.cancel()
+            if self.previewJob is not None:
+                self.previewJob.cancel()
 
-        # Save those values so they can be accessed by other functions
-        self.gridObject = cmds.ls(selection=True)[0]
-        self.gridDimensions = dimensions
-        self.gridSubdivisions = subdivisions
-
-        if logger.level == logging.DEBUG:
-            logger.debug("--- Grid CREATION took: {} ---".format(time.time() - start_time))
-
-    def deform_terrain(self, deformation_method):
+    def drag_preview(self, new_val, slider):
         """
-        This function deforms the terrain previously created.
-            Parameters:
-                deformation_method (int): The desired method to deform the grid.
+        This function saves the value of a slider while it is dragged and builds the coarse preview
+        Parameters:
+            new_val (int): The value set in the slider
+            slider (str): The slider that is dragged
         """
-        if logger.level == logging.DEBUG:
-            start_time = time.time()
-
-        # Select deformation based on the value entered
-        if deformation_method == 0:
-            self.soft_random()
-        elif deformation_method == 1:
-            self.value_noise()
+        self.update_value(new_val, slider)
 
-        if logger.level == logging.DEBUG:
-            logger.debug("--- Grid DEFORMATION took: {} ---".format(time.time() - start_time))
+        if self.valueDictionary[self.previewCheck]:
+            self.preview.preview(self.valueDictionary[self.subdivisionSlider])
 
-    def modify_terrain(self, deformation_method):
+    def change_preview(self, new_val, slider):
         """
-        This function deletes previous terrain and creates another one with same parameters.
-            Parameters:
-                deformation_method (int): The desired method to deform the grid.
+        This function saves the value of a slider when it is released and refines the preview to full resolution
+        Parameters:
+            new_val (int): The value set in the slider
+            slider (str): The slider that was released
         """
-        cmds.delete(self.gridObject)
+        self.update_value(new_val, slider)
 
-        cmds.polyPlane(name=self.gridObject, width=self.gridDimensions, height=self.gridDimensions,
-                       sx=self.gridSubdivisions, sy=self.gridSubdivisions)
+        if self.valueDictionary[self.previewCheck]:
+            self.preview.update(self.valueDictionary[self.subdivisionSlider])
 
-        self.deform_terrain(deformation_method)
-
-    def soft_random(self):
+    def build_preview(self, subdivisions):
         """
-        This function modifies the grid by using Soft Selection
+        This function replaces the preview terrain with a new one, used by every step of the preview
+        Parameters:
+            subdivisions (int): Amount of subdivisions of the terrain
         """
-        logger.debug("Starting deformation with soft selection")
-
-        if not self.check_terrain():
-            return
-
-        # Multipliers to scale deformation according to the selected size.
-        radius_multiplier = self.gridDimensions/100.0
-        height_multiplier = self.gridDimensions/100.0
-        points_multiplier = self.gridSubdivisions/100.0
-
-        # Scale the limit of the height to modify it after randomizing
-        height_limit = self.maxHeight*height_multiplier/2.0
-
-        # List of every vertex on the object
-        vertices = cmds.ls(self.gridObject + ".vtx[*]", flatten=True)
-
-        # Number of vertices that are going to be modified.
-        # We add 2 to at least modify 2 vertices
-        vertices_to_edit = int(self.maxPoints * points_multiplier + 2)
+        # The preview changes the terrain that a background job would write on
+        self.jobs.cancel()
 
-        logger.debug("About to edit: {} vertices".format(vertices_to_edit))
+        seed, random_generator = self.preview_random()
 
-        # Number of sections to divide the terrain
-        # These sections are used to better distribute the deformed vertices
-        # If there are not enough vertices, use all of them individually
-        section_amount = 8 if vertices_to_edit >= 8 else vertices_to_edit
+        # Deleting the previous step is undone with the new one
+        with self.terrainGenerator.backend.batch("Preview Terrain"):
+            self.delete_preview()
 
-        # The size that each section should have
-        section_size = len(vertices)/section_amount
+            # Same random soft selection moves for every step, without seeding the random module of Maya
+            self.generate_terrain(subdivisions, seed, "Preview Terrain", random_generator)
+        self.previewTerrain = self.terrainGenerator.terrainRoot
 
-        # Create a list from index i until the section is full
-        # Do that from index 0 in vertices to the end of the list,
-        # skipping the number of elements of the section
-        vertex_sections = [vertices[i:i + section_size]
-                           for i in range(0, len(vertices), section_size)]
-
-        # Fill a list with numbers from 0 to the number of sections in that the grid is divided
-        grid_indexes = [i for i in range(0, section_amount)]
-
-        # Shuffle that so the grids are chosen in a random order
-        shuffle(grid_indexes)
-
-        # Loop with through a set number of vertices
-        for v in range(vertices_to_edit):
-            # Enable soft selection to move smoothly
-            cmds.softSelect(sse=True,
-                            ssd=self.softSelectRadius*radius_multiplier,
-                            ssc=choice(self.curves))
-
-            # Select a random vertex on the grid
-            grid_index = v % section_amount
-
-            cmds.select(choice(vertex_sections[grid_indexes[grid_index]]))
-
-            # Randomize movement on that vertex
-            random_y = rand(-height_limit, height_limit)
-
-            # Add variation so the range doesn't start in 0
-            random_y = random_y + height_limit if random_y >= 0 else random_y - height_limit
-
-            # Apply movement
-            cmds.move(0, random_y, 0, r=True)
-
-        # Disable softSelection to avoid errors in other functions
-        cmds.softSelect(sse=False)
-
-        # Soften edges
-        cmds.polySoftEdge(self.gridObject, a=180, ch=1)
-
-    def value_noise(self):
+    def build_final_preview(self, subdivisions):
         """
-        This function modifies the grid by using an implementation of value Noise
+        This function builds the full resolution of the preview, its heights are computed in the background when
+        Run In Background is enabled so the job can be cancelled
+        Parameters:
+            subdivisions (int): Amount of subdivisions of the terrain
         """
-        logger.debug("Starting deformation with value noise")
-
-        if not self.check_terrain():
+        if not self.in_background():
+            self.build_preview(subdivisions)
             return
 
-        # Disable softSelection to avoid errors in other functions
-        cmds.softSelect(sse=False)
-
-        self.noise_seed = rand(0, 1)*10000
-
-        logger.debug("Random seed is: {}".format(self.noise_seed))
-
-        # List of every vertex on the object
-        vertices = cmds.ls(self.gridObject + ".vtx[*]", flatten=True)
-
-        # Multiplier to scale deformation according to the selected size.
-        height_multiplier = self.gridDimensions / 100.0
-
-        # Set the max Y value for the points.
-        # Multiply by 3 because this generates smaller values than soft selection
-        height_limit = self.maxHeight * height_multiplier * 3.0
-
-        # Nested for loops to get "coordinates" of each vertex
-        for x in range(0, self.gridSubdivisions + 1):
-            for y in range(0, self.gridSubdivisions + 1):
-
-                # Normalize x and y coordinates to fit range 0-1
-                normalized_x = x*1.0 / self.gridSubdivisions
-                normalized_y = y*1.0 / self.gridSubdivisions
-
-                # Store evaluated noise from each coordinate multiplied by a scale
-                # Add octaves together and return to 0 to 1 range
-                value = smooth_noise(normalized_x * 4.0, normalized_y * 4.0, self.noise_seed)
-                value += smooth_noise(normalized_x * 8.0, normalized_y * 8.0, self.noise_seed) * .5
-                value += smooth_noise(normalized_x * 16.0, normalized_y * 16.0, self.noise_seed) * .25
-                value += smooth_noise(normalized_x * 32.0, normalized_y * 32.0, self.noise_seed) * .125
-                value /= (1 + .5 + .25 + .125)
-
-                # Calculate vertex index on the object using x and y
-                index = x * (self.gridSubdivisions+1) + y
-
-                # Move the vertex on Y with the noise value
-                cmds.move(0, value * height_limit, 0, vertices[index], r=True)
-
-    def create_rocks(self, rocks_name, rocks_amount, mat_name, color, normal, hue, brightness_range, saturation_range):
+        generator = self.terrainGenerator
+        seed, random_generator = self.preview_random()
+        deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
+        terrain = {"grid_name": self.valueDictionary[self.terrainName],
+                   "dimensions": self.valueDictionary[self.dimensionSlider],
+                   "subdivisions": subdivisions,
+                   "tiles": self.valueDictionary[self.tilesField]}
+
+        # The same values that generate_terrain would use for this step
+        generator_random = generator.randomGenerator
+        generator.randomGenerator = random_generator
+        try:
+            self.update_deformation_settings()
+            generator.seed = seed
+            parameters, settings = generator.terrain_settings(deformation_index, terrain["dimensions"],
+                                                              subdivisions, terrain["tiles"])
+        finally:
+            generator.randomGenerator = generator_random
+
+        self.previewJob = self.start_job("Preview Terrain",
+                                         lambda job: compute_heights(settings, replace=True, progress=job.report),
+                                         lambda heightfield: self.finish_preview(heightfield, parameters, terrain))
+
+    def finish_preview(self, heightfield, parameters, terrain):
         """
-        This function creates certain amount of rocks with a set name
-            Parameters:
-                rocks_name: The name that rocks will have
-                rocks_amount: The amount of rocks that are going to be generated
-                mat_name: The name for Rocks' Blinn
-                color: Color map used by the Blinn
-                normal: Normal map used
-                hue: The hue selected for the rocks to use in the ambient color
-                brightness_range: range given by the user to set the ambient color
-
+        This function replaces the preview terrain with the full resolution computed in the background
+        Parameters:
+            heightfield (numpy.ndarray): Height of every vertex of the whole terrain
+            parameters (dict): Values used to compute the heights
+            terrain (dict): Arguments of create_terrain
         """
-        if logger.level == logging.DEBUG:
-            start_time = time.time()
-
-        # Disable softSelection to avoid errors in other functions
-        cmds.softSelect(sse=False)
-
-        # Get a percentage of the size compared to original rock
-        size_multiplier = self.gridDimensions/100.0
-
-        # Assign a group name based on the name selected
-        rocks_group = rocks_name + "_grp"
+        with self.terrainGenerator.backend.batch("Preview Terrain"):
+            self.delete_preview()
+            self.finish_terrain(heightfield, parameters, self.valueDictionary[self.inPlaceCheck], terrain)
+        self.previewTerrain = self.terrainGenerator.terrainRoot
 
-        # Variable used in for loop to check if there is an existing terrain
-        terrain_verification = 1
-
-        # Assign material
-        material = create_material(mat_name, color, normal)
-        switch_node = cmds.shadingNode("tripleShadingSwitch", asUtility=True)
-        cmds.connectAttr("%s.output" % switch_node, "%s.ambientColor" % material)
-
-        # Rock creation
-        for i in range(rocks_amount):
-            # Set new radius using the multiplier
-            sphere_radius = self.sphereStartRadius*size_multiplier
-
-            # Create sphere as base for rocks
-            new_sphere = cmds.polySphere(name=rocks_name, radius=sphere_radius,
-                                         subdivisionsAxis=20, subdivisionsHeight=20)
-
-            # Deform newly created sphere
-            self.deform_rock(new_sphere[0], sphere_radius)
-
-            # Disable softSelection to avoid errors in other functions
-            cmds.softSelect(sse=False)
-
-            # Select sphere again
-            cmds.select(new_sphere)
-
-            # Variations to scale
-            random_scale_x = rand(.2, 1)
-            random_scale_y = random_scale_x + rand(-.1, .1)  # Small variations on other axes
-            random_scale_z = random_scale_x + rand(-.1, .1)  # Small variations on other axes
-
-            # Scale using variables
-            cmds.scale(random_scale_x, random_scale_y, random_scale_z)
-
-            # Freeze transformations
-            cmds.makeIdentity(apply=True)
+    def preview_random(self):
+        """
+        This function returns the seed and the random values shared by every step of the preview
+        Returns:
+            seed (int): Seed of the deformation, the Noise Seed field or the seed chosen for the preview
+            random_generator (random.Random): Source of the random values of the step
+        """
+        if self.previewSeed is None:
+            self.previewSeed = self.valueDictionary[self.seedField] or random.randint(1, MAX_NOISE_SEED)
 
-            # Random numbers locations based on terrain size
-            random_position_x = rand(-self.gridDimensions / 2, self.gridDimensions / 2)
-            random_position_z = rand(-self.gridDimensions / 2, self.gridDimensions / 2)
+        return self.valueDictionary[self.seedField] or self.previewSeed, random.Random(self.previewSeed)
 
-            # Move sphere inside range defined by terrain
-            cmds.move(random_position_x, 0, random_position_z)
+    def delete_preview(self):
+        """
+        This function deletes the terrain built by the last step of the preview, if it is still the current one
+        """
+        if self.previewTerrain and self.terrainGenerator.terrainRoot == self.previewTerrain:
+            self.terrainGenerator.delete_terrain()
 
-            # Try to snap rocks to terrain only if there is a terrain
-            if terrain_verification > 0:
-                try:
-                    # Select actual terrain
-                    cmds.select(self.gridObject, new_sphere)
+    def just_deform(self, *args):
+        """
+        This function modifies an existing terrain using the Generator object
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements
+        """
+        logger.debug("Just deform Terrain")
 
-                    # Constraint to Terrain's Geometry
-                    cmds.geometryConstraint(weight=True)
+        # Execute deformation
+        deformation_index = self.deformOptions.index(self.valueDictionary[self.methodField])
 
-                    # Constraint to Terrain's normals to make rocks point the right direction
-                    cmds.normalConstraint(weight=True, aimVector=(0, 1, 0), upVector=(1, 0, 0), worldUpType=0)
+        self.update_deformation_settings()
 
-                    # Delete constraints
-                    cmds.delete(cmds.listRelatives(new_sphere, children=True)[1:])
+        if self.in_background():
+            generator = self.terrainGenerator
+            if not generator.check_terrain() or (deformation_index == 2 and not generator.check_heightmap()):
+                return
 
-                except ValueError:
-                    logger.warn("No terrain was previously created, or got deleted. Spawning rocks randomly...")
-                    terrain_verification -= 1
+            # The heights are read now, the scene can change while the new ones are computed
+            base = generator.terrain_heightfield()[0]
+            parameters = generator.deformation_parameters(deformation_index)
+            settings = generator.heights_settings(parameters)
+            replace = self.valueDictionary[self.inPlaceCheck]
 
-            # Try to select the group, if its not possible, then create it
-            try:
-                cmds.select(new_sphere, rocks_group)
-            except ValueError:
-                cmds.group(name=rocks_group, empty=True)
-                cmds.select(new_sphere, rocks_group)
+            self.start_job("Deform Terrain",
+                           lambda job: compute_heights(settings, base, replace, job.report),
+                           lambda heightfield: self.finish_terrain(heightfield, parameters, replace))
+        elif self.valueDictionary[self.inPlaceCheck]:
+            self.terrainGenerator.redeform_terrain(deformation_index)
+        else:
+            self.terrainGenerator.deform_terrain(deformation_index)
 
-            # Parent rocks to group and save rock's new name
-            actual_rock = cmds.parent()
+    def update_deformation_settings(self):
+        """
+        This function sends the deformation options of the UI to the Generator object
+        """
+        self.terrainGenerator.analyticSoftSelect = self.valueDictionary[self.analyticCheck]
+        self.terrainGenerator.workers = self.valueDictionary[self.workersSlider]
+        self.terrainGenerator.lodLevels = self.valueDictionary[self.lodSlider]
+        self.terrainGenerator.seed = self.valueDictionary[self.seedField] or None
+        self.terrainGenerator.heightmapPath = self.valueDictionary[self.heightmapField]
+        self.terrainGenerator.maxHeight = self.valueDictionary[self.heightSlider]
+        self.terrainGenerator.noiseType = self.valueDictionary[self.noiseTypeField]
+        self.terrainGenerator.noiseOctaves = self.valueDictionary[self.octavesSlider]
+        self.terrainGenerator.noiseLacunarity = self.valueDictionary[self.lacunaritySlider]
+        self.terrainGenerator.noisePersistence = self.valueDictionary[self.persistenceSlider]
+        self.terrainGenerator.noiseScale = self.valueDictionary[self.noiseScaleSlider]
+        self.terrainGenerator.noiseInterpolation = self.valueDictionary[self.interpolationField]
+        self.terrainGenerator.erosionMode = self.valueDictionary[self.erosionField]
+        self.terrainGenerator.erosionIterations = self.valueDictionary[self.erosionIterationsSlider]
+        self.terrainGenerator.erosionTalus = self.valueDictionary[self.talusSlider]
 
-            # Connect shape to switch Node
-            sphere_shape = cmds.listRelatives(actual_rock[0], shapes=True)[0]
-            cmds.connectAttr("%s.instObjGroups[0]" % sphere_shape, "%s.input[%i].inShape" % (switch_node, i))
+    def create_rocks(self, *args):
+        """
+        This function creates random rocks using the Generator object
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements
+        """
+        logger.debug("Bring the rocks!")
 
-            # Create color nodes
-            random_brightness = rand(brightness_range[0], brightness_range[1])
-            random_saturation = rand(saturation_range[0], saturation_range[1])
-            color = colorsys.hsv_to_rgb(hue/360.0, random_saturation, random_brightness*1.0)
-            logger.debug("HUE is {}".format(hue))
-            logger.debug("Rock is having {} color".format(color))
-            color_node = cmds.shadingNode("colorConstant", asUtility=True)
-            cmds.setAttr("%s.inColor" % color_node, color[0], color[1], color[2], type="double3")
-            cmds.connectAttr("%s.outColor" % color_node, "%s.input[%i].inTriple" % (switch_node, i))
+        self.terrainGenerator.rockPrototypes = self.valueDictionary[self.prototypeSlider]
+        self.terrainGenerator.rockScatter = self.valueDictionary[self.scatterField]
+        self.terrainGenerator.rockSpacing = self.valueDictionary[self.spacingSlider]
+        self.terrainGenerator.rockDensityMask = self.valueDictionary[self.densityField]
+        self.terrainGenerator.rockColorMode = self.valueDictionary[self.colorModeField]
+        self.terrainGenerator.rockPaletteSize = self.valueDictionary[self.paletteSlider]
+        self.terrainGenerator.analyticSoftSelect = self.valueDictionary[self.analyticCheck]
+
+        generator = self.terrainGenerator
+        rocks_amount = self.valueDictionary[self.rockSlider]
+        hue = self.valueDictionary[self.colorSlider]
+        brightness_range = (self.valueDictionary[self.minBrightness], self.valueDictionary[self.maxBrightness])
+        saturation_range = (self.valueDictionary[self.minSaturation], self.valueDictionary[self.maxSaturation])
+
+        def create(layout=None):
+            generator.create_rocks(self.valueDictionary[self.rocksName], rocks_amount,
+                                   self.valueDictionary[self.rocksShaderName],
+                                   self.valueDictionary[self.rocksColorIcon],
+                                   self.valueDictionary[self.rocksNormalIcon],
+                                   hue, brightness_range, saturation_range, layout)
+
+        if not self.valueDictionary[self.backgroundCheck]:
+            create()
+            return
 
-            # Assign material to rock
-            cmds.select(actual_rock)
-            cmds.hyperShade(assign=material)
+        # The terrain and the settings are read now, the positions and colors are chosen in the background
+        heightfield, width, depth = generator.terrain_heightfield()
+        sphere_radius = generator.rock_radius()
+        settings = generator.rock_settings()
 
-        if logger.level == logging.DEBUG:
-            logger.debug("--- ROCK CREATION took: {} ---".format(time.time() - start_time))
+        self.start_job("Create Rocks",
+                       lambda job: rock_layout(settings, rocks_amount, sphere_radius, heightfield, width, depth, hue,
+                                               brightness_range, saturation_range, job.report),
+                       create)
 
-    def deform_rock(self, sphere, radius):
+    def export_heightmap(self, *args):
         """
-        This function takes a sphere with its radius and deforms it.
-            Parameters:
-                sphere (str): The sphere that is going to be modified.
-                radius (float): The radius of the sphere.
+        This function asks for a file and exports the terrain's heightmap to it
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements
         """
-        logger.debug("Deforming a rock: {}".format(sphere))
-
-        # Random radius used for soft selection
-        soft_select_radius = rand(-.1, .1) * radius
+        filename = cmds.fileDialog2(fileMode=0, caption="Export Heightmap",
+                                    fileFilter="16-bit RAW (*.r16);;16-bit PNG (*.png);;NumPy (*.npy)")
 
-        # Smooth curve used for selection
-        rock_falloff = "1,0,2,0,1,2"
-
-        # Move random range far from 0
-        # If radius was greater than 0, add 1. Else substract 1
-        soft_select_radius = (soft_select_radius + 1 * radius) \
-            if soft_select_radius >= 0 \
-            else (soft_select_radius - 1 * radius)
+        if filename:
+            self.terrainGenerator.export_heightmap(os.path.normpath(filename[0]))
 
-        # List of every vertex on the object
-        vertices = cmds.ls(sphere + ".vtx[*]", flatten=True)
+    def show_profile(self, *args):
+        """
+        This function shows the stages measured by the profiler
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements
+        """
+        cmds.scrollField(self.profileField, edit=True, text=self.terrainGenerator.profiler.report())
 
-        # Enable soft selection with generated radius
-        cmds.softSelect(sse=True,
-                        ssd=3*abs(soft_select_radius),
-                        ssc=rock_falloff)
+    def clear_profile(self, *args):
+        """
+        This function forgets the stages measured by the profiler
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements
+        """
+        self.terrainGenerator.profiler.clear()
+        self.show_profile()
 
-        # Select and scale base of sphere to create planar base
-        cmds.select(vertices[-2])
-        cmds.scale(1, .00005*radius, 1, pivot=(0, -1*radius, 0), r=True)
+    def export_profile(self, *args):
+        """
+        This function asks for a file and exports the stages measured by the profiler to it
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements
+        """
+        filename = cmds.fileDialog2(fileMode=0, caption="Export Profile", returnFilter=True,
+                                    fileFilter="Chrome Trace (*.json);;Profile JSON (*.json)")
 
-        # Change selection radius
-        cmds.softSelect(sse=True,
-                        ssd=1.5*abs(soft_select_radius),
-                        ssc=rock_falloff)
+        if filename:
+            trace_format = "json" if filename[-1].startswith("Profile") else "chrome"
+            self.terrainGenerator.profiler.export(os.path.normpath(filename[0]), trace_format)
 
-        # Select and move a vertex in the middle of the sphere
-        cmds.select(vertices[len(vertices)/2])
-        cmds.move(0.8*radius, 0, 0, r=True, cs=True, ls=True, wd=True)
+    def update_height(self, new_height):
+        """
+        This function saves the max height and updates the terrain if it was deformed in place
+        Parameters:
+            new_height (float): The max height set in the slider
+        """
+        self.update_value(new_height, self.heightSlider)
 
-        # Select and move the top of the sphere
-        cmds.select(vertices[-1])
-        cmds.move(0.4*radius, 0, 0, r=True, cs=True, ls=True, wd=True)
+        if self.valueDictionary[self.inPlaceCheck]:
+            self.terrainGenerator.rescale_terrain(new_height)
 
-        # Disable softSelection to avoid errors in other functions
-        cmds.softSelect(sse=False)
+    def update_seed(self, new_seed):
+        """
+        This function saves the noise seed and updates the terrain if it was deformed in place with Noise
+        Parameters:
+            new_seed (int): The seed set in the field, ZERO for a random one
+        """
+        self.update_value(new_seed, self.seedField)
 
-        # Move pivot down to base of the sphere
-        cmds.move(0, -.95*radius, 0, sphere + ".scalePivot", r=True)
-        cmds.move(0, -.95*radius, 0, sphere + ".rotatePivot", r=True)
+        if self.valueDictionary[self.inPlaceCheck]:
+            self.terrainGenerator.reseed_terrain(new_seed or None)
 
-    def check_terrain(self):
-        # Check if object exists, if it doesn't give warning to user
-        try:
-            if not self.gridObject:
-                logger.error("No terrain was previously created, or got deleted. Please create one before deforming.")
-                return False
-            cmds.select(self.gridObject)
-        except ValueError:
-            logger.error("No terrain was previously created, or got deleted. Please create one before deforming.")
-            return False
-
-        return True
-
-
-def create_material(name="myBlinn", color="", normal="", specular=""):
-
-    # Create blinn Node
-    my_shader = cmds.shadingNode("blinn", asShader=True)
-    my_shader = cmds.rename(my_shader, name)
-
-    logger.debug("The Color is: {}".format(color))
-
-    if color:
-        # Creating baseColor Node
-        file_node = cmds.shadingNode("file", asTexture=True)
-        filename = color
-        cmds.setAttr("%s.fileTextureName" % file_node, filename, type="string")  # Connect file to node
-        # Connect attributes to Blinn
-        cmds.connectAttr("%s.outColor" % file_node, "%s.color" % my_shader)
-
-    if normal:
-        # Creating file Node for normal Map
-        normal_node = cmds.shadingNode("file", asTexture=True, isColorManaged=True)
-        cmds.setAttr("%s.ignoreColorSpaceFileRules" % normal_node, 1)
-        filename = normal
-        cmds.setAttr("%s.fileTextureName" % normal_node, filename, type="string")  # Connect file to node
-        cmds.setAttr("%s.colorSpace" % normal_node, "Raw", type="string")
-        bump_node = cmds.shadingNode("bump2d", asUtility=True)
-        cmds.connectAttr("%s.outAlpha" % normal_node, "%s.bumpValue" % bump_node)  # Connect file to bump
-        cmds.setAttr("%s.bumpInterp" % bump_node, 1)  # Set to tangent space normals
-        # Connect attributes to Blinn
-        cmds.connectAttr("%s.outNormal" % bump_node, "%s.normalCamera" % my_shader)
-
-    if specular:
-        # Creating Nodes for specular
-        spec_node = cmds.shadingNode("file", asTexture=True, isColorManaged=True)
-        cmds.setAttr("%s.ignoreColorSpaceFileRules" % spec_node, 1)
-        filename = specular
-        cmds.setAttr("%s.fileTextureName" % spec_node, filename, type="string")  # Connect file to node
-        cmds.setAttr("%s.colorSpace" % spec_node, "Raw", type="string")
-        # Connect attributes to Blinn
-        cmds.connectAttr("%s.outColor" % spec_node, "%s.specularColor" % my_shader)
-
-    # Change ambient color attribute
-    cmds.setAttr("{}.ambientColor".format(my_shader), 0, 0, 0, type="double3")
-
-    return my_shader
-
-
-def smooth_noise(point_x, point_y, random_seed=6000):
-    """
-    This function modifies the grid by using an implementation of value Noise.
-    Utilizes sine-based noise for each point and interpolates values from adjacent points.
+    def update_heightmap(self, *args):
+        """
+        This function asks for the heightmap file used by the Heightmap method
         Parameters:
-            point_x (float): X coordinate of a point
-            point_y (float): Y coordinate of a point
-            random_seed (float): seed used to generate the values. Default to 6000
-        Returns:
-            interpolation (float): The noise value obtained for specified coordinates
-    """
-    # Getting decimal part of the local grids defined by the octaves to use for smooth step
-    # Gets numbers from 0 to 1 that repeat depending on scale used
-    local_coordinate_x = math.modf(point_x)[0]
-    local_coordinate_y = math.modf(point_y)[0]
-
-    # Smooth step for local grids
-    smooth_local_x = (local_coordinate_x**2)*(3-(2*local_coordinate_x))
-    smooth_local_y = (local_coordinate_y**2)*(3-(2*local_coordinate_y))
+            *args (list): Used to keep the information sent by the UI elements
+        """
+        filename = cmds.fileDialog2(fileMode=1, caption="Import Heightmap",
+                                    fileFilter="Heightmaps (*.r16 *.raw *.png *.npy)")
 
-    # Getting the grid ID with integer part.
-    # Get values from 0 to 4, 0 to 8, 0 to 16... depends on scale used
-    grid_id_x = math.modf(point_x)[1]
-    grid_id_y = math.modf(point_y)[1]
+        if filename:
+            the_file = os.path.normpath(filename[0])
+            cmds.textFieldButtonGrp(self.heightmapField, e=True, text=the_file)
+            self.update_value(the_file, self.heightmapField)
 
-    # Evaluate grid locations with the noise function and interpolate both corners
-    bottom_left = noise_from_coordinates(grid_id_x, grid_id_y, random_seed)
-    bottom_right = noise_from_coordinates(grid_id_x + 1, grid_id_y, random_seed)
-    bottom = linear_interpolation(bottom_left, bottom_right, smooth_local_x)
+    def update_color(self, hue, color_slider):
+        logger.debug("Hue is: {}".format(hue))
 
-    # Evaluate grid locations with the noise function and interpolate both corners
-    top_left = noise_from_coordinates(grid_id_x, grid_id_y + 1, random_seed)
-    top_right = noise_from_coordinates(grid_id_x + 1, grid_id_y + 1, random_seed)
-    top = linear_interpolation(top_left, top_right, smooth_local_x)
+        rgb = colorsys.hsv_to_rgb(hue/360.0, 1.0, 1.0)
 
-    # Calculate interpolation based on opposite corners using Y smooth step
-    interpolation = linear_interpolation(bottom, top, smooth_local_y)
+        logger.debug("RGB is: {}".format(rgb))
 
-    return interpolation
+        cmds.button("colorDisplay", edit=True, backgroundColor=rgb)
 
+        self.update_value(hue, color_slider)
 
-def noise_from_coordinates(point_x, point_y, random_seed=6000):
-    """
-    This function modifies obtains a simple noise based on sine for a given point
+    def update_icon(self, icon):
+        """
+        This function receives the name of an icon and updates its image with a selected file.
         Parameters:
-            point_x (float): X coordinate of a point
-            point_y (float): Y coordinate of a point
-            random_seed (float): seed used to generate the values. Default to 6000
-        Returns:
-            random_value (float): The value obtained for specified coordinates
-    """
-    # Get random Y from sine curve
-    random_value = math.sin(point_x*100 + point_y*random_seed)*random_seed
+            icon (str): The name that is used to reference the icon
+        """
+        map_name = icon
+        map_name = map_name[map_name.find("terrain")+len("terrain"):map_name.rfind("Icon")]
+        filename = cmds.fileDialog2(fileMode=1, caption="Import {} Map".format(map_name))
 
-    # Get only the decimal part to make it go from 0 to 1
-    random_value = math.modf(random_value)[0]
+        if filename:
+            the_file = filename and os.path.normpath(filename[0])
+            cmds.iconTextButton(icon, e=True, style="iconOnly")
+            cmds.iconTextButton(icon, e=True, image=the_file)
+        else:
+            the_file = ""
+            cmds.iconTextButton(icon, e=True, style="textOnly")
 
-    # Return random Y value
-    return random_value
+        self.update_value(the_file, icon)
 
+    def update_value(self, *args):
+        """
+        This function creates a terrain and deforms it using the Generator object
+        Parameters:
+            *args (list): Used to keep the information sent by the UI elements.
+                          First index saves the value; Second index saves UI's key to access the value.
+        """
+        logger.debug("Value has changed")
+        logger.debug("Updating value from: " + str(args[1]))
 
-def linear_interpolation(first_value, second_value, alpha):
-    return first_value * (1 - alpha) + second_value * alpha
+        # Change value that is connected to this key
+        self.valueDictionary[args[1]] = args[0]
 
+        logger.debug("New value is: " + str(self.valueDictionary[args[1]]))
 
-def cosine_interpolation(first_value, second_value, alpha):
-    interpolation = (1 - math.cos(alpha*math.pi))/2.0
-    return first_value * (1 - interpolation) + second_value * interpolation
+    def make_separator(self, height):
+        """
+        This function creates an UI separator
+        Parameters:
+            height (int): The height in pixels for this separator
+        """
+        cmds.separator(height=height)
 
 
-terrainGen = WindowCreator()
+# Only build the window inside an interactive Maya session
+if not cmds.about(batch=True):
+    terrainGen = WindowCreator()
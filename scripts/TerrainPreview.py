@@ -0,0 +1,142 @@
+import logging
+
+"""
+    Progressive preview of the Terrain Generator.
+    While a parameter changes a coarse terrain is built right away, so sliders can update the scene while they
+    are dragged. The full resolution is built afterwards in steps with more subdivisions each time, every step
+    runs when the application is idle and a new change cancels the steps that didn't run yet. The last step can
+    be built by a different function, so the heaviest one can run as a background job that can be cancelled.
+    by Daniel Orozco
+"""
+
+# Same logger used by the UI
+logger = logging.getLogger("TerrainGenerator")
+
+# Max subdivisions of the coarse preview
+PREVIEW_SUBDIVISIONS = 24
+
+# Subdivisions multiplier between a refinement step and the next one
+REFINE_FACTOR = 4
+
+
+class ProgressivePreview:
+    """
+    This is a class for previewing a terrain while its parameters change.
+        Attributes:
+            build (function): Builds the terrain, receives the amount of subdivisions.
+            buildFinal (function): Builds the full resolution, receives the amount of subdivisions.
+            schedule (function): Runs a function without parameters later, when the application is idle.
+            previewSubdivisions (int): Max subdivisions of the coarse preview.
+            refineFactor (int): Subdivisions multiplier between a refinement step and the next one.
+            version (int): Number of the last change, steps scheduled for an older change don't run.
+            subdivisions (int): Subdivisions of the last terrain built. None if nothing was built
+            pendingSteps (int): Refinement steps scheduled that didn't run yet.
+    """
+
+    def __init__(self, build, schedule, preview_subdivisions=PREVIEW_SUBDIVISIONS, refine_factor=REFINE_FACTOR,
+                 build_final=None):
+        """
+        The constructor of ProgressivePreview class
+            Parameters:
+                build (function): Builds the terrain, receives the amount of subdivisions.
+                schedule (function): Runs a function without parameters later, when the application is idle.
+                preview_subdivisions (int): Max subdivisions of the coarse preview. Default to PREVIEW_SUBDIVISIONS
+                refine_factor (int): Subdivisions multiplier between refinement steps. Default to REFINE_FACTOR
+                build_final (function): Builds the last refinement step, the full resolution. Default uses build
+        """
+        self.build = build
+        self.buildFinal = build_final if build_final is not None else build
+        self.schedule = schedule
+        self.previewSubdivisions = preview_subdivisions
+        self.refineFactor = max(refine_factor, 2)
+        self.version = 0
+        self.subdivisions = None
+        self.pendingSteps = 0
+
+    def refinement_levels(self, subdivisions):
+        """
+        This function returns the subdivisions of every step after the coarse preview, the last one is the target.
+            Parameters:
+                subdivisions (int): Subdivisions of the full resolution.
+            Returns:
+                levels (list of int): Subdivisions of each step, empty if the preview is the full resolution.
+        """
+        levels = []
+        level = min(subdivisions, self.previewSubdivisions) * self.refineFactor
+        while level < subdivisions:
+            levels.append(level)
+            level *= self.refineFactor
+
+        if subdivisions > self.previewSubdivisions:
+            levels.append(subdivisions)
+
+        return levels
+
+    def preview(self, subdivisions):
+        """
+        This function builds the coarse preview right away and cancels any refinement, used while dragging.
+            Parameters:
+                subdivisions (int): Subdivisions of the full resolution.
+        """
+        self.cancel()
+        self.run_build(min(subdivisions, self.previewSubdivisions))
+
+    def update(self, subdivisions):
+        """
+        This function builds the coarse preview right away and schedules the refinement up to the full resolution.
+            Parameters:
+                subdivisions (int): Subdivisions of the full resolution.
+        """
+        self.preview(subdivisions)
+        self.schedule_levels(self.version, self.refinement_levels(subdivisions))
+
+    def cancel(self):
+        """
+        This function stops the refinement, steps that were scheduled do nothing when they run.
+        """
+        if self.pendingSteps:
+            logger.debug("Preview refinement cancelled with {} steps left".format(self.pendingSteps))
+
+        self.version += 1
+        self.pendingSteps = 0
+
+    def schedule_levels(self, version, levels):
+        """
+        This function schedules the next refinement step.
+            Parameters:
+                version (int): Change that the step belongs to.
+                levels (list of int): Subdivisions of the steps left.
+        """
+        self.pendingSteps = len(levels)
+        if levels:
+            self.schedule(lambda: self.refine(version, levels))
+
+    def refine(self, version, levels):
+        """
+        This function runs a refinement step and schedules the next one, nothing is done if the parameters changed.
+            Parameters:
+                version (int): Change that the step belongs to.
+                levels (list of int): Subdivisions of the steps left, the first one is built now.
+        """
+        if version != self.version:
+            return
+
+        self.run_build(levels[0], self.buildFinal if len(levels) == 1 else self.build)
+
+        # The build can change the parameters again, the steps left belong to the old ones
+        if version == self.version:
+            self.schedule_levels(version, levels[1:])
+
+    def run_build(self, subdivisions, build=None):
+        """
+        This function builds the terrain with some subdivisions.
+            Parameters:
+                subdivisions (int): Subdivisions of the terrain.
+                build (function): Function that builds it. Default uses build
+        """
+        logger.debug("Building preview with {} subdivisions".format(subdivisions))
+
+        if build is None:
+            build = self.build
+        build(subdivisions)
+        self.subdivisions = subdivisions
@@ -0,0 +1,262 @@
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+import numpy as np
+from NoiseField import noise_field, DEFAULT_NOISE
+from HeightField import soft_selection_field
+from HeightmapIO import import_heightmap, guess_raw_shape
+
+"""
+    Tiled generation for the Terrain Generator.
+    A tiled terrain is a grid of tile_rows by tile_columns planes with the same dimensions and subdivisions.
+    Every tile samples the global coordinates of the whole terrain, so the borders shared by two tiles match.
+    Tiles can be computed by a pool of processes, every tile depends only on its coordinates so the results
+    are the same for any amount of workers.
+    by Daniel Orozco
+"""
+
+
+def tile_origin(tile_row, tile_column, tile_rows, tile_columns, dimensions):
+    """
+    This function returns the position of the center of a tile, with the whole terrain centered in the origin.
+    Rows go from positive to negative Z and columns from negative to positive X, like the vertices of a plane.
+        Parameters:
+            tile_row (int): Row of the tile.
+            tile_column (int): Column of the tile.
+            tile_rows (int): Amount of rows of tiles.
+            tile_columns (int): Amount of columns of tiles.
+            dimensions (float): Width and height of each tile.
+        Returns:
+            position (tuple of float): Position in X, Y and Z.
+    """
+    position_x = (tile_column - (tile_columns - 1) / 2.0) * dimensions
+    position_z = -(tile_row - (tile_rows - 1) / 2.0) * dimensions
+
+    return position_x, 0, position_z
+
+
+def tile_heightfield(deformation_method, tile_row, tile_column, subdivisions, dimensions,
+                     seed=6000, height_limit=1.0, bumps=(), heightmap=None, tiles=(1, 1), noise=None):
+    """
+    This function computes the displacement of a single tile.
+        Parameters:
+            deformation_method (int): 0 for Random Soft Select, 1 for Noise, 2 for Heightmap.
+            tile_row (int): Row of the tile.
+            tile_column (int): Column of the tile.
+            subdivisions (int): Amount of subdivisions of each tile.
+            dimensions (float): Width and height of each tile.
+            seed (float): Seed used by the noise.
+            height_limit (float): Max height of the noise.
+            bumps (list of (int, int, float, float, str)): Global soft selection moves used by Random Soft Select.
+            heightmap (str): Path of the heightmap file used by Heightmap.
+            tiles (tuple of int): Rows and columns of tiles, the heightmap covers all of them.
+            noise (dict): Settings of noise_field used by Noise. Default uses DEFAULT_NOISE
+        Returns:
+            heightfield (numpy.ndarray): Displacement in Y of every vertex of the tile.
+    """
+    # Global index of the first vertex of this tile, the last vertex is shared with the next tile
+    row_offset = tile_row * subdivisions
+    column_offset = tile_column * subdivisions
+
+    if deformation_method == 0:
+        return soft_selection_field(subdivisions, dimensions, bumps, row_offset, column_offset)
+
+    if deformation_method == 2:
+        total_rows, total_columns = tiles[0] * subdivisions + 1, tiles[1] * subdivisions + 1
+        return import_heightmap(heightmap, subdivisions + 1, subdivisions + 1, row_offset, column_offset,
+                                total_rows, total_columns,
+                                guess_raw_shape(heightmap, total_rows, total_columns)) * height_limit
+
+    return noise_field(subdivisions, seed, noise, row_offset, column_offset) * height_limit
+
+
+def tile_parameters(deformation_method, tile_row, tile_column, subdivisions, dimensions, seed=6000, bumps=(),
+                    heightmap=None, tiles=(1, 1), noise=None):
+    """
+    This function returns every value that changes the heightfield of a tile before scaling its height.
+    These are used as key to cache the heightfields, a single grid is the tile 0, 0.
+        Parameters:
+            Same as tile_heightfield.
+        Returns:
+            parameters (dict): The values that identify the heightfield.
+    """
+    parameters = {"method": deformation_method, "tile": [tile_row, tile_column], "subdivisions": subdivisions}
+
+    # Noise doesn't depend on the size of the grid
+    if deformation_method == 0:
+        parameters["dimensions"] = dimensions
+        parameters["bumps"] = [list(bump) for bump in bumps]
+    elif deformation_method == 2:
+        # A heightmap that gets overwritten changes its modification time and size
+        parameters["heightmap"] = [os.path.abspath(heightmap), os.path.getmtime(heightmap),
+                                   os.path.getsize(heightmap)]
+        parameters["tiles"] = list(tiles)
+    else:
+        parameters["seed"] = seed
+        parameters["noise"] = dict(DEFAULT_NOISE, **(noise or {}))
+
+    return parameters
+
+
+def iter_tile_heightfields(deformation_method, tile_rows, tile_columns, subdivisions, dimensions,
+                           seed=6000, height_limit=1.0, bumps=(), workers=1, cache=None, heightmap=None, noise=None):
+    """
+    This function computes the tiles one by one, so only a few heightfields have to be kept in memory at a time.
+        Parameters:
+            deformation_method (int): 0 for Random Soft Select, 1 for Noise, 2 for Heightmap.
+            tile_rows (int): Amount of rows of tiles.
+            tile_columns (int): Amount of columns of tiles.
+            subdivisions (int): Amount of subdivisions of each tile.
+            dimensions (float): Width and height of each tile.
+            seed (float): Seed used by the noise.
+            height_limit (float): Max height of the noise.
+            bumps (list of (int, int, float, float, str)): Global soft selection moves used by Random Soft Select.
+            workers (int): Amount of processes used to compute the tiles. Default computes them in this process
+            cache (HeightfieldCache): Cache used to skip tiles that were already computed. Default disables it
+            heightmap (str): Path of the heightmap file used by Heightmap.
+            noise (dict): Settings of noise_field used by Noise. Default uses DEFAULT_NOISE
+        Yields:
+            tile (tuple of (int, int, numpy.ndarray)): Row, column and heightfield of each tile.
+                                                       The order is not guaranteed when using several workers.
+    """
+    missing_tiles = []
+
+    for tile_row in range(tile_rows):
+        for tile_column in range(tile_columns):
+            heightfield = None
+            if cache is not None:
+                heightfield = cache.get(cache.make_key(tile_parameters(deformation_method, tile_row, tile_column,
+                                                                       subdivisions, dimensions, seed, bumps,
+                                                                       heightmap, (tile_rows, tile_columns),
+                                                                       noise)))
+
+            if heightfield is None:
+                missing_tiles.append((tile_row, tile_column))
+            else:
+                yield tile_row, tile_column, heightfield * height_limit
+
+    # Heightfields are computed without scaling so the cache can be used for any height
+    if workers > 1 and len(missing_tiles) > 1:
+        computed_tiles = iter_tile_heightfields_parallel(deformation_method, missing_tiles, subdivisions, dimensions,
+                                                         seed, bumps, workers, heightmap, (tile_rows, tile_columns),
+                                                         noise)
+    else:
+        computed_tiles = ((tile_row, tile_column, tile_heightfield(deformation_method, tile_row, tile_column,
+                                                                   subdivisions, dimensions, seed, 1.0, bumps,
+                                                                   heightmap, (tile_rows, tile_columns), noise))
+                          for tile_row, tile_column in missing_tiles)
+
+    for tile_row, tile_column, heightfield in computed_tiles:
+        if cache is not None:
+            heightfield = cache.put(cache.make_key(tile_parameters(deformation_method, tile_row, tile_column,
+                                                                   subdivisions, dimensions, seed, bumps,
+                                                                   heightmap, (tile_rows, tile_columns), noise)),
+                                    heightfield)
+
+        yield tile_row, tile_column, heightfield * height_limit
+
+
+def iter_tile_heightfields_parallel(deformation_method, tiles, subdivisions, dimensions, seed=6000, bumps=(),
+                                    workers=2, heightmap=None, tile_count=(1, 1), noise=None):
+    """
+    This function computes the tiles with a pool of processes.
+    Workers write the heightfields into blocks of shared memory that are reused, there are two blocks per worker
+    so memory is bounded by the amount of workers and not by the amount of tiles.
+        Parameters:
+            deformation_method (int): 0 for Random Soft Select, 1 for Noise, 2 for Heightmap.
+            tiles (list of (int, int)): Row and column of every tile to compute.
+            subdivisions (int): Amount of subdivisions of each tile.
+            dimensions (float): Width and height of each tile.
+            seed (float): Seed used by the noise.
+            bumps (list of (int, int, float, float, str)): Global soft selection moves used by Random Soft Select.
+            workers (int): Amount of processes used to compute the tiles.
+            heightmap (str): Path of the heightmap file used by Heightmap.
+            tile_count (tuple of int): Rows and columns of tiles of the whole terrain.
+            noise (dict): Settings of noise_field used by Noise. Default uses DEFAULT_NOISE
+        Yields:
+            tile (tuple of (int, int, numpy.ndarray)): Row, column and heightfield of each tile as they finish,
+                                                       without scaling the height.
+    """
+    shape = (subdivisions + 1, subdivisions + 1)
+
+    # Blocks of shared memory where the workers write the heightfields
+    blocks = [shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(np.float64).itemsize)
+              for _ in range(min(workers * 2, len(tiles)))]
+    free_blocks = list(range(len(blocks)))
+    tiles = iter(tiles)
+
+    # Tile that is being computed by each future
+    pending = {}
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+            while True:
+                # Keep every free block busy
+                for tile_row, tile_column in tiles:
+                    block = free_blocks.pop()
+                    future = executor.submit(write_tile_heightfield, blocks[block].name, deformation_method,
+                                             tile_row, tile_column, subdivisions, dimensions, seed, 1.0, bumps,
+                                             heightmap, tile_count, noise)
+                    pending[future] = (block, tile_row, tile_column)
+                    if not free_blocks:
+                        break
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    block, tile_row, tile_column = pending.pop(future)
+
+                    # Raise errors from the worker
+                    future.result()
+
+                    # Copy the heightfield so the block can be used by the next tile
+                    heightfield = np.ndarray(shape, dtype=np.float64, buffer=blocks[block].buf).copy()
+                    free_blocks.append(block)
+
+                    yield tile_row, tile_column, heightfield
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def write_tile_heightfield(block_name, deformation_method, tile_row, tile_column, subdivisions, dimensions,
+                           seed, height_limit, bumps, heightmap=None, tiles=(1, 1), noise=None):
+    """
+    This function runs in the workers, it computes a tile and writes it in a block of shared memory.
+        Parameters:
+            block_name (str): Name of the block of shared memory.
+            Other parameters are the same as tile_heightfield.
+    """
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        heightfield = np.ndarray((subdivisions + 1, subdivisions + 1), dtype=np.float64, buffer=block.buf)
+        heightfield[:] = tile_heightfield(deformation_method, tile_row, tile_column, subdivisions, dimensions,
+                                          seed, height_limit, bumps, heightmap, tiles, noise)
+
+        # The view has to be released before closing the block
+        del heightfield
+    finally:
+        block.close()
+
+
+def pool_context():
+    """
+    This function returns the multiprocessing context used by the pool.
+    Processes are spawned instead of forked, inside Maya they are started with mayapy instead of the Maya executable.
+        Returns:
+            context (multiprocessing.context.SpawnContext): The context used to start the workers.
+    """
+    context = multiprocessing.get_context("spawn")
+
+    executable_name = os.path.basename(sys.executable).lower()
+    if executable_name.startswith("maya") and not executable_name.startswith("mayapy"):
+        context.set_executable(os.path.join(os.path.dirname(sys.executable),
+                                            "mayapy.exe" if executable_name.endswith(".exe") else "mayapy"))
+
+    return context
@@ -0,0 +1,8 @@
+import os
+import sys
+
+"""
+    The modules of the Terrain Generator are plain files in scripts, the folder that Maya adds to the path.
+"""
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
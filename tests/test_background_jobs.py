@@ -0,0 +1,117 @@
+import queue
+import threading
+from BackgroundJobs import JobRunner
+
+
+class MainThread:
+    """
+    Keeps the functions dispatched by the worker thread until the test runs them.
+    """
+
+    def __init__(self):
+        self.functions = queue.Queue()
+        self.finished = []
+        self.progress = []
+
+    def dispatch(self, function):
+        self.functions.put(function)
+
+    def runner(self):
+        return JobRunner(self.dispatch, lambda name, fraction: self.progress.append((name, fraction)),
+                         lambda name, state: self.finished.append((name, state)))
+
+    def run_until_finished(self, amount=1):
+        while len(self.finished) < amount:
+            self.functions.get(timeout=10)()
+
+
+def test_finished_jobs_apply_their_result():
+    main = MainThread()
+    runner = main.runner()
+    applied = []
+
+    def compute(job):
+        for done in range(5):
+            job.report(done, 4)
+        return 42
+
+    runner.submit("Create Terrain", compute, applied.append, lambda: applied.append("cleanup"))
+    main.run_until_finished()
+
+    assert applied == [42]
+    assert main.finished == [("Create Terrain", "Done")]
+    assert main.progress[-1] == ("Create Terrain", 1.0)
+    assert not runner.busy
+
+
+def test_cancelled_jobs_clean_up_instead_of_applying():
+    main = MainThread()
+    runner = main.runner()
+    started = threading.Event()
+    calls = []
+
+    def compute(job):
+        started.set()
+        while True:
+            job.report(0.5)
+
+    runner.submit("Create Terrain", compute, lambda result: calls.append("apply"), lambda: calls.append("cleanup"))
+    started.wait(10)
+    runner.cancel()
+    main.run_until_finished()
+
+    assert calls == ["cleanup"]
+    assert main.finished == [("Create Terrain", "Cancelled")]
+    assert not runner.busy
+
+
+def test_a_new_job_cancels_the_running_one():
+    main = MainThread()
+    runner = main.runner()
+    started = threading.Event()
+    calls = []
+
+    def slow(job):
+        started.set()
+        while True:
+            job.report(0.5)
+
+    runner.submit("First", slow, lambda result: calls.append("apply first"), lambda: calls.append("cleanup first"))
+    started.wait(10)
+    runner.submit("Second", lambda job: 2, lambda result: calls.append(result))
+    main.run_until_finished(2)
+
+    assert calls == ["cleanup first", 2]
+    assert main.finished == [("First", "Cancelled"), ("Second", "Done")]
+
+
+def test_jobs_cancelled_after_computing_are_not_applied():
+    main = MainThread()
+    runner = main.runner()
+    calls = []
+
+    job = runner.submit("Create Rocks", lambda job: 1, lambda result: calls.append("apply"),
+                        lambda: calls.append("cleanup"))
+
+    # The result is waiting for the main thread when the job is cancelled
+    function = main.functions.get(timeout=10)
+    job.cancel()
+    function()
+
+    assert calls == ["cleanup"]
+    assert main.finished == [("Create Rocks", "Cancelled")]
+
+
+def test_failed_jobs_clean_up():
+    main = MainThread()
+    runner = main.runner()
+    calls = []
+
+    def compute(job):
+        raise RuntimeError("broken heightmap")
+
+    runner.submit("Deform Terrain", compute, lambda result: calls.append("apply"), lambda: calls.append("cleanup"))
+    main.run_until_finished()
+
+    assert calls == ["cleanup"]
+    assert main.finished == [("Deform Terrain", "Failed")]
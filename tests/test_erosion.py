@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from Erosion import erode_heightfield, erosion_steps, DEFAULT_EROSION
+from TerrainCore import compute_heights
+from NoiseField import noise_field
+from test_terrain_core import recording_generator, SEED, DIMENSIONS, SUBDIVISIONS
+
+
+def terrain(subdivisions=99):
+    return noise_field(subdivisions, 4721.5, {"type": "Perlin"}) * 40.0
+
+
+@pytest.mark.parametrize("mode", ["Thermal", "Hydraulic", "Both"])
+def test_erosion_conserves_the_material(mode):
+    heightfield = terrain()
+    eroded = erode_heightfield(heightfield, erosion={"mode": mode, "iterations": 30})
+
+    assert not np.allclose(eroded, heightfield)
+    assert abs(eroded.sum() - heightfield.sum()) < 1e-4 * np.abs(heightfield).sum()
+
+
+def test_thermal_erosion_lowers_the_steep_slopes():
+    heightfield = terrain()
+    eroded = erode_heightfield(heightfield, erosion={"mode": "Thermal", "iterations": 30, "talus": 0.5})
+
+    assert np.abs(np.diff(eroded, axis=0)).max() < np.abs(np.diff(heightfield, axis=0)).max()
+
+
+def test_no_erosion_keeps_the_heightfield():
+    heightfield = terrain()
+
+    assert np.allclose(erode_heightfield(heightfield, erosion={"mode": "None", "iterations": 30}), heightfield)
+
+
+@pytest.mark.parametrize("mode", ["Thermal", "Hydraulic", "Both"])
+def test_tiled_erosion_matches_the_whole_heightfield(mode):
+    heightfield = terrain()
+    erosion = {"mode": mode, "iterations": 20}
+
+    whole = erode_heightfield(heightfield, erosion=erosion)
+    tiled = erode_heightfield(heightfield, erosion=erosion, workers=3, tile_size=32)
+
+    assert np.array_equal(tiled, whole)
+
+
+@pytest.mark.parametrize("mode", ["Thermal", "Hydraulic", "Both"])
+def test_reused_buffers_match_new_ones(mode):
+    heightfield = terrain()
+    steps = erosion_steps(mode)
+    settings = dict(DEFAULT_EROSION, cellSize=1.0, rain=0.5)
+    reused = dict((name, np.array(heightfield, dtype=np.float32) if name == "heights" else
+                   np.zeros(heightfield.shape, dtype=np.float32)) for name in ("heights", "water", "sediment"))
+    fresh = dict((name, values.copy()) for name, values in reused.items())
+
+    buffers = {}
+    for _ in range(5):
+        for step in steps:
+            step(reused, settings, buffers)
+            step(fresh, settings, {})
+
+    assert all(np.array_equal(reused[name], fresh[name]) for name in reused)
+
+
+def test_deforming_right_away_runs_every_iteration():
+    heights = []
+    for iterations in (4, 400):
+        generator = recording_generator()
+        generator.seed = SEED
+        generator.erosionMode = "Both"
+        generator.erosionIterations = iterations
+        generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+        settings = generator.heights_settings(generator.deformation_parameters(1))
+        generator.deform_terrain(1)
+        heights.append(generator.backend.get_points("terrain")[:, 1])
+
+        # The same heights as the ones computed in the background
+        assert np.array_equal(heights[-1], compute_heights(settings, replace=True).ravel())
+
+    assert not np.array_equal(heights[0], heights[1])
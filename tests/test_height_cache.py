@@ -0,0 +1,107 @@
+import os
+import threading
+import numpy as np
+from HeightCache import HeightfieldCache, CACHE_VERSION
+import HeightCache
+
+HEIGHTFIELD_BYTES = 10 * 10 * 8
+
+
+def heightfield(value):
+    return np.full((10, 10), float(value))
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = HeightfieldCache(max_bytes=2 * HEIGHTFIELD_BYTES, cache_directory=None)
+    cache.put("a", heightfield(1))
+    cache.put("b", heightfield(2))
+
+    # Reading a marks b as the least recently used one
+    assert cache.get("a")[0, 0] == 1.0
+    cache.put("c", heightfield(3))
+
+    assert list(cache.memoryEntries) == ["a", "c"]
+    assert cache.memoryBytes == 2 * HEIGHTFIELD_BYTES
+    assert cache.get("b") is None
+
+
+def test_evicted_heightfields_are_read_from_disk(tmp_path):
+    cache = HeightfieldCache(max_bytes=HEIGHTFIELD_BYTES, cache_directory=str(tmp_path))
+    cache.put("a", heightfield(1))
+    cache.put("b", heightfield(2))
+
+    assert list(cache.memoryEntries) == ["b"]
+    assert os.path.exists(cache.disk_path("a"))
+    assert np.array_equal(cache.get("a"), heightfield(1))
+
+
+def test_get_or_compute_computes_once():
+    cache = HeightfieldCache(cache_directory=None)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return heightfield(len(calls))
+
+    first = cache.get_or_compute({"seed": 1}, compute)
+    second = cache.get_or_compute({"seed": 1}, compute)
+
+    assert len(calls) == 1
+    assert second is first
+    assert not first.flags.writeable
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_tier_keeps_the_most_recent_files(tmp_path):
+    cache = HeightfieldCache(cache_directory=str(tmp_path))
+    for index, key in enumerate("abcd"):
+        cache.spill(key, heightfield(index))
+        os.utime(cache.disk_path(key), (index, index))
+    file_bytes = os.path.getsize(cache.disk_path("a"))
+
+    # Reading a file marks it as recently used
+    cache.get("a")
+    cache.maxDiskBytes = 2 * file_bytes
+    cache.trim_disk()
+
+    assert sorted(name for name in os.listdir(str(tmp_path))) == ["a.npy", "d.npy"]
+
+
+def test_keys_change_with_the_version(monkeypatch):
+    key = HeightfieldCache.make_key({"seed": 1})
+
+    monkeypatch.setattr(HeightCache, "CACHE_VERSION", CACHE_VERSION + 1)
+    assert HeightfieldCache.make_key({"seed": 1}) != key
+
+
+def test_heightfields_that_are_not_stored_are_always_computed():
+    cache = HeightfieldCache(cache_directory=None)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return heightfield(len(calls))
+
+    cache.get_or_compute({"seed": None}, compute, store=False)
+    cache.get_or_compute({"seed": None}, compute, store=False)
+
+    assert len(calls) == 2
+    assert not cache.memoryEntries
+
+
+def test_threads_share_the_cache():
+    cache = HeightfieldCache(max_bytes=8 * 100 * 10, cache_directory=None)
+
+    def fill(offset):
+        for index in range(200):
+            cache.get_or_compute({"tile": (offset + index) % 50}, lambda: np.full(100, float(index)))
+
+    threads = [threading.Thread(target=fill, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache.memoryEntries) == 10
+    assert cache.memoryBytes == sum(heightfield.nbytes for heightfield in cache.memoryEntries.values())
+    assert cache.hits + cache.misses == 800
@@ -0,0 +1,77 @@
+import numpy as np
+from HeightField import evaluate_falloff_curve, soft_selection_field, heightfield_pyramid
+from RockMesh import soft_selection_weights
+
+SMOOTH_CURVE = "1,0,2,0,1,2"
+PLATEAU_CURVE = "1,0.5,2,0,1,2,1,0,2"
+LINEAR_CURVE = "1,0,1,0,1,1"
+
+
+def smoothstep(alpha):
+    return alpha ** 2 * (3 - 2 * alpha)
+
+
+def test_smooth_falloff_values():
+    distances = np.array([0.0, 0.25, 0.5, 0.75, 1.0, 1.5])
+    expected = np.array([1.0, 1 - smoothstep(0.25), 0.5, 1 - smoothstep(0.75), 0.0, 0.0])
+
+    assert np.allclose(evaluate_falloff_curve(SMOOTH_CURVE, distances), expected)
+
+
+def test_plateau_falloff_values():
+    distances = np.array([0.0, 0.3, 0.5, 0.75, 1.0])
+    expected = np.array([1.0, 1.0, 1.0, 1 - smoothstep(0.5), 0.0])
+
+    assert np.allclose(evaluate_falloff_curve(PLATEAU_CURVE, distances), expected)
+
+
+def test_linear_falloff_values():
+    distances = np.linspace(0.0, 1.0, 11)
+
+    assert np.allclose(evaluate_falloff_curve(LINEAR_CURVE, distances), 1.0 - distances)
+
+
+def test_soft_selection_field_follows_the_falloff():
+    # Spacing of 1 between vertices, a move of 2 in the center with a radius of 4
+    heightfield = soft_selection_field(10, 10, [(5, 5, 2.0, 4.0, SMOOTH_CURVE)])
+
+    rows, columns = np.meshgrid(np.arange(11) - 5, np.arange(11) - 5, indexing="ij")
+    expected = 2.0 * evaluate_falloff_curve(SMOOTH_CURVE, np.hypot(rows, columns) / 4.0)
+    assert np.allclose(heightfield, expected)
+    assert heightfield[5, 5] == 2.0
+    assert heightfield[5, 9] == 0.0
+
+
+def test_soft_selection_field_tiles_match_the_whole_grid():
+    bumps = [(9, 10, 3.0, 5.0, SMOOTH_CURVE), (2, 1, -1.0, 3.0, PLATEAU_CURVE)]
+    whole = soft_selection_field(20, 20, bumps)
+    tile = soft_selection_field(10, 10, bumps, row_offset=10, column_offset=0)
+
+    assert np.allclose(tile, whole[10:21, 0:11])
+
+
+def test_rock_weights_use_volume_distance():
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [3.0, 4.0, 0.0]])
+
+    weights = soft_selection_weights(points, 0, 4.0, SMOOTH_CURVE)
+    assert np.allclose(weights, [1.0, 1 - smoothstep(0.25), 0.5, 0.0])
+
+
+def test_pyramid_levels_have_the_requested_shapes():
+    heightfield = np.random.RandomState(3).rand(65, 65)
+
+    levels = heightfield_pyramid(heightfield, [32, 16, 8, 1])
+
+    assert [level.shape for level in levels] == [(33, 33), (17, 17), (9, 9), (2, 2)]
+
+    # The corners are only smoothed along the borders, so they keep their heights
+    for level in levels:
+        assert np.allclose(level[[0, 0, -1, -1], [0, -1, 0, -1]], heightfield[[0, 0, -1, -1], [0, -1, 0, -1]])
+
+
+def test_pyramid_levels_of_tiles_share_their_borders():
+    heightfield = np.random.RandomState(5).rand(33, 65)
+    left, right = heightfield[:, :33], heightfield[:, 32:]
+
+    for left_level, right_level in zip(heightfield_pyramid(left, [16, 8]), heightfield_pyramid(right, [16, 8])):
+        assert np.allclose(left_level[:, -1], right_level[:, 0])
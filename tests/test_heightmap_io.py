@@ -0,0 +1,112 @@
+import struct
+import zlib
+import numpy as np
+import pytest
+import HeightmapIO
+from HeightmapIO import export_heightmap, import_heightmap, heightmap_shape, iter_heightmap_rows
+
+SHAPE = (33, 47)
+
+
+def heights():
+    rows, columns = np.meshgrid(np.linspace(0, 3, SHAPE[0]), np.linspace(0, 5, SHAPE[1]), indexing="ij")
+    return np.sin(rows) * np.cos(columns) * 10.0
+
+
+def blocks(heightfield, rows_per_block=10):
+    return [heightfield[first:first + rows_per_block] for first in range(0, len(heightfield), rows_per_block)]
+
+
+@pytest.mark.parametrize("extension", [".r16", ".png"])
+def test_16_bit_round_trip(tmp_path, extension):
+    path = str(tmp_path / ("heightmap" + extension))
+    heightfield = heights()
+    low, high = heightfield.min(), heightfield.max()
+
+    export_heightmap(path, blocks(heightfield), SHAPE, (low, high))
+    raw_shape = SHAPE if extension == ".r16" else None
+    assert tuple(heightmap_shape(path, raw_shape)) == SHAPE
+
+    imported = import_heightmap(path, SHAPE[0], SHAPE[1], raw_shape=raw_shape) * (high - low) + low
+    assert np.abs(imported - heightfield).max() <= (high - low) / 65535.0
+
+
+def test_npy_round_trip(tmp_path):
+    path = str(tmp_path / "heightmap.npy")
+    heightfield = heights()
+
+    export_heightmap(path, blocks(heightfield), SHAPE)
+
+    assert np.array_equal(import_heightmap(path, SHAPE[0], SHAPE[1]), heightfield.astype(np.float32))
+
+
+def test_import_tile_matches_the_whole_grid(tmp_path):
+    path = str(tmp_path / "heightmap.npy")
+    export_heightmap(path, blocks(heights()), SHAPE)
+
+    whole = import_heightmap(path, 21, 21)
+    tile = import_heightmap(path, 11, 11, row_offset=10, column_offset=10, total_rows=21, total_columns=21)
+    assert np.allclose(tile, whole[10:, 10:])
+
+
+def test_blocks_must_fill_the_heightmap(tmp_path):
+    with pytest.raises(ValueError):
+        export_heightmap(str(tmp_path / "heightmap.r16"), blocks(heights())[:-1], SHAPE, (0.0, 1.0))
+
+
+def paeth(left, above, upper_left):
+    estimate = left + above - upper_left
+    distances = abs(estimate - left), abs(estimate - above), abs(estimate - upper_left)
+    if distances[0] <= distances[1] and distances[0] <= distances[2]:
+        return left
+    return above if distances[1] <= distances[2] else upper_left
+
+
+def write_filtered_png(path, image, bit_depth):
+    """
+    Reference PNG encoder that uses every filter type, one after the other.
+    """
+    pixel_bytes = bit_depth // 8
+    rows = image.astype(">u2" if bit_depth == 16 else np.uint8).view(np.uint8).reshape(len(image), -1)
+    previous = np.zeros(rows.shape[1], dtype=np.int64)
+    data = b""
+
+    for row_index, row in enumerate(rows.astype(np.int64)):
+        filter_type = row_index % 5
+        filtered = []
+        for index, value in enumerate(row):
+            left = row[index - pixel_bytes] if index >= pixel_bytes else 0
+            upper_left = previous[index - pixel_bytes] if index >= pixel_bytes else 0
+            predictor = [0, left, previous[index], (left + previous[index]) // 2,
+                         paeth(left, previous[index], upper_left)][filter_type]
+            filtered.append((value - predictor) % 256)
+        data += bytes([filter_type] + filtered)
+        previous = row
+
+    with open(path, "wb") as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n")
+        for chunk_type, chunk in ((b"IHDR", struct.pack(">IIBBBBB", image.shape[1], image.shape[0], bit_depth,
+                                                        0, 0, 0, 0)),
+                                  (b"IDAT", zlib.compress(data)), (b"IEND", b"")):
+            png_file.write(struct.pack(">I", len(chunk)) + chunk_type + chunk)
+            png_file.write(struct.pack(">I", zlib.crc32(chunk_type + chunk) & 0xffffffff))
+
+
+@pytest.mark.parametrize("bit_depth", [8, 16])
+def test_every_png_filter_is_undone(tmp_path, bit_depth):
+    path = str(tmp_path / "filtered.png")
+    image = np.random.RandomState(3).randint(0, 2 ** bit_depth, size=(11, 13))
+    write_filtered_png(path, image, bit_depth)
+
+    rows = dict(iter_heightmap_rows(path, np.arange(11)))
+
+    assert np.array_equal(np.array([rows[index] for index in range(11)]) * (2 ** bit_depth - 1), image)
+
+
+def test_big_pngs_with_slow_filters_are_refused(tmp_path, monkeypatch):
+    path = str(tmp_path / "filtered.png")
+    write_filtered_png(path, np.zeros((11, 13), dtype=int), 16)
+    monkeypatch.setattr(HeightmapIO, "MAX_PNG_LOOP_PIXELS", 100)
+
+    with pytest.raises(ValueError, match="r16"):
+        list(iter_heightmap_rows(path, np.arange(11)))
@@ -0,0 +1,69 @@
+import json
+import numpy as np
+from Instrumentation import Profiler
+from test_terrain_core import recording_generator, DIMENSIONS, SUBDIVISIONS
+
+
+def test_nested_spans_add_up_in_their_path():
+    profiler = Profiler()
+
+    with profiler.span("Generation"):
+        for _ in range(2):
+            with profiler.span("Tile"):
+                profiler.count("set_points")
+                profiler.track_array("heightfield", np.zeros(10))
+        profiler.count("create_plane", 3)
+
+    assert [span["path"] for span in profiler.spans] == [("Generation", "Tile"), ("Generation", "Tile"),
+                                                         ("Generation",)]
+    assert profiler.totals[("Generation", "Tile")]["calls"] == 2
+    assert profiler.totals[("Generation", "Tile")]["commands"] == 2
+    assert profiler.totals[("Generation",)]["commands"] == 5
+    assert profiler.totals[("Generation",)]["peakArrayBytes"] == 80
+    assert profiler.commands == {"set_points": 2, "create_plane": 3}
+    assert not profiler.stack
+
+
+def test_disabled_profiler_measures_nothing():
+    profiler = Profiler(enabled=False)
+
+    with profiler.span("Generation"):
+        profiler.count("set_points")
+
+    assert not profiler.spans and not profiler.totals and not profiler.commands
+
+
+def test_generation_counts_the_scene_commands_of_each_stage():
+    generator = recording_generator()
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    generator.deform_terrain(1)
+
+    totals = generator.profiler.totals
+    assert list(totals) == [("Grid Creation",), ("Deformation", "Heightfield"), ("Deformation", "Write Back"),
+                            ("Deformation",)]
+    assert totals[("Deformation", "Write Back")]["commands"] == 2
+    assert totals[("Deformation", "Write Back")]["peakArrayBytes"] == (SUBDIVISIONS + 1) ** 2 * 3 * 8
+    assert generator.profiler.commands["set_points"] == 1
+    assert "Write Back" in generator.profiler.report()
+
+
+def test_chrome_trace_has_a_complete_event_for_each_span(tmp_path):
+    profiler = Profiler()
+    with profiler.span("Generation"):
+        with profiler.span("Tile"):
+            profiler.count("set_points")
+
+    path = str(tmp_path / "trace.json")
+    profiler.export(path)
+    with open(path) as trace_file:
+        trace = json.load(trace_file)
+
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == ["Tile", "Generation"]
+    assert all(event["ph"] == "X" for event in events)
+    assert events[0]["args"]["commands"] == {"set_points": 1}
+
+    # The child runs inside its parent, times are in microseconds
+    tile, generation = events
+    assert generation["ts"] <= tile["ts"] and tile["ts"] + tile["dur"] <= generation["ts"] + generation["dur"]
+    assert abs(generation["dur"] - profiler.spans[1]["duration"] * 1e6) < 1e-3
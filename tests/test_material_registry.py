@@ -0,0 +1,71 @@
+from MaterialRegistry import MaterialRegistry
+from SceneBackend import RecordingBackend
+
+
+def registry_with_plane():
+    registry = MaterialRegistry(RecordingBackend())
+    plane = registry.backend.create_plane("terrain", 10, 2)
+
+    return registry, plane
+
+
+def test_assigned_materials_are_reused():
+    registry, plane = registry_with_plane()
+    material = registry.material("terrainMat", color="color.png", normal="normal.png")
+    registry.backend.assign_material(plane, material)
+    nodes_before = registry.backend.command_count("create_shading_node")
+
+    assert registry.material("terrainMat", color="color.png", normal="normal.png") == material
+    assert registry.backend.command_count("create_shading_node") == nodes_before
+
+
+def test_unshared_materials_reuse_the_texture_nodes():
+    registry, plane = registry_with_plane()
+    first = registry.material("rockMat", color="color.png", shared=False)
+    registry.backend.assign_material(plane, first)
+    texture_nodes = registry.textureNodes[("color.png", "color")]
+
+    second = registry.material("rockMat", color="color.png", shared=False)
+
+    assert second != first
+    assert registry.textureNodes[("color.png", "color")] == texture_nodes
+    assert ("{}.outColor".format(texture_nodes[0]), "{}.color".format(second)) in registry.backend.connections
+
+
+def test_shared_materials_survive_their_objects():
+    registry, plane = registry_with_plane()
+    material = registry.material("terrainMat", color="color.png")
+    registry.backend.assign_material(plane, material)
+    nodes_before = registry.backend.command_count("create_shading_node")
+
+    # A preview deletes its terrain and creates it again with the same material
+    registry.backend.delete(plane)
+    registry.material("rockMat", shared=False)
+    assert registry.collect_garbage() == ["rockMat"]
+
+    assert registry.material("terrainMat", color="color.png") == material
+    assert registry.backend.command_count("delete_material") == 1 and registry.backend.exists(material)
+    assert registry.backend.command_count("create_shading_node") == nodes_before + 1
+
+
+def test_unassigned_networks_are_collected():
+    registry, plane = registry_with_plane()
+    kept = registry.material("terrainMat", color="color.png")
+    registry.backend.assign_material(plane, kept)
+    unused = registry.material("rockMat", color="color.png", normal="normal.png", shared=False)
+    extra = registry.backend.create_shading_node("ramp", "texture")
+    registry.attach(unused, [extra])
+
+    assert registry.collect_garbage() == [unused]
+
+    # The color map is still used by the terrain, the normal map is not
+    assert not registry.backend.exists(unused) and not registry.backend.exists(extra)
+    assert list(registry.textureNodes) == [("color.png", "color")]
+    assert all(registry.backend.exists(node) for node in registry.textureNodes[("color.png", "color")])
+    assert registry.backend.exists(kept)
+
+    # Shared materials are only deleted when they are asked for
+    registry.backend.delete(plane)
+    assert registry.collect_garbage() == []
+    assert registry.collect_garbage(shared=True) == [kept]
+    assert not registry.textureNodes and not registry.materials
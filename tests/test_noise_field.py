@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from NoiseField import value_noise_field, smooth_noise, noise_field, DEFAULT_NOISE
+
+SEED = 4721.5
+SUBDIVISIONS = 40
+
+
+def baseline_heightfield(subdivisions, seed):
+    """
+    Per vertex value noise as the first version of the tool computed it.
+    """
+    heightfield = np.zeros((subdivisions + 1, subdivisions + 1))
+    for x in range(subdivisions + 1):
+        for y in range(subdivisions + 1):
+            normalized_x = x * 1.0 / subdivisions
+            normalized_y = y * 1.0 / subdivisions
+
+            value = smooth_noise(normalized_x * 4.0, normalized_y * 4.0, seed)
+            value += smooth_noise(normalized_x * 8.0, normalized_y * 8.0, seed) * .5
+            value += smooth_noise(normalized_x * 16.0, normalized_y * 16.0, seed) * .25
+            value += smooth_noise(normalized_x * 32.0, normalized_y * 32.0, seed) * .125
+            value /= (1 + .5 + .25 + .125)
+            heightfield[x, y] = value
+
+    return heightfield
+
+
+def test_value_noise_field_matches_smooth_noise():
+    expected = baseline_heightfield(SUBDIVISIONS, SEED)
+
+    assert np.abs(value_noise_field(SUBDIVISIONS, SEED) - expected).max() == 0.0
+
+
+
+def test_default_noise_is_sine():
+    assert DEFAULT_NOISE["type"] == "Sine"
+
+
+def test_default_heightfield_matches_baseline():
+    expected = baseline_heightfield(SUBDIVISIONS, SEED)
+
+    assert np.abs(noise_field(SUBDIVISIONS, SEED) - expected).max() == 0.0
+
+def test_value_noise_field_tiles_match_the_whole_grid():
+    whole = value_noise_field(SUBDIVISIONS, SEED)
+    tile = value_noise_field(SUBDIVISIONS, SEED, row_offset=10, column_offset=20, rows=15, columns=21)
+
+    assert np.array_equal(tile, whole[10:25, 20:41])
+
+
+def max_step(heightfield):
+    return max(np.abs(np.diff(heightfield, axis=0)).max(), np.abs(np.diff(heightfield, axis=1)).max())
+
+
+@pytest.mark.parametrize("noise_type", ["Value", "Perlin", "Simplex"])
+def test_lattice_noise_range_and_continuity(noise_type):
+    noise = {"type": noise_type, "octaves": 1}
+    heightfield = noise_field(256, SEED, noise)
+
+    assert -1.0 <= heightfield.min() < 0.0 < heightfield.max() <= 1.0
+
+    # Without jumps the biggest step between neighbour vertices halves with twice the vertices
+    assert max_step(heightfield) < 0.1
+    assert max_step(noise_field(512, SEED, noise)) < max_step(heightfield) * 0.6
+
+
+def test_perlin_noise_is_zero_on_the_lattice():
+    # A scale of 4 puts a lattice point every 16 vertices
+    heightfield = noise_field(64, SEED, {"type": "Perlin", "octaves": 1, "scale": 4.0})
+
+    assert np.allclose(heightfield[::16, ::16], 0.0)
+    assert np.abs(heightfield).max() > 0.1
+
+
+@pytest.mark.parametrize("noise_type", ["Value", "Perlin", "Simplex"])
+def test_lattice_noise_tiles_match_the_whole_grid(noise_type):
+    whole = noise_field(SUBDIVISIONS, SEED, {"type": noise_type})
+    tile = noise_field(SUBDIVISIONS, SEED, {"type": noise_type}, row_offset=10, column_offset=20, rows=15, columns=21)
+
+    assert np.array_equal(tile, whole[10:25, 20:41])
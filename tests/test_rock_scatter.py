@@ -0,0 +1,26 @@
+import random
+import numpy as np
+from RockScatter import PoissonDiskScatter
+
+
+def test_crowded_rocks_stay_inside_the_density_mask():
+    random.seed(5)
+    # Only the left half of the area can have rocks, and they are too big to keep their distance
+    density = np.zeros((11, 11))
+    density[:, :5] = 1.0
+    scatter = PoissonDiskScatter(10.0, 10.0, 20.0, density)
+
+    positions = [scatter.next_position(10.0) for _ in range(50)]
+
+    assert scatter.crowded == 49
+    assert all(position_x < 0 for position_x, _ in positions)
+
+
+def test_crowded_rocks_without_density_go_to_the_densest_vertex():
+    random.seed(5)
+    density = np.zeros((11, 11))
+    density[2, 8] = 1e-12
+    scatter = PoissonDiskScatter(10.0, 10.0, 20.0, density, attempts=1)
+
+    assert np.allclose(scatter.next_position(10.0), (3.0, 3.0))
+    assert scatter.crowded == 1
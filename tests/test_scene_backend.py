@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from SceneBackend import MayaBackend, RecordingBackend
+
+
+class StandInCmds:
+    """
+    Records the maya.cmds calls made by MayaBackend.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, command):
+        def call(*args, **kwargs):
+            self.calls.append((command, args, kwargs))
+            return getattr(self, "result_" + command, None)
+
+        return call
+
+
+def test_set_points_moves_the_tweaks_with_one_undoable_command():
+    cmds = StandInCmds()
+    cmds.result_xform = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0]
+    cmds.result_getAttr = [(0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (0.0, 0.5, 0.0), (0.0, 0.0, 0.0)]
+    backend = MayaBackend(cmds)
+    points = np.array([[0.0, 2.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 1.0, 3.0]])
+
+    backend.set_points("terrain", points)
+
+    assert [call[0] for call in cmds.calls] == ["xform", "getAttr", "setAttr"]
+    assert cmds.calls[1] == ("getAttr", ("terrain.pnts[0:3]",), {})
+    plug, *tweaks = cmds.calls[2][1]
+    assert plug == "terrain.pnts[0:3]"
+    assert tweaks == [0.0, 2.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.5, 0.0, 0.0, 0.0, 3.0]
+
+
+def test_set_points_needs_a_point_for_each_vertex():
+    cmds = StandInCmds()
+    cmds.result_xform = [0.0] * 15
+    backend = MayaBackend(cmds)
+
+    with pytest.raises(ValueError):
+        backend.set_points("terrain", np.zeros((4, 3)))
+    assert "setAttr" not in [call[0] for call in cmds.calls]
+
+
+def test_get_points_reads_every_vertex_with_one_query():
+    cmds = StandInCmds()
+    cmds.result_xform = [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    backend = MayaBackend(cmds)
+
+    points = backend.get_points("terrain")
+
+    assert cmds.calls == [("xform", ("terrain.vtx[*]",), {"query": True, "translation": True, "objectSpace": True})]
+    assert np.array_equal(points, [[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]])
+
+
+def test_place_transforms_sends_one_script_for_every_node():
+    cmds = StandInCmds()
+    mel = StandInCmds()
+    backend = MayaBackend(cmds, mel)
+
+    backend.place_transforms(["rock1", "rock2"], np.array([[1, 2, 3], [4, 5, 6]]), np.array([[0, 90, 0], [180, 0, 0]]))
+
+    assert cmds.calls == []
+    assert mel.calls == [("eval", ('xform -translation 1.0 2.0 3.0 -rotation 0.0 90.0 0.0 "rock1";\n'
+                                   'xform -translation 4.0 5.0 6.0 -rotation 180.0 0.0 0.0 "rock2";',), {})]
+
+
+def test_batches_merge_the_deferred_operations():
+    backend = RecordingBackend()
+    group = backend.create_group("rocks")
+    material = backend.create_shading_node("blinn", "shader")
+    rocks = [backend.create_sphere("rock1", 1.0, 4) for _ in range(3)]
+
+    with backend.batch("create_rocks"):
+        for rock in rocks:
+            backend.parent(rock, group)
+            backend.assign_material(rock, material)
+
+        # Nothing is sent until the outermost batch ends
+        with backend.batch("nested"):
+            backend.assign_material(group, material)
+        assert backend.command_count("parent") == backend.command_count("assign_material") == 0
+
+    # Parenting renames the nodes, so it is sent last
+    assert backend.commands[-3:] == [("assign_material", (rocks + [group], material)),
+                                     ("parent", (rocks, group)),
+                                     ("end_batch", ())]
+    assert backend.command_count("begin_batch") == 1
+    assert all(backend.nodes[rock]["parent"] == group for rock in rocks)
+    assert backend.assigned_objects(material) == rocks + [group]
+
+
+def test_outermost_batch_opens_one_undo_chunk():
+    cmds = StandInCmds()
+    backend = MayaBackend(cmds)
+
+    with backend.batch("Create Terrain"):
+        with backend.batch("deform_terrain"):
+            pass
+        assert backend.batchDepth == 1
+
+    assert cmds.calls == [("undoInfo", (), {"openChunk": True, "chunkName": "Create Terrain"}),
+                          ("refresh", (), {"suspend": True}),
+                          ("refresh", (), {"suspend": False}),
+                          ("undoInfo", (), {"closeChunk": True})]
+
+
+def test_failed_batches_still_close_the_undo_chunk():
+    cmds = StandInCmds()
+    backend = MayaBackend(cmds)
+
+    try:
+        with backend.batch("Create Terrain"):
+            raise RuntimeError("failed")
+    except RuntimeError:
+        pass
+
+    assert cmds.calls[-1] == ("undoInfo", (), {"closeChunk": True})
+    assert backend.batchDepth == 0
@@ -0,0 +1,69 @@
+import os
+import json
+import numpy as np
+import pytest
+from TerrainBatch import resolve_variants, variant_seed, run_batch, BATCH_SEED
+from TerrainCore import MAX_NOISE_SEED
+
+VARIANTS = [{"name": "dunes", "method": "noise", "settings": {"noiseType": "Perlin"}},
+            {"name": "hills", "method": "soft", "seed": 12, "rocks": {"amount": 15}},
+            {"name": "tiled", "tiles": [2, 1], "rocks": {"amount": 10, "settings": {"rockScatter": "Poisson Disk"}}}]
+
+
+def test_variant_seeds_depend_on_the_name_only():
+    assert variant_seed("dunes") == variant_seed("dunes", BATCH_SEED)
+    assert variant_seed("dunes") != variant_seed("hills")
+    assert variant_seed("dunes", 1) != variant_seed("dunes", 2)
+    assert all(1 <= variant_seed("variant_{}".format(index)) <= MAX_NOISE_SEED for index in range(100))
+
+
+def test_resolve_variants_fills_every_parameter():
+    variants = resolve_variants({"subdivisions": 16, "rocks": {"hue": 90}}, VARIANTS + [{}])
+
+    assert [parameters["name"] for parameters in variants] == ["dunes", "hills", "tiled", "variant_3"]
+    assert [parameters["method"] for parameters in variants] == [1, 0, 1, 1]
+    assert [parameters["subdivisions"] for parameters in variants] == [16] * 4
+    assert variants[0]["seed"] == variant_seed("dunes") and variants[1]["seed"] == 12
+    assert variants[1]["rocks"]["amount"] == 15 and variants[1]["rocks"]["hue"] == 90
+    assert variants[1]["rocks"]["brightness"] == [0.2, 0.6]
+
+    # Adding a variant doesn't change the others
+    assert resolve_variants({"subdivisions": 16, "rocks": {"hue": 90}}, VARIANTS[:1]) == variants[:1]
+
+
+@pytest.mark.parametrize("variants", [[{"name": "a"}, {"name": "a"}],
+                                      [{"method": "erosion"}],
+                                      [{"settings": {"noSuchAttribute": 1}}],
+                                      [{"method": "heightmap", "heightmap": "missing.png"}]])
+def test_resolve_variants_rejects_bad_files(variants):
+    with pytest.raises(ValueError):
+        resolve_variants({}, variants)
+
+
+def read_outputs(directory, variants):
+    outputs = {}
+    for parameters in variants:
+        with open(os.path.join(directory, parameters["name"] + ".json")) as manifest_file:
+            manifest = json.load(manifest_file)
+        heightmap = np.load(os.path.join(directory, manifest["heightmap"]))
+        outputs[parameters["name"]] = (manifest, heightmap)
+
+    return outputs
+
+
+def test_variants_are_the_same_with_any_amount_of_workers(tmp_path):
+    variants = resolve_variants({"subdivisions": 16, "format": "npy"}, VARIANTS)
+
+    serial = run_batch(variants, str(tmp_path / "serial"), workers=1)
+    parallel = run_batch(variants, str(tmp_path / "parallel"), workers=3)
+    assert [result["state"] for result in serial + parallel] == ["Done"] * 6
+
+    serial_outputs = read_outputs(str(tmp_path / "serial"), variants)
+    parallel_outputs = read_outputs(str(tmp_path / "parallel"), variants)
+    for name, (manifest, heightmap) in serial_outputs.items():
+        assert parallel_outputs[name][0] == manifest
+        assert np.array_equal(parallel_outputs[name][1], heightmap)
+    assert len(serial_outputs["hills"][0]["rocks"]["positions"]) == 15
+
+    # Variants generated with the same parameters are skipped
+    assert [result["state"] for result in run_batch(variants, str(tmp_path / "serial"))] == ["Cached"] * 3
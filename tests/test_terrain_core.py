@@ -0,0 +1,301 @@
+import random
+import numpy as np
+import pytest
+from TerrainCore import TerrainGenerator, compute_heights, rock_layout
+from SceneBackend import RecordingBackend
+from HeightCache import HeightfieldCache
+from test_noise_field import baseline_heightfield
+
+SEED = 1234
+DIMENSIONS = 100
+SUBDIVISIONS = 8
+
+
+class RenamingBackend(RecordingBackend):
+    """
+    Renames every transform it parents, like Maya does when the group already has a child with that name.
+    """
+
+    def parent(self, node, group):
+        if self.defer("parent", group, node):
+            return node
+
+        RecordingBackend.parent(self, node, group)
+        renamed = [self.rename(child, child + "_parented") for child in ([node] if isinstance(node, str) else node)]
+        return renamed[0] if isinstance(node, str) else renamed
+
+    def assign_material(self, nodes, material):
+        for node in [nodes] if isinstance(nodes, str) else nodes:
+            self._mesh(node)
+        RecordingBackend.assign_material(self, nodes, material)
+
+    def list_shapes(self, node):
+        self._mesh(node)
+        return RecordingBackend.list_shapes(self, node)
+
+
+def recording_generator(backend=None):
+    generator = TerrainGenerator(backend or RecordingBackend())
+    generator.heightCache = HeightfieldCache(cache_directory=None)
+
+    return generator
+
+
+def test_create_terrain_points_and_commands():
+    generator = recording_generator()
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+
+    assert generator.backend.commands == [("begin_batch", ("create_terrain",)),
+                                          ("create_plane", ("terrain", DIMENSIONS, SUBDIVISIONS)),
+                                          ("end_batch", ())]
+
+    # Rows go from positive to negative Z and columns from negative to positive X
+    points = generator.backend.get_points("terrain")
+    coordinates = np.linspace(-DIMENSIONS / 2.0, DIMENSIONS / 2.0, SUBDIVISIONS + 1)
+    assert points.shape == ((SUBDIVISIONS + 1) ** 2, 3)
+    assert np.array_equal(points[:, 0], np.tile(coordinates, SUBDIVISIONS + 1))
+    assert np.array_equal(points[:, 2], np.repeat(coordinates[::-1], SUBDIVISIONS + 1))
+    assert not points[:, 1].any()
+
+
+def test_deform_terrain_writes_baseline_noise_once():
+    generator = recording_generator()
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    commands_before = generator.backend.command_count()
+    flat_points = generator.backend.get_points("terrain")
+
+    generator.deform_terrain(1)
+
+    # Heights are read and written with a single command each
+    names = [command for command, _ in generator.backend.commands[commands_before + 1:]]
+    assert names == ["begin_batch", "disable_soft_select", "get_points", "set_points", "end_batch"]
+
+    height_limit = generator.maxHeight * DIMENSIONS / 100.0 * 3.0
+    expected = flat_points.copy()
+    expected[:, 1] = baseline_heightfield(SUBDIVISIONS, generator.noise_seed).ravel() * height_limit
+    assert np.array_equal(generator.backend.get_points("terrain"), expected)
+
+
+def test_levels_of_detail_follow_the_terrain():
+    generator = recording_generator()
+    generator.lodLevels = 2
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    generator.deform_terrain(1)
+
+    lods = generator.terrainLods[generator.gridObject]
+    assert lods == ["terrain_LOD1", "terrain_LOD2"]
+    assert generator.backend.nodes["terrain"]["parent"] == "terrain_LOD"
+
+    heights = generator.backend.get_points("terrain")[:, 1].reshape(SUBDIVISIONS + 1, SUBDIVISIONS + 1)
+    for lod, subdivisions in zip(lods, (4, 2)):
+        lod_heights = generator.backend.get_points(lod)[:, 1].reshape(subdivisions + 1, subdivisions + 1)
+        assert lod_heights.shape == (subdivisions + 1, subdivisions + 1)
+        assert np.allclose(lod_heights[[0, -1], [0, -1]], heights[[0, -1], [0, -1]])
+
+
+def test_heights_are_computed_from_a_snapshot():
+    generator = recording_generator()
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    parameters = generator.deformation_parameters(1)
+    settings = generator.heights_settings(parameters)
+    expected = compute_heights(settings, replace=True)
+
+    # The main thread keeps changing the generator while the job runs
+    generator.maxHeight *= 2
+    generator.gridSubdivisions *= 2
+    generator.erosionMode = "Both"
+    parameters["seed"] += 1
+
+    with pytest.raises(TypeError):
+        settings["workers"] = 4
+    assert np.array_equal(compute_heights(settings, replace=True), expected)
+
+
+@pytest.mark.parametrize("tiles", [(1, 1), (2, 3)])
+def test_terrain_is_created_with_its_heights_in_one_batch(tiles):
+    generator = recording_generator(RecordingBackend(undo=True))
+    generator.seed = SEED
+    generator.create_terrain("previous", DIMENSIONS, 4)
+
+    parameters, settings = generator.terrain_settings(1, DIMENSIONS, SUBDIVISIONS, tiles)
+    assert generator.gridObject == "previous" and generator.gridSubdivisions == 4 and not generator.gridTiles
+    heightfield = compute_heights(settings, replace=True)
+
+    with generator.backend.batch("Create Terrain"):
+        generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS, tiles)
+        generator.apply_heights(heightfield, parameters, replace=True)
+    assert np.array_equal(generator.terrain_heightfield()[0], heightfield)
+
+    expected = recording_generator()
+    expected.seed = SEED
+    expected.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS, tiles)
+    expected.deform_terrain(1)
+    assert np.array_equal(expected.terrain_heightfield()[0], heightfield)
+
+    generator.backend.undo()
+    assert list(generator.backend.nodes) == ["previous"]
+
+
+def test_rock_layouts_only_use_their_snapshot():
+    layouts = []
+    for _ in range(2):
+        generator = recording_generator()
+        generator.randomGenerator.seed(SEED)
+        generator.rockScatter = "Poisson Disk"
+        settings = generator.rock_settings()
+
+        generator.rockScatter = "Random"
+        generator.randomGenerator.random()
+        layouts.append(rock_layout(settings, 20, 1.0, None, DIMENSIONS, DIMENSIONS, 30, (0.2, 0.6), (0.1, 0.4)))
+
+    assert np.array_equal(layouts[0]["positions"], layouts[1]["positions"])
+    assert layouts[0]["scales"] == layouts[1]["scales"] and layouts[0]["colors"] == layouts[1]["colors"]
+    assert layouts[0]["crowded"] == 0 and len(layouts[0]["positions"]) == 20
+
+
+def test_random_seeds_are_not_cached():
+    generator = recording_generator()
+    generator.seed = SEED
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    generator.deform_terrain(1)
+    assert len(generator.heightCache.memoryEntries) == 1
+
+    generator.seed = None
+    generator.deform_terrain(1)
+    generator.deform_terrain(0)
+    assert len(generator.heightCache.memoryEntries) == 1
+
+
+@pytest.mark.parametrize("color_mode, prototypes", [("Per Rock", 0), ("Palette", 4), ("Vertex Color", 4)])
+def test_rock_names_are_used_before_parenting(color_mode, prototypes):
+    generator = recording_generator(RenamingBackend())
+    generator.rockColorMode = color_mode
+    generator.rockPrototypes = prototypes
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+
+    with generator.backend.batch("Create Rocks"):
+        generator.create_rocks("rock", 12, "rockMat", "", "", 30, (0.2, 0.6), (0.1, 0.4))
+
+    backend = generator.backend
+    rocks = [node for node, values in backend.nodes.items() if values["parent"] == "rock_grp"]
+    assert len(rocks) == 12 and all(rock.endswith("_parented") for rock in rocks)
+    assert all(backend.assignments[rock] == "rockMat" for rock in rocks)
+    assert len(set(tuple(backend.nodes[rock]["translate"]) for rock in rocks)) == 12
+
+
+def test_random_values_come_from_the_generator_only():
+    heights = []
+    for seed in (7, 7, 8):
+        generator = recording_generator()
+        generator.analyticSoftSelect = True
+        generator.randomGenerator.seed(seed)
+        generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+
+        random.seed(0)
+        generator.deform_terrain(0)
+        assert random.random() == random.Random(0).random()
+        heights.append(generator.backend.get_points("terrain")[:, 1])
+
+    assert np.array_equal(heights[0], heights[1])
+    assert not np.array_equal(heights[0], heights[2])
+
+
+def test_every_generation_step_is_undone_at_once():
+    generator = recording_generator(RecordingBackend(undo=True))
+    generator.seed = SEED
+    backend = generator.backend
+
+    with backend.batch("Create Terrain"):
+        generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+        generator.deform_terrain(1)
+    states = [backend.get_points("terrain")]
+
+    generator.rescale_terrain(generator.maxHeight * 2)
+    states.append(backend.get_points("terrain"))
+    generator.reseed_terrain(SEED + 1)
+    states.append(backend.get_points("terrain"))
+    generator.redeform_terrain(0)
+    assert not any(np.array_equal(backend.get_points("terrain"), points) for points in states)
+
+    with backend.batch("Create Rocks"):
+        generator.create_rocks("rock", 12, "rockMat", "", "", 30, (0.2, 0.6), (0.1, 0.4))
+    assert "rock_grp" in backend.nodes
+
+    backend.undo()
+    assert "rock_grp" not in backend.nodes and not backend.assignments
+    for points in reversed(states):
+        backend.undo()
+        assert np.array_equal(backend.get_points("terrain"), points)
+
+    backend.undo()
+    assert backend.nodes == {} and backend.connections == []
+    with pytest.raises(RuntimeError):
+        backend.undo()
+
+
+def test_rock_generations_collect_the_materials_of_deleted_rocks():
+    generator = recording_generator()
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    terrain_material = generator.materials.material("terrainMat")
+
+    for generation in range(3):
+        generator.create_rocks("rock", 5, "rockMat", "", "", 30, (0.2, 0.6), (0.1, 0.4))
+        material = generator.backend.assignments["rock"]
+
+        # Each generation collects the material of the rocks deleted before it, the shared one is kept
+        assert set(generator.materials.networks) == {terrain_material, material}
+        assert generator.backend.command_count("delete_material") == generation
+        generator.backend.delete("rock_grp")
+
+    assert generator.backend.exists(terrain_material)
+
+
+@pytest.mark.parametrize("tiles", [(1, 1), (2, 2)])
+def test_redeform_softens_the_soft_selection_moves(tiles):
+    generator = recording_generator()
+    generator.seed = SEED
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS, tiles)
+
+    generator.redeform_terrain(1)
+    assert generator.backend.command_count("soften_edges") == 0
+
+    generator.redeform_terrain(0)
+    assert generator.backend.command_count("soften_edges") == tiles[0] * tiles[1]
+
+
+def test_rescale_only_scales_the_cached_heightfields():
+    generator = recording_generator()
+    generator.seed = SEED
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    generator.redeform_terrain(1)
+    heights = generator.backend.get_points("terrain")[:, 1]
+    misses, hits = generator.heightCache.misses, generator.heightCache.hits
+
+    generator.rescale_terrain(generator.maxHeight * 2)
+
+    assert np.allclose(generator.backend.get_points("terrain")[:, 1], heights * 2)
+    assert generator.heightCache.misses == misses and generator.heightCache.hits == hits + 1
+    assert generator.backend.command_count("soften_edges") == 0
+
+
+def test_reseed_only_computes_the_noise_again():
+    generator = recording_generator()
+    generator.seed = SEED
+    generator.create_terrain("terrain", DIMENSIONS, SUBDIVISIONS)
+    generator.redeform_terrain(0)
+    commands = generator.backend.command_count()
+
+    # Soft selection moves don't have a noise seed
+    generator.reseed_terrain(SEED + 1)
+    assert generator.backend.commands[commands:] == [("begin_batch", ("reseed_terrain",)), ("end_batch", ())]
+
+    generator.redeform_terrain(1)
+    heights = generator.backend.get_points("terrain")[:, 1]
+    misses = generator.heightCache.misses
+
+    generator.reseed_terrain(SEED + 2)
+
+    assert generator.appliedDeformation["seed"] == SEED + 2
+    assert not np.array_equal(generator.backend.get_points("terrain")[:, 1], heights)
+    assert generator.heightCache.misses == misses + 1
+    assert generator.backend.command_count("soften_edges") == 1
@@ -0,0 +1,89 @@
+from TerrainPreview import ProgressivePreview
+
+
+class IdleQueue:
+    """
+    Keeps the functions scheduled for when the application is idle.
+    """
+
+    def __init__(self):
+        self.functions = []
+
+    def __call__(self, function):
+        self.functions.append(function)
+
+    def run(self):
+        while self.functions:
+            self.functions.pop(0)()
+
+
+def test_refinement_levels_end_at_the_full_resolution():
+    preview = ProgressivePreview(None, None, preview_subdivisions=24, refine_factor=4)
+
+    assert preview.refinement_levels(1000) == [96, 384, 1000]
+    assert preview.refinement_levels(96) == [96]
+    assert preview.refinement_levels(50) == [50]
+    assert preview.refinement_levels(24) == []
+    assert preview.refinement_levels(10) == []
+
+
+def test_update_builds_the_preview_and_refines_when_idle():
+    built = []
+    idle = IdleQueue()
+    preview = ProgressivePreview(built.append, idle, preview_subdivisions=24, refine_factor=4)
+
+    preview.update(1000)
+    assert built == [24]
+    assert preview.pendingSteps == 3
+
+    idle.run()
+    assert built == [24, 96, 384, 1000]
+    assert preview.subdivisions == 1000
+    assert preview.pendingSteps == 0
+
+
+def test_new_changes_cancel_the_refinement():
+    built = []
+    idle = IdleQueue()
+    preview = ProgressivePreview(built.append, idle, preview_subdivisions=24, refine_factor=4)
+
+    preview.update(1000)
+    idle.functions.pop(0)()
+    preview.preview(500)
+
+    # The steps scheduled for the first change do nothing
+    idle.run()
+    assert built == [24, 96, 24]
+    assert preview.pendingSteps == 0
+
+
+def test_a_build_that_changes_the_parameters_stops_its_refinement():
+    built = []
+    idle = IdleQueue()
+
+    def build(subdivisions):
+        built.append(subdivisions)
+        if subdivisions == 96:
+            preview.cancel()
+
+    preview = ProgressivePreview(build, idle, preview_subdivisions=24, refine_factor=4)
+    preview.update(1000)
+    idle.run()
+
+    assert built == [24, 96]
+
+
+def test_the_full_resolution_uses_its_own_build():
+    built = []
+    idle = IdleQueue()
+    preview = ProgressivePreview(built.append, idle, preview_subdivisions=24, refine_factor=4,
+                                 build_final=lambda subdivisions: built.append(("final", subdivisions)))
+
+    preview.update(1000)
+    idle.run()
+    assert built == [24, 96, 384, ("final", 1000)]
+
+    # The coarse preview is the full resolution, there is no refinement
+    preview.update(20)
+    idle.run()
+    assert built[-1] == 20
@@ -0,0 +1,30 @@
+import numpy as np
+from TerrainTiles import iter_tile_heightfields
+
+SEED = 4721.5
+SUBDIVISIONS = 8
+DIMENSIONS = 10
+BUMPS = [(7, 9, 2.0, 4.0, "1,0,2,0,1,2"), (12, 3, -1.5, 6.0, "1,0.5,2,0,1,2,1,0,2")]
+
+
+def tiles(deformation_method, workers):
+    return dict(((row, column), heightfield) for row, column, heightfield in
+                iter_tile_heightfields(deformation_method, 2, 2, SUBDIVISIONS, DIMENSIONS,
+                                       seed=SEED, height_limit=3.0, bumps=BUMPS, workers=workers))
+
+
+def test_parallel_tiles_match_serial_tiles():
+    for deformation_method in (0, 1):
+        serial = tiles(deformation_method, 1)
+        parallel = tiles(deformation_method, 2)
+
+        assert sorted(parallel) == sorted(serial) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+        for key in serial:
+            assert np.array_equal(parallel[key], serial[key])
+
+
+def test_tiles_share_their_borders():
+    serial = tiles(1, 1)
+
+    assert np.array_equal(serial[0, 0][:, -1], serial[0, 1][:, 0])
+    assert np.array_equal(serial[0, 0][-1, :], serial[1, 0][0, :])